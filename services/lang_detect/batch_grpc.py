@@ -0,0 +1,182 @@
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from x2agi_speechkit import metrics, stubs
+from x2agi_speechkit.connections import GRPC_ENDPOINTS, ConnectionManager
+
+from audio_converter import audio_duration_s
+from client_grpc import make_detector
+from window_sampler import detect_language
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".ogg", ".opus", ".m4a", ".aac", ".wma", ".amr")
+
+
+def read_manifest(manifest, allowed_languages):
+    """
+    Expand a manifest into a list of jobs: dicts with "path" and "allowed_languages".
+    The manifest is a directory (searched recursively for audio files), a glob
+    pattern, or a JSONL file with one {"path": ..., "allowed_languages": [...]}
+    object per line ("allowed_languages" is optional, relative paths are
+    resolved against the JSONL file's directory).
+    """
+    jobs = []
+    if os.path.isdir(manifest):
+        for root, _, files in os.walk(manifest):
+            for name in sorted(files):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    jobs.append({"path": os.path.join(root, name), "allowed_languages": allowed_languages})
+        jobs.sort(key=lambda job: job["path"])
+    elif manifest.endswith((".jsonl", ".json")) and os.path.isfile(manifest):
+        manifest_dir = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, "r", encoding="utf-8") as inp:
+            for line_num, line in enumerate(inp, 1):
+                if not line.strip():
+                    continue
+                try:
+                    info = json.loads(line)
+                except json.JSONDecodeError:
+                    raise ValueError(f"Invalid JSON in line {line_num} of {manifest}")
+                jobs.append({
+                    "path": os.path.normpath(os.path.join(manifest_dir, info["path"])),
+                    "allowed_languages": info.get("allowed_languages", allowed_languages),
+                })
+    else:
+        for path in sorted(glob.glob(manifest, recursive=True)):
+            if os.path.isfile(path):
+                jobs.append({"path": path, "allowed_languages": allowed_languages})
+    return jobs
+
+
+def percentile(values, q: float) -> float:
+    """Nearest-rank percentile, 0 for no values."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def detect_job(stub, args, job, log=None):
+    """
+    Language of one file as an NDJSON record: the combined LangDetectResponse
+    fields plus the file's duration, the windows sent and the wall time.
+    """
+    start = time.perf_counter()
+    detect = make_detector(stub, args.token, job["allowed_languages"])
+    combined, done = detect_language(
+        detect, job["path"], args.windows, args.window_s, args.window_concurrency, args.min_windows,
+        args.confidence_threshold, args.no_convert,
+        key="allowed_language" if job["allowed_languages"] else "detected_language",
+        log=log or (lambda message: None),
+    )
+    return {
+        "path": job["path"],
+        **{name: round(value, 4) if isinstance(value, float) else value for name, value in combined.items()},
+        "audio_s": round(audio_duration_s(job["path"]), 3),
+        "windows": len(done),
+        "elapsed_s": round(time.perf_counter() - start, 3),
+    }
+
+
+def run(args):
+    allowed_languages = args.allowed_languages.split(",") if args.allowed_languages else []
+    jobs = read_manifest(args.manifest, allowed_languages)
+    # Results go to stdout unless --output is given; progress then goes to stderr
+    log_file = sys.stderr if args.output == "-" else sys.stdout
+    print(f"{len(jobs)} files to process, concurrency={args.concurrency}", file=log_file)
+    if not jobs:
+        return 0
+
+    # Every file goes over the same few channels, connected while the manifest is expanded
+    connections = ConnectionManager(args.num_channels, args.insecure, endpoints={"lang_detect": args.endpoint})
+    connections.warm(["lang_detect"], wait=False)
+    exporter = metrics.start_export(args)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+
+    def detect(job):
+        # Round-robin over the pool, passing over channels whose connection is down
+        stub = stubs.lang_detect_pb2_grpc.LangDetectorStub(connections.channel("lang_detect"))
+        log = (lambda message: print(f"[{job['path']}] {message}", file=log_file)) if args.verbose else None
+        try:
+            return detect_job(stub, args, job, log)
+        except Exception as e:
+            return {"path": job["path"], "error": str(e)}
+
+    batch_start = time.perf_counter()
+    records = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+            futures = [pool.submit(detect, job) for job in jobs]
+            for done, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                records.append(record)
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                if "error" in record:
+                    print(f"[{done}/{len(jobs)}] FAILED {record['path']}: {record['error']}", file=log_file)
+                else:
+                    key = "allowed_language" if record["allowed_language"] else "detected_language"
+                    print(f"[{done}/{len(jobs)}] {record[key]} ({record[key + '_confidence']:.2f}) {record['path']} "
+                          f"({record['windows']} windows, {record['elapsed_s']:.2f}s)", file=log_file)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        connection_summary = connections.summary()
+        connections.close()
+        exporter.close()
+
+    elapsed = time.perf_counter() - batch_start
+    succeeded = [record for record in records if "error" not in record]
+    failed = len(records) - len(succeeded)
+    latencies = [record["elapsed_s"] for record in succeeded]
+    audio_s = sum(record["audio_s"] for record in succeeded)
+    windows = sum(record["windows"] for record in succeeded)
+    print("----", file=log_file)
+    print(connection_summary, file=log_file)
+    print(f"per file: p50 {percentile(latencies, 50):.2f}s, p95 {percentile(latencies, 95):.2f}s, "
+          f"max {max(latencies, default=0.0):.2f}s, {windows / max(len(succeeded), 1):.1f} windows", file=log_file)
+    print(f"processed {len(records)} files in {elapsed:.1f}s ({len(records) / elapsed:.1f} files/s, "
+          f"{audio_s / 3600:.1f} h of audio, {audio_s / elapsed:.0f}x real time), failed: {failed}", file=log_file)
+    return failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Language of every file of a manifest, as NDJSON")
+    parser.add_argument("--token", type=str, required=True, help="API key")
+    parser.add_argument("--manifest", type=str, required=True,
+                      help="Directory, glob pattern (quote it) or JSONL file with one {\"path\": ...} per line")
+    parser.add_argument("--output", type=str, default="-",
+                      help="NDJSON file with one result per file, in completion order (default: stdout)")
+    parser.add_argument("--allowed_languages", type=str, default=None,
+                      help="Comma-separated list of allowed languages (e.g., 'en,ru')")
+    parser.add_argument("--concurrency", type=int, default=8,
+                      help="Files detected at the same time")
+    parser.add_argument("--window_concurrency", type=int, default=2,
+                      help="Windows of a file detected at the same time")
+    parser.add_argument("--num_channels", type=int, default=1,
+                      help="Number of gRPC channels the files are spread over")
+    parser.add_argument("--no_convert", action="store_true",
+                      help="Skip audio conversion (use if files are already 16kHz mono WAV)")
+    parser.add_argument("--windows", type=int, default=5,
+                      help="Number of windows sampled across each file")
+    parser.add_argument("--window_s", type=float, default=20.0,
+                      help="Length of each window in seconds")
+    parser.add_argument("--min_windows", type=int, default=2,
+                      help="Windows needed before an early exit")
+    parser.add_argument("--confidence_threshold", type=float, default=0.9,
+                      help="Combined confidence at which the remaining windows are skipped")
+    parser.add_argument("--endpoint", type=str, default=GRPC_ENDPOINTS["lang_detect"],
+                      help="gRPC endpoint host:port")
+    parser.add_argument("--insecure", action="store_true",
+                      help="Plaintext channel, e.g. to a local mock server")
+    parser.add_argument("--verbose", action="store_true",
+                      help="Print the result of every window")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+
+    sys.exit(1 if run(args) else 0)
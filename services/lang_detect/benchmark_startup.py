@@ -0,0 +1,67 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+# What each client imports on top when it sends its first request
+FIRST_REQUEST = {
+    "client_grpc": "from x2agi_speechkit import stubs; stubs.lang_detect_pb2_grpc",
+    "client_rest": "import requests",
+}
+
+
+def cold_start_s(code: str, cwd: str) -> float:
+    """Wall time of a fresh interpreter running `code`."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=cwd, check=True)
+    return time.perf_counter() - start
+
+
+def top_imports(module: str, cwd: str, count: int):
+    """The `count` slowest top-level imports of `module`, from python -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=cwd,
+                            check=True, capture_output=True, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            # A module is listed after everything it imported
+            if name.strip() == module:
+                break
+            imports = []
+        elif depth == 1:
+            imports.append((int(cumulative_us) / 1000, name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def run(args):
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    print(f"cold start of a fresh interpreter, median of {args.repeats} runs (python -c pass subtracted)")
+    print("first request: the import plus the modules the client loads before its first call")
+    interpreter_s = statistics.median(cold_start_s("pass", cwd) for _ in range(args.repeats))
+    print(f"{'module':<16}{'import':>10}{'first request':>16}")
+    for module in args.modules:
+        import_s = statistics.median(cold_start_s(f"import {module}", cwd) for _ in range(args.repeats))
+        code = f"import {module}; {FIRST_REQUEST[module]}" if module in FIRST_REQUEST else f"import {module}"
+        ready_s = statistics.median(cold_start_s(code, cwd) for _ in range(args.repeats))
+        print(f"{module:<16}{(import_s - interpreter_s) * 1000:>7.0f} ms{(ready_s - interpreter_s) * 1000:>13.0f} ms")
+        for import_ms, name in top_imports(module, cwd, args.top):
+            print(f"    {name:<40}{import_ms:>8.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import time of the lang_detect clients")
+    parser.add_argument("--modules", type=str, nargs="+", default=["client_grpc", "client_rest"],
+                      help="Modules to import")
+    parser.add_argument("--repeats", type=int, default=15,
+                      help="Interpreter starts per module, the median is reported")
+    parser.add_argument("--top", type=int, default=5,
+                      help="Slowest imports listed per module")
+    args = parser.parse_args()
+    run(args)
@@ -1,54 +1,54 @@
 import argparse
-import grpc
-import lang_detect.lang_detect_service_pb2
-import lang_detect.lang_detect_service_pb2_grpc
-import os
-from audio_converter import convert_audio
+
+from x2agi_speechkit import metrics, stubs
+from x2agi_speechkit.connections import ConnectionManager
+
+from window_sampler import detect_language
+
+def make_detector(stub, token, allowed_languages):
+    """detect(wav_bytes) for window_sampler.detect_language: one DetectFromAudio call, the response as a dict"""
+    metadata = [
+        ("authorization", f"Bearer {token}"),
+    ]
+
+    def detect(audio_data):
+        request = stubs.lang_detect_pb2.AudioLangDetectRequest(
+            audio_data=audio_data,
+            allowed_languages=allowed_languages
+        )
+        response = stub.DetectFromAudio(request, metadata=metadata)
+        return {
+            "allowed_language": response.allowed_language,
+            "allowed_language_confidence": response.allowed_language_confidence,
+            "detected_language": response.detected_language,
+            "detected_language_confidence": response.detected_language_confidence,
+        }
+
+    return detect
 
 def run(args):
-    converted_path = None
-    try:
-        if args.no_convert:
-            print("Skipping audio conversion")
-            audio_path = args.path
-        else:
-            print("Converting audio to 16kHz mono WAV...")
-            converted_path = convert_audio(args.path)
-            audio_path = converted_path
-
-        # Read audio data
-        with open(audio_path, "rb") as f:
-            audio_data = f.read(4 * 1024 * 1024)  # Read up to 4MB
-
-        # gRPC setup and request
-        with grpc.secure_channel(
-            "lang-detect.x2agi.com:8443",
-            grpc.ssl_channel_credentials(),
-            options=[
-                ("grpc.ssl_target_name_override", "lang-detect.x2agi.com"),
-                ("grpc.default_authority", "lang-detect.x2agi.com"),
-                ("grpc.keepalive_time_ms", 10000),
-                ("grpc.max_receive_message_length", 50 * 1024 * 1024)
-            ]
-        ) as channel:
-            stub = lang_detect.lang_detect_service_pb2_grpc.LangDetectorStub(channel)
-
-            metadata = [
-                ("authorization", f"Bearer {args.token}"),
-            ]
-
-            request = lang_detect.lang_detect_service_pb2.AudioLangDetectRequest(
-                audio_data=audio_data,
-                allowed_languages=args.allowed_languages.split(",") if args.allowed_languages else []
-            )
-            
-            response = stub.DetectFromAudio(request, metadata=metadata)
-            print(f"response={response}")
-
-    finally:
-        # Clean up temporary file
-        if converted_path and os.path.exists(converted_path):
-            os.remove(converted_path)
+    if args.no_convert:
+        print("Skipping audio conversion")
+    else:
+        print(f"Converting {args.windows} windows of {args.window_s}s to 16kHz mono WAV...")
+
+    # gRPC setup and request; the channel connects while the first window is converted
+    with ConnectionManager() as connections, metrics.start_export(args):
+        connections.warm(["lang_detect"], wait=False)
+        stub = stubs.lang_detect_pb2_grpc.LangDetectorStub(connections.channel("lang_detect"))
+
+        allowed_languages = args.allowed_languages.split(",") if args.allowed_languages else []
+        detect = make_detector(stub, args.token, allowed_languages)
+
+        # Windows spread over the file are detected concurrently and combined by weighted voting
+        combined, _ = detect_language(
+            detect, args.path, args.windows, args.window_s, args.concurrency, args.min_windows,
+            args.confidence_threshold, args.no_convert,
+            key="allowed_language" if allowed_languages else "detected_language"
+        )
+        response = stubs.lang_detect_pb2.LangDetectResponse(**combined)
+        print(f"response={response}")
+        print(connections.summary())
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -58,6 +58,17 @@ if __name__ == '__main__':
                       help="Comma-separated list of allowed languages (e.g., 'en,ru')")
     parser.add_argument("--no_convert", action="store_true", 
                       help="Skip audio conversion (use if file is already 16kHz mono WAV)")
+    parser.add_argument("--windows", type=int, default=5,
+                      help="Number of windows sampled across the file")
+    parser.add_argument("--window_s", type=float, default=20.0,
+                      help="Length of each window in seconds")
+    parser.add_argument("--concurrency", type=int, default=3,
+                      help="Windows detected at the same time")
+    parser.add_argument("--min_windows", type=int, default=2,
+                      help="Windows needed before an early exit")
+    parser.add_argument("--confidence_threshold", type=float, default=0.9,
+                      help="Combined confidence at which the remaining windows are skipped")
+    metrics.add_arguments(parser)
     args = parser.parse_args()
     
     run(args)
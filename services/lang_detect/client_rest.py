@@ -1,43 +1,30 @@
 import argparse
 import base64
 import os
+
 import requests
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
 
-# Import conversion function (can be commented out)
-from audio_converter import convert_audio
+from x2agi_speechkit import metrics
+from x2agi_speechkit.connections import ConnectionManager
+
+from window_sampler import detect_language
 
 # ==============================
 # Request Handling Module
 # ==============================
-def make_api_request(url: str, headers: dict, payload: dict) -> requests.Response:
-    """Make API request with retry logic"""
-    # Configure retry strategy
-    retry_strategy = Retry(
-        total=5,
-        backoff_factor=2,    # Base delay of 2 seconds
-        status_forcelist=[500, 502, 503, 504],
-        allowed_methods=["POST"],
-        raise_on_status=False,
-        backoff_jitter=0.3   # 30% jitter variation
-    )
-    
-    with requests.Session() as session:
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("https://", adapter)
-        
-        try:
-            response = session.post(
-                url,
-                headers=headers,
-                json=payload,
-                timeout=4
-            )
-            return response
-            
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(f"Request failed after retries: {str(e)}")
+def make_api_request(session: requests.Session, url: str, headers: dict, payload: dict) -> requests.Response:
+    """Make API request over the shared session, which retries transient errors with backoff"""
+    try:
+        response = session.post(
+            url,
+            headers=headers,
+            json=payload,
+            timeout=4
+        )
+        return response
+
+    except requests.exceptions.RequestException as e:
+        raise RuntimeError(f"Request failed after retries: {str(e)}")
 
 # ==============================
 # Main Function
@@ -51,47 +38,52 @@ def run(args):
         "Content-Type": "application/json",
     }
 
-    converted_path = None
-    try:
-        # Audio processing
-        if args.no_convert:
-            print("Skipping audio conversion")
-            audio_path = args.path
-        else:
-            print("Converting audio to 16kHz mono WAV...")
-            converted_path = convert_audio(args.path)
-            audio_path = converted_path
+    # Audio processing
+    if args.no_convert:
+        print("Skipping audio conversion")
+        if not os.path.exists(args.path):
+            raise FileNotFoundError(f"Audio file not found: {args.path}")
+    else:
+        print(f"Converting {args.windows} windows of {args.window_s}s to 16kHz mono WAV...")
 
-        # Read audio data
-        if not os.path.exists(audio_path):
-            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+    # One keep-alive session for all windows, connected while the first window is converted
+    connections = ConnectionManager(pool_size=args.concurrency)
+    connections.warm_sessions(["lang_detect"], wait=False)
+    exporter = metrics.start_export(args)
+    session = connections.session("lang_detect")
 
-        with open(audio_path, "rb") as audio_file:
-            audio_content = base64.b64encode(
-                audio_file.read(4 * 1024 * 1024)  # Read up to 4MB
-            ).decode("utf-8")
+    allowed_languages = args.allowed_languages.split(",") if args.allowed_languages else []
 
+    def detect(audio_bytes):
         # Prepare payload
         payload = {
-            "audio_data": audio_content,
-            "allowed_languages": args.allowed_languages.split(",") if args.allowed_languages else []
+            "audio_data": base64.b64encode(audio_bytes).decode("utf-8"),
+            "allowed_languages": allowed_languages
         }
+        response = make_api_request(session, url, headers, payload)
+        if not 200 <= response.status_code < 300:
+            raise RuntimeError(f"Failed ({response.status_code}): {response.text}")
+        return response.json()
 
-        # Make API request
-        print("Sending request...")
-        response = make_api_request(url, headers, payload)
-        
-        # Handle response
-        if 200 <= response.status_code < 300:
-            print("Success:")
-            print(f"response={response.json()}")
-        else:
-            print(f"Failed ({response.status_code}): {response.text}")
-            
+    # Windows spread over the file are detected concurrently and combined by weighted voting
+    print("Sending requests...")
+    try:
+        combined, _ = detect_language(
+            detect, args.path, args.windows, args.window_s, args.concurrency, args.min_windows,
+            args.confidence_threshold, args.no_convert,
+            key="allowed_language" if allowed_languages else "detected_language"
+        )
+    except RuntimeError as e:
+        print(e)
+        return
     finally:
-        # Clean up temporary file
-        if converted_path and os.path.exists(converted_path):
-            os.remove(converted_path)
+        connection_summary = connections.summary()
+        connections.close()
+        exporter.close()
+
+    print("Success:")
+    print(f"response={combined}")
+    print(connection_summary)
 
 # ==============================
 # CLI Interface
@@ -104,6 +96,17 @@ if __name__ == '__main__':
                       help="Comma-separated list of allowed languages (e.g., 'en,ru')")
     parser.add_argument("--no_convert", action="store_true", 
                       help="Skip audio conversion (use if file is already 16kHz mono WAV)")
+    parser.add_argument("--windows", type=int, default=5,
+                      help="Number of windows sampled across the file")
+    parser.add_argument("--window_s", type=float, default=20.0,
+                      help="Length of each window in seconds")
+    parser.add_argument("--concurrency", type=int, default=3,
+                      help="Windows detected at the same time")
+    parser.add_argument("--min_windows", type=int, default=2,
+                      help="Windows needed before an early exit")
+    parser.add_argument("--confidence_threshold", type=float, default=0.9,
+                      help="Combined confidence at which the remaining windows are skipped")
+    metrics.add_arguments(parser)
     args = parser.parse_args()
     
     run(args)
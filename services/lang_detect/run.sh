@@ -11,3 +11,9 @@ python client_rest.py \
     --token ${X2AGI_API_KEY} \
     --path ${REPO_ROOT}/example_data/lang_detect/example.wav \
     --allowed_languages en,ru
+
+python batch_grpc.py \
+    --token ${X2AGI_API_KEY} \
+    --manifest ${REPO_ROOT}/example_data/lang_detect/ \
+    --allowed_languages en,ru \
+    --output languages.ndjson
@@ -0,0 +1,73 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from x2agi_speechkit import metrics
+from x2agi_speechkit.lang_windows import combine_votes, plan_windows, spread_order
+
+from audio_converter import audio_duration_s, convert_window_to_buffer, read_wav_window
+
+
+def detect_language(detect, path: str, num_windows: int = 5, window_s: float = 20.0, concurrency: int = 3,
+                    min_windows: int = 2, confidence_threshold: float = 0.9, no_convert: bool = False,
+                    key: str = "detected_language", log=print):
+    """
+    Language of `path` from `num_windows` short windows instead of its beginning.
+
+    Windows are converted and passed to `detect(wav_bytes) -> dict` (the fields of
+    LangDetectResponse) on `concurrency` threads, in spread_order(). Once at least
+    `min_windows` results are in and the combined `key` confidence reaches
+    `confidence_threshold`, windows not yet started are cancelled.
+
+    Returns (combined result dict, list of (window, result) in completion order).
+    """
+    windows = plan_windows(audio_duration_s(path), num_windows, window_s)
+    order = spread_order(len(windows))
+    load = read_wav_window if no_convert else convert_window_to_buffer
+
+    stopped = threading.Event()
+
+    def detect_window(index):
+        start_s, duration_s = windows[index]
+        window_start = time.time()
+        with metrics.stage("lang_detect", "convert"):
+            audio_data = load(path, start_s, duration_s)
+        with metrics.stage("lang_detect", "detect_window"):
+            result = detect(audio_data)
+        if not stopped.is_set():
+            log(f"window {start_s:.1f}-{start_s + duration_s:.1f}s: {result['detected_language']} "
+                f"({float(result['detected_language_confidence']):.2f}), {time.time() - window_start:.2f}s")
+        return result
+
+    done = []
+    file_start = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    try:
+        pending = {pool.submit(detect_window, index): index for index in order}
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index = pending.pop(future)
+                done.append((windows[index], future.result()))
+            _, confidence = combine_votes([(result, window[1]) for window, result in done], key)
+            if pending and len(done) >= min_windows and confidence >= confidence_threshold:
+                log(f"early exit after {len(done)} of {len(windows)} windows (confidence {confidence:.2f})")
+                break
+    except BaseException:
+        metrics.observe_stage("lang_detect", "detect", time.monotonic() - file_start, failed=True)
+        raise
+    finally:
+        # Windows still queued are dropped, requests already sent are not waited for
+        stopped.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+    metrics.observe_stage("lang_detect", "detect", time.monotonic() - file_start)
+
+    votes = [(result, window[1]) for window, result in done]
+    detected_language, detected_confidence = combine_votes(votes, "detected_language")
+    allowed_language, allowed_confidence = combine_votes(votes, "allowed_language")
+    return {
+        "allowed_language": allowed_language,
+        "allowed_language_confidence": allowed_confidence,
+        "detected_language": detected_language,
+        "detected_language_confidence": detected_confidence,
+    }, done
@@ -1,27 +1,18 @@
 import argparse
-import requests
-import uuid
-import time
 import json
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
+import uuid
+
+from x2agi_speechkit import metrics
+from x2agi_speechkit.connections import ConnectionManager
+from x2agi_speechkit.progress_poller import AdaptivePoller
 
 def run(args):
     base_url = "https://postprocess-asr.x2agi.ru:8444" 
 
-    # Configure retry strategy
-    retry_strategy = Retry(
-        total=5,
-        backoff_factor=2,
-        status_forcelist=[500, 502, 503, 504],
-        allowed_methods=["POST", "GET"],
-        raise_on_status=False,
-        backoff_jitter=0.3
-    )
-
-    with requests.Session() as session:
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("https://",  adapter)
+    # The session retries transient errors with backoff and keeps its connection alive between polls
+    with ConnectionManager() as connections, metrics.start_export(args):
+        connections.warm_sessions(["postprocess_asr"], wait=False)
+        session = connections.session("postprocess_asr")
 
         job_id = str(uuid.uuid4())  # job id is used for routing, need to regenerate WITHIN retry loop - otherwise the request will go to the same failing endpoint
 
@@ -53,12 +44,13 @@ def run(args):
         }
 
         # Initial processing request
-        response = session.post(
-            f"{base_url}/postprocessAsrAsync",
-            headers=headers,
-            json=payload,
-            timeout=10
-        )
+        with metrics.stage("postprocess_asr", "upload"):
+            response = session.post(
+                f"{base_url}/postprocessAsrAsync",
+                headers=headers,
+                json=payload,
+                timeout=10
+            )
         
         if response.status_code != 200:
             raise RuntimeError(f"Failed to start processing: {response.status_code} - {response.text}")
@@ -67,6 +59,8 @@ def run(args):
         print(f"Server returned operation ID = {operation_id}")
 
         # Polling loop
+        poller = AdaptivePoller(fixed_interval=2)
+        timer = metrics.OperationTimer("postprocess_asr")
         while True:
             progress_resp = session.get(
                 f"{base_url}/getProgress?operation_id={operation_id}",
@@ -79,20 +73,26 @@ def run(args):
             
             progress_data = progress_resp.json()
             print(f"Progress: {progress_data['progress']}%, Status: {progress_data['status']}")
+            poller.record(progress_data["progress"])
+            timer.record(progress_data["status"])
 
             if progress_data["status"] == "completed":
+                timer.done()
                 break
             elif progress_data["status"] == "failed":
+                timer.done(failed=True)
                 raise RuntimeError("Processing failed on server")
 
-            time.sleep(2)
+            poller.sleep()
+        print(poller.summary())
 
         # Get final results
-        result_resp = session.get(
-            f"{base_url}/getRecognition?operation_id={operation_id}",
-            headers=headers,
-            timeout=10
-        )
+        with metrics.stage("postprocess_asr", "download"):
+            result_resp = session.get(
+                f"{base_url}/getRecognition?operation_id={operation_id}",
+                headers=headers,
+                timeout=10
+            )
 
         if result_resp.status_code != 200:
             raise RuntimeError(f"Failed to retrieve results: {result_resp.status_code}")
@@ -106,6 +106,7 @@ def run(args):
             f.write(result_data["speakers"] + "\n")
         with open(args.output_text, "w", encoding="utf-8") as f:
             f.write(result_data["utterances"] + "\n")
+        print(connections.summary())
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -124,6 +125,7 @@ if __name__ == '__main__':
                        help="Minimum pause (sec) to keep utterances separate (default: 5.0)")
     parser.add_argument("--as_monologue", action="store_true", 
                        help="Force single speaker mode")
+    metrics.add_arguments(parser)
 
     args = parser.parse_args()
     run(args)
@@ -2,19 +2,28 @@
 import tempfile
 import os
 import shutil
+import struct
+import wave
 
-def convert_audio(input_path: str) -> str:
+try:
+    import numpy as np
+except ImportError:  # without NumPy every file goes through SoX
+    np = None
+
+TARGET_SAMPLE_RATE = 16000
+CHUNK_SIZE = 1024 * 1024  # bytes of source audio decoded per step of the in-process engine
+RESAMPLER_HALF_TAPS = 16  # anti-aliasing filter half-length, per output sample period
+
+
+def _convert_with_sox(input_path: str) -> str:
     """
     Convert audio to 16kHz mono WAV using SoX.
     Returns path to temporary converted file.
     """
-    if not os.path.exists(input_path):
-        raise FileNotFoundError(f"Input file not found: {input_path}")
-    
     # Create temporary file for output
     fd, output_path = tempfile.mkstemp(suffix=".wav")
     os.close(fd)
-    
+
     try:
         # Build SoX command
         command = [
@@ -25,7 +34,7 @@ def convert_audio(input_path: str) -> str:
             "-e", "signed-integer", # PCM encoding
             output_path
         ]
-        
+
         # Execute conversion
         result = subprocess.run(
             command,
@@ -34,14 +43,288 @@ def convert_audio(input_path: str) -> str:
             check=True,
             text=True
         )
-        
+
         return output_path
-        
+
     except subprocess.CalledProcessError as e:
         if os.path.exists(output_path):
             os.remove(output_path)
         raise RuntimeError(f"SoX conversion failed: {e.stderr}") from e
+    except FileNotFoundError:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        if shutil.which("sox") is None:
+            raise RuntimeError("SoX not found. Please install SoX first")
+        raise
+
+
+def _open_pcm_wav(input_path: str):
+    """
+    Open input as a PCM WAV the in-process engine can decode.
+    Returns None for anything else (compressed codecs, float WAV, missing NumPy).
+    """
+    if np is None:
+        return None
+    try:
+        return wave.open(input_path, "rb")
+    except (wave.Error, EOFError):
+        return None
+
+
+def _wav_header(num_frames: int) -> bytes:
+    data_size = num_frames * 2
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, 1, TARGET_SAMPLE_RATE, TARGET_SAMPLE_RATE * 2, 2, 16,
+        b"data", data_size,
+    )
+
+
+def _decode_frames(raw: bytes, sample_width: int, channels: int):
+    """Decode interleaved PCM frames into mono float32 samples in [-1, 1)."""
+    if sample_width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = (((b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)) << 8) >> 8).astype(np.float32) / 8388608.0
+    else:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    if channels > 1:
+        # SoX "-c 1" mixes channels down by averaging them
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def _quantize(samples) -> bytes:
+    return np.clip(np.rint(samples * 32768.0), -32768, 32767).astype("<i2").tobytes()
+
+
+class _Resampler:
+    """
+    Streaming resampler: windowed-sinc low-pass (when downsampling) followed by
+    linear interpolation onto the output grid. State is carried between blocks,
+    so feeding a file block by block gives the same result as feeding it at once.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int):
+        self._step = src_rate / dst_rate
+        self._taps = None
+        self._history = None
+        self._skip = 0
+        if src_rate > dst_rate:
+            half = int(np.ceil(RESAMPLER_HALF_TAPS * self._step))
+            cutoff = 0.45 / self._step  # cycles per input sample, just below the output Nyquist
+            n = np.arange(-half, half + 1)
+            taps = np.sinc(2 * cutoff * n) * np.blackman(2 * half + 1)
+            self._taps = (taps / taps.sum()).astype(np.float32)
+            self._history = np.zeros(2 * half, dtype=np.float32)
+            self._skip = half  # compensate the filter's group delay
+        self._buf = np.zeros(0, dtype=np.float32)
+        self._pos = 0.0
+
+    def process(self, samples):
+        if self._taps is not None:
+            samples = np.concatenate((self._history, samples))
+            self._history = samples[len(samples) - len(self._history):]
+            samples = np.convolve(samples, self._taps, mode="valid").astype(np.float32)
+            if self._skip:
+                skipped = min(self._skip, len(samples))
+                samples = samples[skipped:]
+                self._skip -= skipped
+
+        buf = np.concatenate((self._buf, samples))
+        count = int(np.ceil((len(buf) - 1 - self._pos) / self._step)) if len(buf) - 1 > self._pos else 0
+        positions = self._pos + self._step * np.arange(count)
+        idx = positions.astype(np.int64)
+        frac = (positions - idx).astype(np.float32)
+        out = buf[idx] * (1.0 - frac) + buf[idx + 1] * frac
+
+        next_pos = self._pos + self._step * count
+        consumed = min(int(next_pos), len(buf))
+        self._buf = buf[consumed:]
+        self._pos = next_pos - consumed
+        return out
+
+    def flush(self):
+        """Push the samples still held by the filter and interpolator."""
+        pad = (len(self._history) if self._history is not None else 0) // 2 + 2
+        return self.process(np.zeros(pad, dtype=np.float32))
+
+
+def _iter_pcm_wav(reader, chunk_size: int):
+    channels = reader.getnchannels()
+    sample_width = reader.getsampwidth()
+    rate = reader.getframerate()
+    num_frames = reader.getnframes()
+    out_frames = num_frames if rate == TARGET_SAMPLE_RATE else int(round(num_frames * TARGET_SAMPLE_RATE / rate))
+    block_frames = max(1, chunk_size // (sample_width * channels))
+
+    yield _wav_header(out_frames)
+
+    if (rate, channels, sample_width) == (TARGET_SAMPLE_RATE, 1, 2):
+        # Already in the target format: pass the PCM through untouched
+        while True:
+            raw = reader.readframes(block_frames)
+            if not raw:
+                return
+            yield raw
+
+    resampler = _Resampler(rate, TARGET_SAMPLE_RATE) if rate != TARGET_SAMPLE_RATE else None
+    remaining = out_frames
+    while remaining > 0:
+        raw = reader.readframes(block_frames)
+        if raw:
+            samples = _decode_frames(raw, sample_width, channels)
+            if resampler is not None:
+                samples = resampler.process(samples)
+        elif resampler is not None:
+            samples = resampler.flush()
+            resampler = None
+        else:
+            break
+        samples = samples[:remaining]
+        remaining -= len(samples)
+        if len(samples):
+            yield _quantize(samples)
+
+    if remaining > 0:
+        # Keep the data size promised by the header
+        yield bytes(remaining * 2)
+
+
+def _sox_info(input_path: str, flag: str) -> int:
+    """Query `sox --i` for a numeric property of the input (0 if unavailable)."""
+    try:
+        result = subprocess.run(
+            ["sox", "--i", flag, input_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True,
+            text=True
+        )
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"SoX conversion failed: {e.stderr}") from e
     except FileNotFoundError:
         if shutil.which("sox") is None:
             raise RuntimeError("SoX not found. Please install SoX first")
         raise
+    return int(float(result.stdout.strip() or 0))
+
+
+def _iter_sox_stdout(input_path: str, chunk_size: int):
+    """
+    Convert with SoX writing to a pipe and yield its stdout as it is produced.
+    SoX cannot seek back to patch the WAV header of a pipe, so when the input
+    length is known it writes raw PCM and the header is built here, with the
+    data trimmed or padded to exactly the announced length.
+    """
+    num_samples = _sox_info(input_path, "-s")
+    rate = _sox_info(input_path, "-r")
+    out_frames = int(round(num_samples * TARGET_SAMPLE_RATE / rate)) if num_samples and rate else None
+
+    command = [
+        "sox", input_path,
+        "-r", "16000",          # Sample rate
+        "-c", "1",              # Mono channel
+        "-b", "16",             # 16-bit depth
+        "-e", "signed-integer", # PCM encoding
+        "-L",                   # Little-endian, as in WAV
+        "-t", "raw" if out_frames is not None else "wav",
+        "-",
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        remaining = None
+        if out_frames is not None:
+            yield _wav_header(out_frames)
+            remaining = out_frames * 2
+
+        while True:
+            chunk = process.stdout.read(chunk_size)
+            if not chunk:
+                break
+            if remaining is not None:
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+            if chunk:
+                yield chunk
+
+        stderr = process.stderr.read().decode("utf-8", errors="replace")
+        if process.wait() != 0:
+            raise RuntimeError(f"SoX conversion failed: {stderr}")
+        if remaining:
+            yield bytes(remaining)
+    finally:
+        # Also reached when the consumer stops early: don't leave SoX behind
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def iter_converted_audio(input_path: str, chunk_size: int = CHUNK_SIZE):
+    """
+    Convert audio to 16kHz mono WAV and yield it as a stream of byte chunks.
+    The first chunk is the WAV header. PCM WAV input is converted in-process with
+    NumPy; other codecs are piped through SoX without a temporary file.
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input file not found: {input_path}")
+
+    reader = _open_pcm_wav(input_path)
+    if reader is not None:
+        with reader:
+            yield from _iter_pcm_wav(reader, chunk_size)
+        return
+
+    yield from _iter_sox_stdout(input_path, chunk_size)
+
+
+def convert_audio_to_buffer(input_path: str, max_bytes: int = None) -> bytes:
+    """
+    Convert audio to 16kHz mono WAV in memory.
+    Returns the WAV file (header included) as bytes. With `max_bytes` conversion
+    stops once that many bytes are produced and the result is truncated.
+    """
+    if max_bytes is None:
+        return b"".join(iter_converted_audio(input_path))
+
+    chunks = []
+    size = 0
+    stream = iter_converted_audio(input_path)
+    try:
+        for chunk in stream:
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                break
+    finally:
+        stream.close()
+    return b"".join(chunks)[:max_bytes]
+
+
+def convert_audio(input_path: str) -> str:
+    """
+    Convert audio to 16kHz mono WAV.
+    Returns path to temporary converted file.
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input file not found: {input_path}")
+
+    reader = _open_pcm_wav(input_path)
+    if reader is None:
+        return _convert_with_sox(input_path)
+
+    fd, output_path = tempfile.mkstemp(suffix=".wav")
+    try:
+        with reader, os.fdopen(fd, "wb") as out:
+            for chunk in _iter_pcm_wav(reader, CHUNK_SIZE):
+                out.write(chunk)
+    except Exception:
+        os.remove(output_path)
+        raise
+    return output_path
@@ -0,0 +1,458 @@
+import argparse
+import functools
+import glob
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import grpc
+
+from x2agi_speechkit import metrics, stubs
+from x2agi_speechkit.connections import ConnectionManager
+from x2agi_speechkit.trace import JobTrace
+
+from audio_converter import convert_audio
+from client_grpc import (
+    CHUNK_SIZE,
+    COMPRESSION,
+    ENDPOINT,
+    call_metadata,
+    get_progress,
+    iter_file_chunks,
+    load_oracle_speaker_labels,
+    open_audio_chunks,
+    stream_recognition,
+    submit_recognition,
+    write_responses,
+)
+from job_journal import IN_FLIGHT, JobJournal
+from oracle_cache import DEFAULT_CACHE_DIR, OracleClipCache
+from pipeline import Finished, Pipeline
+from progress_scheduler import OperationFailed, ProgressScheduler
+from result_cache import DEFAULT_RESULT_CACHE_DIR, ResultCache, SpooledAudio
+from result_sink import ResultSink
+from vad import TimeMap, open_vad_audio, write_vad_audio
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".ogg", ".opus", ".m4a", ".aac", ".wma", ".amr")
+
+
+def read_manifest(manifest, output_dir, lang):
+    """
+    Expand a manifest into a list of jobs: dicts with "path", "save" and "lang".
+    The manifest is a directory (searched recursively for audio files), a glob
+    pattern, or a JSONL file with one {"path": ..., "save": ..., "lang": ...}
+    object per line ("save" and "lang" are optional, relative paths are resolved
+    against the JSONL file's directory). A `lang` of None is left to the caller
+    to detect.
+    """
+    jobs = []
+    if os.path.isdir(manifest):
+        for root, _, files in os.walk(manifest):
+            for name in sorted(files):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    save = os.path.splitext(os.path.relpath(path, manifest))[0]
+                    jobs.append({"path": path, "save": save, "lang": lang})
+        jobs.sort(key=lambda job: job["path"])
+    elif manifest.endswith((".jsonl", ".json")) and os.path.isfile(manifest):
+        manifest_dir = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, "r", encoding="utf-8") as inp:
+            for line_num, line in enumerate(inp, 1):
+                if not line.strip():
+                    continue
+                try:
+                    info = json.loads(line)
+                except json.JSONDecodeError:
+                    raise ValueError(f"Invalid JSON in line {line_num} of {manifest}")
+                path = os.path.normpath(os.path.join(manifest_dir, info["path"]))
+                save = info.get("save") or os.path.splitext(os.path.basename(path))[0]
+                jobs.append({"path": path, "save": save, "lang": info.get("lang", lang)})
+    else:
+        for path in sorted(glob.glob(manifest, recursive=True)):
+            if os.path.isfile(path):
+                save = os.path.splitext(os.path.basename(path))[0]
+                jobs.append({"path": path, "save": save, "lang": lang})
+
+    seen = {}
+    for job in jobs:
+        job["save"] = os.path.join(output_dir, job["save"])
+        if job["save"] in seen:
+            raise ValueError(f"Output name collision: {seen[job['save']]} and {job['path']} both map to {job['save']}")
+        seen[job["save"]] = job["path"]
+        if job["lang"] is not None and job["lang"] not in ["en", "ru"]:
+            raise ValueError(f"expected lang: 'en' or 'ru', got '{job['lang']}' for {job['path']}")
+    return jobs
+
+
+def job_log(args, job):
+    if args.verbose:
+        return lambda message: print(f"[{job['path']}] {message}")
+    return lambda message: None
+
+
+def convert_job(args, job):
+    """
+    Convert stage of the pipeline, run in a worker process: write the upload
+    audio of `job` (16kHz mono WAV, with --vad without long silences) to a
+    temp file. Returns a copy of the job with "audio_path", "vad_ranges",
+    "convert_s" and "convert_started_at" (metrics and traces are recorded by the
+    parent: whatever the worker process recorded would stay there);
+    "audio_path" is None when --vad finds no speech. Jobs resuming an
+    operation are passed through unconverted.
+    """
+    job = dict(job)
+    if "resume" in job:
+        return job
+    job["convert_started_at"] = time.time()
+    start = time.monotonic()
+    if args.vad:
+        audio_path, time_map = write_vad_audio(job["path"], args.no_convert, args.vad_min_silence_s,
+                                               args.vad_threshold_db, log=job_log(args, job))
+        job["vad_ranges"] = time_map.ranges if time_map is not None else None
+    else:
+        audio_path = convert_audio(job["path"])
+    job["audio_path"] = audio_path
+    job["convert_s"] = time.monotonic() - start
+    return job
+
+
+def upload_job(stub, args, job, oracle_speaker_labels, result_cache=None, journal=None, trace=None):
+    """
+    Convert and upload one file; returns the submitted recognition job,
+    or None when --vad finds no speech and no job is needed. With a
+    result_cache.ResultCache, a hit returns {"cached": responses} instead.
+    With a job_journal.JobJournal, the "converted" and "uploaded" transitions are recorded.
+    A job that went through convert_job() is uploaded from its "audio_path"
+    (the caller removes the file), otherwise it is converted while uploading.
+    With a JobTrace, the conversion and the upload are traced.
+    """
+    time_map = None
+    if "audio_path" in job:
+        metrics.observe_stage("stt_async", "convert", job["convert_s"])
+        if trace is not None:
+            trace.add("convert", "convert", job["convert_started_at"], job["convert_started_at"] + job["convert_s"],
+                      path=job["path"])
+        if job["audio_path"] is None:
+            return None
+        time_map = TimeMap(job["vad_ranges"]) if job.get("vad_ranges") else None
+        audio_chunks = iter_file_chunks(job["audio_path"], CHUNK_SIZE)
+        if journal is not None:
+            journal.record(job, "converted")
+    elif args.vad:
+        audio_chunks, time_map = open_vad_audio(job["path"], args.no_convert, args.vad_min_silence_s,
+                                                args.vad_threshold_db, log=job_log(args, job))
+        if audio_chunks is None:
+            return None
+    else:
+        audio_chunks = open_audio_chunks(job["path"], args.no_convert)
+
+    if journal is not None and "audio_path" not in job:
+        def record_converted(chunks):
+            yield from chunks
+            journal.record(job, "converted")
+        audio_chunks = record_converted(audio_chunks)
+
+    audio = cache_key = None
+    if result_cache is not None:
+        audio = SpooledAudio(audio_chunks)
+        audio_chunks = audio.chunks()
+        cache_key = result_cache.key(audio.digest, job["lang"], oracle_speaker_labels,
+                                     args.restrict_to_oracle_speaker_labels)
+        cached = result_cache.lookup(cache_key, audio.duration_s)
+        if cached is not None:
+            audio.close()
+            return {"cached": cached, "time_map": time_map}
+    try:
+        recognition = submit_recognition(
+            stub, args.token, job["lang"], audio_chunks, oracle_speaker_labels,
+            args.restrict_to_oracle_speaker_labels, log=job_log(args, job),
+            read_ahead=args.read_ahead, compression=COMPRESSION[args.grpc_compression], trace=trace
+        )
+    finally:
+        if audio is not None:
+            audio.close()
+    recognition["time_map"] = time_map
+    recognition["cache_key"] = cache_key
+    if journal is not None:
+        journal.record(
+            job, "uploaded", operation_id=recognition["operation_id"], job_id=dict(recognition["metadata"])["x-job-id"],
+            lang=job["lang"], audio_duration_s=recognition["audio_duration_s"],
+            vad_ranges=time_map.ranges if time_map is not None else None, cache_key=cache_key,
+        )
+    return recognition
+
+
+def resume_job(args, entry):
+    """The recognition job of a journal entry in an IN_FLIGHT state, to poll and download it without re-uploading."""
+    return {
+        "operation_id": entry["operation_id"],
+        "metadata": call_metadata(args.token, entry["job_id"], entry["lang"]),
+        "audio_duration_s": entry["audio_duration_s"],
+        "time_map": TimeMap(entry["vad_ranges"]) if entry.get("vad_ranges") else None,
+        "cache_key": entry.get("cache_key"),
+        "resumed": True,
+    }
+
+
+def download_job(stub, job, recognition, ndjson=False, result_cache=None, journal=None, trace=None):
+    """Stream the results of a completed (or cached) job into its .speakers/.text (and .ndjson) output."""
+    os.makedirs(os.path.dirname(os.path.abspath(job["save"])), exist_ok=True)
+    record = None
+    with ResultSink(job["save"], ndjson) as sink:
+        if recognition is None:
+            pass  # no speech: empty outputs
+        elif "cached" in recognition:
+            write_responses(recognition["cached"], sink, recognition["time_map"])
+        else:
+            if result_cache is not None and recognition["cache_key"] is not None:
+                record = []
+            stream_recognition(stub, recognition, sink, recognition["time_map"], record, trace)
+            if journal is not None:
+                journal.record(job, "downloaded")
+    if record is not None:
+        result_cache.store(recognition["cache_key"], record)
+    if journal is not None:
+        journal.record(job, "written")
+    return sink.segments
+
+
+def run(args):
+    jobs = read_manifest(args.manifest, args.output_dir, args.lang)
+    journal = JobJournal(args.journal) if args.journal else None
+    if journal is not None:
+        print(journal.summary(jobs))
+
+    def outputs_exist(job):
+        return os.path.exists(job["save"] + ".speakers") and os.path.exists(job["save"] + ".text")
+
+    def is_written(job):
+        entry = journal.state(job) if journal is not None else None
+        return entry is not None and entry["state"] == "written" and outputs_exist(job)
+
+    if args.skip_existing:
+        jobs = [job for job in jobs if not outputs_exist(job)]
+    # Jobs the journal has seen through are done; jobs with an operation in flight resume polling
+    jobs = [job for job in jobs if not is_written(job)]
+    print(f"{len(jobs)} files to process, concurrency={args.concurrency}")
+    if not jobs:
+        if journal is not None:
+            journal.close()
+        return 0
+
+    exporter = metrics.start_export(args)
+    # All jobs are multiplexed as concurrent HTTP/2 streams over a small pool of
+    # channels, connected while the oracle clips are loaded
+    connections = ConnectionManager(args.num_channels, args.insecure, endpoints={"stt_async": args.endpoint})
+    connections.warm(["stt_async"], wait=False)
+
+    # Oracle clips are shared by all jobs: load them once
+    cache = None
+    if args.oracle_speakers and not args.no_oracle_cache:
+        cache = OracleClipCache(args.oracle_cache_dir, args.oracle_cache_max_mb * 1024 * 1024)
+    # The clips are shared by all jobs, their conversion gets a trace of its own
+    oracle_trace = JobTrace("oracle clips") if args.trace and args.oracle_speakers else None
+    try:
+        oracle_speaker_labels = load_oracle_speaker_labels(args.oracle_speakers, args.no_convert, cache=cache,
+                                                           workers=args.oracle_workers, trace=oracle_trace)
+    except BaseException:
+        connections.close()
+        if journal is not None:
+            journal.close()
+        exporter.close()
+        raise
+    finally:
+        if cache is not None:
+            cache.close()
+    if cache is not None:
+        print(cache.summary())
+    if oracle_trace is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+        oracle_trace.save(os.path.join(args.output_dir, "oracle_clips.trace.json"))
+    print(f"len(oracle_speaker_labels)={len(oracle_speaker_labels)}")
+    result_cache = None
+    if args.result_cache:
+        result_cache = ResultCache(args.result_cache_dir, args.result_cache_max_mb * 1024 * 1024)
+
+
+    # Every file goes through convert -> upload -> poll -> download, each stage
+    # with its own workers and a bounded queue in front of it. Conversion runs on
+    # a process pool (--convert_workers) or, without one, while uploading; while
+    # the server is processing, no thread waits on a job: the shared scheduler
+    # polls its progress and the job moves on to the download pool.
+    outcomes = queue.Queue()
+
+    def on_result(job, num_segments, error):
+        if job.get("audio_path") and os.path.exists(job["audio_path"]):
+            os.remove(job["audio_path"])  # converted, but cancelled before the upload
+        if job.get("trace") is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(job["save"])), exist_ok=True)
+            job["trace"].save(job["save"] + ".trace.json")
+        outcomes.put((job, error, num_segments))
+
+    pipeline = Pipeline(on_result, args.queue_size)
+
+    def upload(job):
+        # Round-robin over the pool, passing over channels whose connection is down
+        job["stub"] = stub = stubs.stt_async_pb2_grpc.AsyncRecognizerStub(connections.channel("stt_async"))
+        job["trace"] = trace = JobTrace(job["path"]) if args.trace else None
+        try:
+            recognition = None
+            entry = job.pop("resume", None)
+            if entry is not None:
+                recognition = resume_job(args, entry)
+                if trace is not None:
+                    trace.identify(job_id=dict(recognition["metadata"])["x-job-id"], operation_id=recognition["operation_id"])
+                try:
+                    get_progress(stub, recognition, trace)
+                except grpc.RpcError as e:
+                    # Any other error fails the job but leaves its entry in flight:
+                    # the operation may well exist, and the next run resumes it
+                    if e.code() != grpc.StatusCode.NOT_FOUND:
+                        raise
+                    print(f"[{job['path']}] operation {recognition['operation_id']} is gone, uploading again")
+                    metrics.RETRIES.inc(service="stt_async", transport="grpc")
+                    recognition = None
+                else:
+                    print(f"[{job['path']}] resuming operation {recognition['operation_id']}")
+            if recognition is None:
+                try:
+                    recognition = upload_job(stub, args, job, oracle_speaker_labels, result_cache, journal, trace)
+                    if recognition is None or "cached" in recognition:
+                        return Finished(download_job(stub, job, recognition, args.ndjson, journal=journal))
+                except Exception as e:
+                    if journal is not None:
+                        journal.record(job, "failed", error=str(e))
+                    raise
+            if journal is not None:
+                journal.record(job, "polling")
+            job["recognition"] = recognition
+            return job
+        finally:
+            if job.get("audio_path") and os.path.exists(job["audio_path"]):
+                os.remove(job["audio_path"])
+
+    def poll(job):
+        timer = metrics.OperationTimer("stt_async")
+
+        def poll_progress():
+            response = get_progress(job["stub"], job["recognition"], job["trace"])
+            timer.record(response.status)
+            return response
+
+        future = scheduler.track(poll_progress, job["recognition"]["audio_duration_s"])
+        future.add_done_callback(lambda future: timer.done(failed=future.cancelled() or future.exception() is not None))
+        if journal is not None:
+            def record_failed(future):
+                if isinstance(future.exception(), OperationFailed):
+                    journal.record(job, "failed", error=str(future.exception()))  # start over next time
+            future.add_done_callback(record_failed)
+        return future
+
+    def download(job):
+        # On failure the operation stays in the journal: the next run downloads it again
+        return download_job(job["stub"], job, job["recognition"], args.ndjson, result_cache, journal, job["trace"])
+
+    if args.convert_workers > 0 and (args.vad or not args.no_convert):
+        pipeline.add_stage("convert", functools.partial(convert_job, args), args.convert_workers, kind="process")
+    pipeline.add_stage("upload", upload, args.upload_workers)
+    pipeline.add_stage("poll", poll, args.concurrency, kind="async")
+    pipeline.add_stage("download", download, args.download_workers)
+
+    on_progress = None
+    if args.verbose:
+        on_progress = lambda response: print(f"[{response.operation_id}] Progress: {response.progress}%, Status: {response.status}")
+
+    batch_start = time.time()
+    failed = []
+    try:
+        with ProgressScheduler(max_polls_per_second=args.max_polls_per_second, on_progress=on_progress) as scheduler, \
+                pipeline:
+
+            def feed():
+                for job in jobs:
+                    job["start"] = time.time()
+                    # Jobs with an operation in flight skip conversion and resume polling
+                    entry = journal.state(job) if journal is not None else None
+                    if entry is not None and entry["state"] in IN_FLIGHT:
+                        job["resume"] = entry
+                    pipeline.put(job)
+
+            feeder = threading.Thread(target=feed, daemon=True)
+            feeder.start()
+            next_status = time.monotonic() + args.stats_interval
+            done = 0
+            while done < len(jobs):
+                try:
+                    timeout = max(0.0, next_status - time.monotonic()) if args.stats_interval > 0 else None
+                    job, error, num_segments = outcomes.get(timeout=timeout)
+                except queue.Empty:
+                    print(f"pipeline: {pipeline.status()}")
+                    next_status += args.stats_interval
+                    continue
+                done += 1
+                elapsed = time.time() - job["start"]
+                if error is None:
+                    print(f"[{done}/{len(jobs)}] ok {job['path']} -> {job['save']} ({num_segments} segments, {elapsed:.1f}s)")
+                else:
+                    failed.append(job)
+                    print(f"[{done}/{len(jobs)}] FAILED {job['path']}: {error}")
+            feeder.join()
+    finally:
+        connection_summary = connections.summary()
+        connections.close()
+        if journal is not None:
+            journal.close()
+        exporter.close()
+
+    print("----")
+    print(pipeline.summary())
+    print(scheduler.summary())
+    if result_cache is not None:
+        print(result_cache.summary())
+    print(connection_summary)
+    print(f"processed {len(jobs)} files in {time.time() - batch_start:.1f}s, failed: {len(failed)}")
+    return len(failed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--token", type=str, required=True, help="IAM token or API key")
+    parser.add_argument("--lang", type=str, required=True, help="Default language of input audio: ['ru', 'en']")
+    parser.add_argument("--manifest", type=str, required=True, help="directory, glob pattern (quote it) or JSONL file with one {\"path\": ...} per line")
+    parser.add_argument("--output_dir", type=str, required=True, help="directory for <name>.speakers and <name>.text outputs")
+    parser.add_argument("--concurrency", type=int, default=16, help="maximum number of submitted operations the server is processing at once")
+    parser.add_argument("--convert_workers", type=int, default=0, help="processes converting files ahead of the upload (0: convert while uploading)")
+    parser.add_argument("--upload_workers", type=int, default=8, help="maximum number of files uploaded at once")
+    parser.add_argument("--download_workers", type=int, default=4, help="maximum number of results downloaded at once")
+    parser.add_argument("--queue_size", type=int, default=4, help="jobs waiting in front of each pipeline stage; bounds the converted files waiting for upload")
+    parser.add_argument("--stats_interval", type=float, default=0, help="print the busy workers and queue depth of every stage this often, in seconds (0: off)")
+    parser.add_argument("--max_polls_per_second", type=float, default=5.0, help="GetProgress budget shared by all jobs")
+    parser.add_argument("--num_channels", type=int, default=1, help="number of gRPC channels the jobs are spread over")
+    parser.add_argument("--read_ahead", type=int, default=0, help="read this many audio chunks ahead of each upload on a background thread, with adaptive message size (0: off)")
+    parser.add_argument("--grpc_compression", type=str, default="none", choices=list(COMPRESSION), help="compress upload messages (PCM audio gains little)")
+    parser.add_argument("--endpoint", type=str, default=ENDPOINT, help="gRPC endpoint host:port")
+    parser.add_argument("--insecure", action="store_true", help="plaintext channel, e.g. to a local mock_server.py")
+    parser.add_argument("--restrict_to_oracle_speaker_labels", action="store_true", help="restrict speakers to oracle")
+    parser.add_argument("--oracle_speakers", type=str, default=None, help="jsonl file with audio_filepath and speaker_label, shared by all files")
+    parser.add_argument("--vad", action="store_true", help="drop long silences before upload (timestamps are mapped back); files without speech are skipped")
+    parser.add_argument("--vad_min_silence_s", type=float, default=1.0, help="shortest silence removed by --vad")
+    parser.add_argument("--vad_threshold_db", type=float, default=None, help="speech level threshold of --vad in dBFS (default: adaptive)")
+    parser.add_argument("--oracle_cache_dir", type=str, default=DEFAULT_CACHE_DIR, help="directory of the converted oracle clip cache")
+    parser.add_argument("--oracle_cache_max_mb", type=int, default=512, help="size cap of the oracle clip cache, least recently used clips are evicted")
+    parser.add_argument("--no_oracle_cache", action="store_true", help="always convert oracle clips, bypassing the cache")
+    parser.add_argument("--oracle_workers", type=int, default=None, help="maximum number of processes converting oracle clips in parallel (default: one per core; small sets are converted in-process)")
+    parser.add_argument("--result_cache", action="store_true", help="reuse the results of audio recognized before with the same options instead of submitting it again")
+    parser.add_argument("--result_cache_dir", type=str, default=DEFAULT_RESULT_CACHE_DIR, help="directory of the result cache")
+    parser.add_argument("--result_cache_max_mb", type=int, default=256, help="size cap of the result cache, least recently used results are evicted")
+    parser.add_argument("--ndjson", action="store_true", help="also write <name>.ndjson with one JSON segment per line")
+    parser.add_argument("--skip_existing", action="store_true", help="skip files whose .speakers and .text outputs already exist")
+    parser.add_argument("--journal", type=str, default=None, help="crash-safe JSONL log of job states; a restarted run resumes in-flight operations instead of re-uploading")
+    parser.add_argument("--no_convert", action="store_true", help="Skip audio conversion (use if files are already 16kHz mono WAV)")
+    parser.add_argument("--trace", action="store_true", help="write a timeline of every job to <name>.trace.json (Chrome trace JSON, merge them with python -m x2agi_speechkit.trace merge)")
+    parser.add_argument("--verbose", action="store_true", help="print per-job progress")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    sys.exit(1 if run(args) else 0)
@@ -0,0 +1,93 @@
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+from audio_converter import _convert_with_sox, convert_audio_to_buffer
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+def sox_to_buffer(input_path: str) -> bytes:
+    """The pre-existing path: SoX subprocess, temp WAV, read back into memory."""
+    converted_path = _convert_with_sox(input_path)
+    try:
+        with open(converted_path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(converted_path)
+
+
+def make_source_copy(input_path: str, out_dir: str, rate: int, channels: int) -> str:
+    """Re-encode a 16kHz mono example at another rate/channel count, so the resampler is exercised."""
+    with wave.open(input_path, "rb") as r:
+        src_rate = r.getframerate()
+        samples = np.frombuffer(r.readframes(r.getnframes()), dtype="<i2").astype(np.float32)
+    t_out = np.arange(int(len(samples) * rate / src_rate)) * (src_rate / rate)
+    resampled = np.interp(t_out, np.arange(len(samples)), samples).astype("<i2")
+    out_path = os.path.join(out_dir, os.path.basename(input_path))
+    with wave.open(out_path, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(np.repeat(resampled[:, None], channels, axis=1).tobytes())
+    return out_path
+
+
+def best_time(fn, path, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(args):
+    paths = sorted(glob.glob(os.path.join(args.data_dir, "**", "*.wav"), recursive=True))
+    if not paths:
+        raise FileNotFoundError(f"No .wav files found under {args.data_dir}")
+
+    has_sox = shutil.which("sox") is not None
+    if not has_sox:
+        print("SoX not found: reporting the in-process engine only")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.source_rate:
+            paths = [make_source_copy(p, tmp_dir, args.source_rate, args.source_channels) for p in paths]
+
+        total_audio_s = total_numpy = total_sox = 0.0
+        print(f"{'file':<40}{'audio_s':>10}{'numpy_ms':>12}{'sox_ms':>12}")
+        for path in paths:
+            with wave.open(path, "rb") as r:
+                audio_s = r.getnframes() / r.getframerate()
+            numpy_s = best_time(convert_audio_to_buffer, path, args.repeat)
+            sox_s = best_time(sox_to_buffer, path, args.repeat) if has_sox else None
+            total_audio_s += audio_s
+            total_numpy += numpy_s
+            total_sox += sox_s or 0.0
+            sox_col = f"{sox_s * 1000:>12.2f}" if sox_s is not None else f"{'-':>12}"
+            print(f"{os.path.basename(path):<40}{audio_s:>10.2f}{numpy_s * 1000:>12.2f}{sox_col}")
+
+    print("----")
+    print(f"files={len(paths)} audio={total_audio_s:.1f}s")
+    print(f"numpy: {total_numpy:.3f}s total, {total_audio_s / total_numpy:.0f}x realtime")
+    if has_sox:
+        print(f"sox:   {total_sox:.3f}s total, {total_audio_s / total_sox:.0f}x realtime")
+        print(f"speedup: {total_sox / total_numpy:.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data_dir", type=str, default=os.path.join(REPO_ROOT, "example_data"), help="directory searched recursively for .wav files")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per file, the best time is reported")
+    parser.add_argument("--source_rate", type=int, default=None, help="re-encode inputs at this sample rate first (e.g. 44100) to benchmark resampling")
+    parser.add_argument("--source_channels", type=int, default=2, help="channel count of the re-encoded inputs, used with --source_rate")
+    args = parser.parse_args()
+    run(args)
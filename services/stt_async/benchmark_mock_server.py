@@ -0,0 +1,134 @@
+import argparse
+import collections
+import os
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+from x2agi_speechkit import stubs
+
+import client_grpc
+import client_rest
+from mock_server import MockServer, add_backend_arguments, backend_from_args
+
+
+def write_wav(path: str, seconds: float):
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(os.urandom(int(seconds * 16000) * 2))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def run_grpc(args, endpoint):
+    """Each job: client_grpc.recognize over one shared channel."""
+    with client_grpc.create_channel(endpoint, insecure=True) as channel:
+        stub = stubs.stt_async_pb2_grpc.AsyncRecognizerStub(channel)
+
+        def job(_):
+            audio_chunks = client_grpc.iter_file_chunks(args.audio, client_grpc.CHUNK_SIZE)
+            return len(client_grpc.recognize(stub, args.token, args.lang, audio_chunks, [], log=lambda message: None))
+
+        return run_jobs(args, job)
+
+
+def run_rest(args, base_url):
+    """Each job: client_rest.recognize, one keep-alive session per worker thread."""
+    sessions = threading.local()
+    all_sessions = []
+
+    def job(_):
+        if not hasattr(sessions, "session"):
+            sessions.session = client_rest.create_session(base_url)
+            all_sessions.append(sessions.session)
+        return len(client_rest.recognize(sessions.session, args.token, args.lang, args.audio, [],
+                                         base_url=base_url, log=lambda message: None))
+
+    try:
+        return run_jobs(args, job)
+    finally:
+        for session in all_sessions:
+            session.close()
+
+
+def run_jobs(args, job):
+    latencies = []
+    errors = collections.Counter()
+
+    def timed(i):
+        start = time.perf_counter()
+        try:
+            job(i)
+        except grpc.RpcError as e:
+            errors[f"{e.code().name}: {e.details()}"] += 1
+            return
+        except Exception as e:
+            message = str(e).strip().splitlines()
+            errors[f"{type(e).__name__}: {message[0][:100]}" if message else type(e).__name__] += 1
+            return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(timed, range(args.jobs)))
+    return time.perf_counter() - start, latencies, errors
+
+
+def report(name, elapsed, latencies, errors, args):
+    print(f"{name}: {args.jobs} jobs, concurrency {args.concurrency}, {elapsed:.2f}s, "
+          f"{len(latencies) / elapsed:.1f} jobs/s, failed {sum(errors.values())}")
+    if latencies:
+        print(f"    latency s: p50={percentile(latencies, 50):.2f} p90={percentile(latencies, 90):.2f} "
+              f"p99={percentile(latencies, 99):.2f} max={max(latencies):.2f}")
+    for error, count in errors.most_common():
+        print(f"    {count} x {error}")
+
+
+def run(args):
+    server = None
+    endpoint, base_url = args.endpoint, args.base_url
+    if endpoint is None and base_url is None:
+        server = MockServer(backend_from_args(args), grpc_port=0, http_port=0).start()
+        endpoint, base_url = server.grpc_endpoint, server.base_url
+    tmp_dir = None
+    if args.audio is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        args.audio = os.path.join(tmp_dir.name, "benchmark.wav")
+        write_wav(args.audio, args.audio_s)
+    print(f"audio: {args.audio} ({os.path.getsize(args.audio) / (1024 * 1024):.1f} MB)")
+    try:
+        for mode in args.modes:
+            if mode == "grpc" and endpoint:
+                report("gRPC", *run_grpc(args, endpoint), args)
+            elif mode == "rest" and base_url:
+                report("REST", *run_rest(args, base_url), args)
+    finally:
+        if server is not None:
+            server.stop()
+            print(server.backend.summary())
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Throughput and latency of the client code paths against mock_server.py")
+    parser.add_argument("--audio", type=str, default=None, help="16kHz mono WAV uploaded by every job (default: synthetic)")
+    parser.add_argument("--audio_s", type=float, default=60.0, help="duration of the synthetic WAV")
+    parser.add_argument("--jobs", type=int, default=50, help="jobs per client mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="jobs in flight")
+    parser.add_argument("--modes", type=str, nargs="+", default=["grpc", "rest"], choices=["grpc", "rest"])
+    parser.add_argument("--token", type=str, default="benchmark", help="sent as the bearer token")
+    parser.add_argument("--lang", type=str, default="en")
+    parser.add_argument("--endpoint", type=str, default=None, help="use an already running mock gRPC endpoint (plaintext)")
+    parser.add_argument("--base_url", type=str, default=None, help="use an already running mock REST server")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+    run(args)
@@ -0,0 +1,49 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmark_audio_converter import make_source_copy
+from oracle_loader import _convert_clips, read_oracle_speakers
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+def run(args):
+    paths = [path for _, path in read_oracle_speakers(args.oracle_speakers)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.source_rate:
+            paths = [make_source_copy(p, tmp_dir, args.source_rate, args.source_channels) for p in paths]
+        # More clips (and bytes) of the same kind: copies of the set, as with a large speaker library
+        copies = []
+        for n in range(args.copies):
+            for path in paths:
+                copy = os.path.join(tmp_dir, f"{n}-{os.path.basename(path)}")
+                shutil.copyfile(path, copy)
+                copies.append(copy)
+        input_mb = sum(os.path.getsize(p) for p in copies) / 2**20
+
+        print(f"{len(copies)} clips, {input_mb:.1f} MB of input")
+        print(f"{'workers':>8}{'seconds':>10}{'MB/s':>10}")
+        serial_s = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            _convert_clips(copies, workers)
+            elapsed = time.perf_counter() - start
+            serial_s = elapsed if workers == 1 else serial_s
+            speedup = f"  {serial_s / elapsed:.2f}x serial" if serial_s and workers > 1 else ""
+            print(f"{workers:>8}{elapsed:>10.3f}{input_mb / elapsed:>10.1f}{speedup}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--oracle_speakers", type=str,
+                        default=os.path.join(REPO_ROOT, "example_data", "stt_async", "en", "godfather_lasvegas_oracle.json"),
+                        help="JSONL file of audio_filepath/speaker_label pairs")
+    parser.add_argument("--copies", type=int, default=1, help="convert this many copies of the clip set")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="pool sizes to measure (1 converts in-process)")
+    parser.add_argument("--source_rate", type=int, default=None, help="re-encode the clips at this sample rate first (e.g. 44100) to benchmark resampling")
+    parser.add_argument("--source_channels", type=int, default=2, help="channel count of the re-encoded clips, used with --source_rate")
+    args = parser.parse_args()
+    run(args)
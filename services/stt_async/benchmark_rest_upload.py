@@ -0,0 +1,102 @@
+import argparse
+import base64
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from rest_upload import Base64JsonBody
+
+PAYLOAD = {
+    "oracle_speaker_labels": [],
+    "restrict_to_oracle_speaker_labels": False,
+    "custom_options": "{}",
+}
+
+
+class SinkHandler(BaseHTTPRequestHandler):
+    """Reads and discards the request body, like /recognizeFileAsync minus the recognition."""
+
+    def do_POST(self):
+        remaining = int(self.headers["Content-Length"])
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 1024 * 1024)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b'{"id": "benchmark"}')
+
+    def log_message(self, *args):
+        pass
+
+
+def upload(mode: str, path: str, url: str):
+    """One POST in a fresh process; prints its peak RSS (MiB) and upload time (s)."""
+    start = time.perf_counter()
+    with requests.Session() as session:
+        if mode == "json":
+            # The previous client: base64 string and JSON document built in memory
+            with open(path, "rb") as audio_file:
+                audio_content = base64.b64encode(audio_file.read()).decode("utf-8")
+            response = session.post(url, json={**PAYLOAD, "audio_data": audio_content}, timeout=60)
+        else:
+            response = session.post(url, data=Base64JsonBody(PAYLOAD, "audio_data", path), timeout=60)
+    response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, elapsed)
+
+
+def write_wav(path: str, minutes: float):
+    frames = int(minutes * 60 * 16000)
+    block = os.urandom(16000 * 2 * 10)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        for offset in range(0, frames, 16000 * 10):
+            w.writeframes(block[:min(16000 * 10, frames - offset) * 2])
+
+
+def measure(mode: str, path: str, url: str):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", mode, path, url],
+        check=True, capture_output=True, text=True,
+    ).stdout.split()
+    return float(output[0]), float(output[1])
+
+
+def run(args):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SinkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/recognizeFileAsync"
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            print(f"{'minutes':>8}{'file_mb':>10}{'json_rss_mb':>14}{'stream_rss_mb':>16}{'json_s':>9}{'stream_s':>10}")
+            for minutes in args.minutes:
+                path = os.path.join(tmp_dir, f"{minutes:g}min.wav")
+                write_wav(path, minutes)
+                file_mb = os.path.getsize(path) / (1024 * 1024)
+                json_rss, json_s = measure("json", path, url)
+                stream_rss, stream_s = measure("stream", path, url)
+                print(f"{minutes:>8g}{file_mb:>10.1f}{json_rss:>14.1f}{stream_rss:>16.1f}{json_s:>9.2f}{stream_s:>10.2f}")
+                os.remove(path)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 5 and sys.argv[1] == "--worker":
+        upload(*sys.argv[2:])
+        sys.exit(0)
+    parser = argparse.ArgumentParser(description="Peak client memory of the REST upload against audio length, on a local sink server")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 10, 30, 60, 120], help="lengths of the synthetic 16kHz mono WAVs")
+    args = parser.parse_args()
+    run(args)
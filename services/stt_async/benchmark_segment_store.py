@@ -0,0 +1,97 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from result_sink import ResultSink
+from segment_store import SegmentStore
+
+WORDS = "the of and to in is you that it he was for on are as with his they at be this from have or by".split()
+
+
+def make_segments(count: int, num_speakers: int, seed: int):
+    rng = random.Random(seed)
+    start_ms = 0
+    for _ in range(count):
+        end_ms = start_ms + rng.randint(500, 15000)
+        yield {
+            "start_time_ms": start_ms,
+            "end_time_ms": end_ms,
+            "speaker_label": f"Speaker {rng.randint(1, num_speakers)}",
+            "transcript": " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 30))),
+        }
+        start_ms = end_ms + rng.randint(0, 2000)
+
+
+def read_text_files(output_name: str):
+    """What consumers of the text format do: parse both files into a list of segment dicts."""
+    segments = []
+    with open(output_name + ".speakers", "r", encoding="utf-8") as speakers, \
+            open(output_name + ".text", "r", encoding="utf-8") as text:
+        for speaker_line, text_line in zip(speakers, text):
+            start_s, end_s, speaker_label = speaker_line.rstrip("\n").split("\t", 2)
+            transcript = text_line.rstrip("\n").split("\t", 2)[2]
+            segments.append({
+                "start_time_ms": round(float(start_s) * 1000),
+                "end_time_ms": round(float(end_s) * 1000),
+                "speaker_label": speaker_label,
+                "transcript": transcript,
+            })
+    return segments
+
+
+def measure(fn):
+    """(result, seconds, peak bytes allocated by Python while running fn); timed and traced in separate runs."""
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(args):
+    mb = 1024 * 1024
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_name = os.path.join(tmp_dir, "archive")
+        with ResultSink(output_name) as sink:
+            for segment in make_segments(args.segments, args.speakers, args.seed):
+                sink.write(segment)
+        SegmentStore.from_time_label_files(output_name).save(output_name + ".segments")
+
+        text_bytes = os.path.getsize(output_name + ".speakers") + os.path.getsize(output_name + ".text")
+        store_bytes = os.path.getsize(output_name + ".segments")
+        print(f"{args.segments} segments, {args.speakers} speakers")
+        print(f"file size:  text {text_bytes / mb:.1f} MB, store {store_bytes / mb:.1f} MB")
+
+        segments, text_s, text_peak = measure(lambda: read_text_files(output_name))
+        del segments
+        store, convert_s, convert_peak = measure(lambda: SegmentStore.from_time_label_files(output_name))
+        in_memory = store.nbytes()
+        del store
+        store, load_s, load_peak = measure(lambda: SegmentStore.load(output_name + ".segments"))
+        # Touch every column once, so the mapped pages are actually read
+        _, scan_s, _ = measure(lambda: (int((store.end_ms - store.start_ms).sum()), store.label_ids.max(),
+                                        store.transcript_blob.sum()))
+        store.close()
+
+        print(f"{'':<34}{'seconds':>10}{'peak_alloc_mb':>16}")
+        print(f"{'text -> list of dicts':<34}{text_s:>10.3f}{text_peak / mb:>16.1f}")
+        print(f"{'text -> SegmentStore':<34}{convert_s:>10.3f}{convert_peak / mb:>16.1f}")
+        print(f"{'SegmentStore.load (mmap)':<34}{load_s:>10.4f}{load_peak / mb:>16.2f}")
+        print(f"{'  + scan of all columns':<34}{scan_s:>10.4f}")
+        print(f"column data in memory: {in_memory / mb:.1f} MB (list of dicts peak: {text_peak / mb:.1f} MB)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Footprint and load time of segment_store.SegmentStore against .speakers/.text files")
+    parser.add_argument("--segments", type=int, default=1_000_000, help="number of synthetic segments")
+    parser.add_argument("--speakers", type=int, default=8, help="distinct speaker labels")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args)
@@ -0,0 +1,177 @@
+import argparse
+import collections
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+import wave
+
+import numpy as np
+from x2agi_speechkit import stubs
+
+import client_grpc
+from audio_converter import iter_converted_audio
+from mock_server import MockBackend, MockServer
+
+
+class LinkProxy:
+    """
+    TCP proxy simulating a slow network link in front of a local server: every
+    byte is delayed by `latency_ms` one way and each direction is limited to
+    `bandwidth_mbit`, queued in order like on a bottleneck link. The queue holds
+    at most `queue_ms` of traffic, beyond that the sender gets TCP backpressure
+    as from a real router, instead of the proxy absorbing the whole upload.
+    """
+
+    def __init__(self, target_port: int, latency_ms: float, bandwidth_mbit: float, queue_ms: float = 50.0,
+                 host: str = "127.0.0.1"):
+        self.target = (host, target_port)
+        self.latency_s = latency_ms / 1000
+        self.bytes_per_s = bandwidth_mbit * 1e6 / 8
+        self.queue_s = queue_ms / 1000
+        self._listener = socket.socket()
+        # Small receive buffers (inherited by accepted sockets) so backpressure reaches the client quickly
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 64 * 1024)
+        self._listener.bind((host, 0))
+        self._listener.listen()
+        self.endpoint = f"{host}:{self._listener.getsockname()[1]}"
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(self.target)
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._pipe(client, upstream)
+            self._pipe(upstream, client)
+
+    def _pipe(self, src, dst):
+        packets = collections.deque()
+        ready = threading.Condition()
+        link_free = [0.0]  # when the link has sent everything queued so far
+
+        def receive():
+            while True:
+                # Don't take more from the sender than the bottleneck queue holds
+                backlog = link_free[0] - time.monotonic()
+                if backlog > self.queue_s:
+                    time.sleep(backlog - self.queue_s)
+                try:
+                    data = src.recv(64 * 1024)
+                except OSError:
+                    data = b""
+                with ready:
+                    if data:
+                        link_free[0] = max(link_free[0], time.monotonic()) + len(data) / self.bytes_per_s
+                        packets.append((link_free[0] + self.latency_s, data))
+                    else:
+                        packets.append((0.0, None))
+                    ready.notify()
+                if not data:
+                    return
+
+        def deliver():
+            while True:
+                with ready:
+                    while not packets:
+                        ready.wait()
+                    due, data = packets.popleft()
+                if data is None:
+                    try:
+                        dst.shutdown(socket.SHUT_WR)
+                    except OSError:
+                        pass
+                    return
+                time.sleep(max(0.0, due - time.monotonic()))
+                try:
+                    dst.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=receive, daemon=True).start()
+        threading.Thread(target=deliver, daemon=True).start()
+
+    def close(self):
+        self._listener.close()
+
+
+def write_source_wav(path: str, seconds: float, rate: int, channels: int):
+    rng = np.random.default_rng(0)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        for start in range(0, int(seconds), 60):
+            frames = int(min(60, seconds - start) * rate)
+            w.writeframes(rng.normal(0, 3000, frames * channels).astype("<i2").tobytes())
+
+
+def throttled_file_chunks(path: str, chunk_size: int, mb_per_s: float):
+    """iter_file_chunks on a disk that reads `mb_per_s`."""
+    for chunk in client_grpc.iter_file_chunks(path, chunk_size):
+        time.sleep(len(chunk) / (mb_per_s * 1024 * 1024))
+        yield chunk
+
+
+def run(args):
+    server = MockServer(MockBackend(), grpc_port=0, http_port=0).start()
+    proxy = LinkProxy(server.grpc_port, args.latency_ms, args.bandwidth_mbit)
+    tmp_dir = tempfile.TemporaryDirectory()
+    try:
+        if args.source == "convert":
+            # 44.1kHz stereo: every chunk costs real conversion work
+            path = os.path.join(tmp_dir.name, "source.wav")
+            write_source_wav(path, args.audio_s, 44100, 2)
+            open_source = lambda: iter_converted_audio(path, client_grpc.CHUNK_SIZE)
+        else:
+            path = os.path.join(tmp_dir.name, "source_16k.wav")
+            write_source_wav(path, args.audio_s, 16000, 1)
+            open_source = lambda: throttled_file_chunks(path, client_grpc.CHUNK_SIZE, args.disk_mb_s)
+        print(f"{args.audio_s / 60:.0f} min of audio, source: {args.source}, "
+              f"link: {args.latency_ms:g} ms one way, {args.bandwidth_mbit:g} Mbit/s")
+
+        modes = {
+            "baseline": dict(read_ahead=0),
+            "read_ahead": dict(read_ahead=args.read_ahead),
+            "read_ahead+gzip": dict(read_ahead=args.read_ahead, compression=client_grpc.COMPRESSION["gzip"]),
+        }
+        print(f"{'mode':<18}{'upload_s':>10}{'min_s':>8}{'max_s':>8}")
+        with client_grpc.create_channel(proxy.endpoint, insecure=True) as channel:
+            stub = stubs.stt_async_pb2_grpc.AsyncRecognizerStub(channel)
+            # The channel connects on the first call: warm it up outside the timing
+            client_grpc.submit_recognition(stub, "benchmark", "en", [client_grpc.CHUNK_SIZE * b"\0"], [], log=lambda m: None)
+            for name in args.modes:
+                times = []
+                for _ in range(args.repeats):
+                    start = time.perf_counter()
+                    client_grpc.submit_recognition(stub, "benchmark", "en", open_source(), [],
+                                                   log=print if args.verbose else lambda m: None, **modes[name])
+                    times.append(time.perf_counter() - start)
+                print(f"{name:<18}{statistics.median(times):>10.2f}{min(times):>8.2f}{max(times):>8.2f}")
+    finally:
+        proxy.close()
+        server.stop()
+        tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Upload time of RecognizeFileStreaming over a simulated slow link, with and without read-ahead")
+    parser.add_argument("--audio_s", type=float, default=600.0, help="duration of the synthetic recording")
+    parser.add_argument("--source", type=str, default="convert", choices=["convert", "disk"],
+                        help="convert: 44.1kHz stereo WAV through the converter; disk: 16kHz WAV read at --disk_mb_s")
+    parser.add_argument("--disk_mb_s", type=float, default=5.0, help="read rate of the simulated disk")
+    parser.add_argument("--latency_ms", type=float, default=100.0, help="one-way latency of the simulated link")
+    parser.add_argument("--bandwidth_mbit", type=float, default=50.0, help="bandwidth of the simulated link per direction")
+    parser.add_argument("--read_ahead", type=int, default=4, help="chunks read ahead in the read-ahead modes")
+    parser.add_argument("--modes", type=str, nargs="+", default=["baseline", "read_ahead", "read_ahead+gzip"],
+                        choices=["baseline", "read_ahead", "read_ahead+gzip"])
+    parser.add_argument("--repeats", type=int, default=3, help="uploads per mode, the median is reported")
+    parser.add_argument("--verbose", action="store_true", help="print the UploadStream summary of every upload")
+    args = parser.parse_args()
+    run(args)
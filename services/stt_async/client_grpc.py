@@ -1,16 +1,25 @@
 import argparse
-import grpc
-import json
 import os
-import time
 import uuid
-import stt_async.stt_async_service_pb2
-import stt_async.stt_async_service_pb2_grpc
-import yandex.cloud.operation.operation_pb2 as operation_pb2
 
-from audio_converter import convert_audio
+import grpc
+
+from x2agi_speechkit import metrics, stubs
+from x2agi_speechkit.connections import ConnectionManager, open_channel
+from x2agi_speechkit.progress_poller import AdaptivePoller
+from x2agi_speechkit.trace import JobTrace
+
+from audio_converter import iter_converted_audio
+from oracle_cache import DEFAULT_CACHE_DIR, OracleClipCache
+from oracle_loader import load_oracle_clips, read_oracle_speakers
+from result_cache import DEFAULT_RESULT_CACHE_DIR, ResultCache, SpooledAudio
+from result_sink import ResultSink
+from upload_stream import UploadStream
+from vad import open_vad_audio
 
 CHUNK_SIZE = 1024 * 1024  # 1MB chunks (adjust based on your needs)
+ENDPOINT = "stt-async.x2agi.com:8443"
+COMPRESSION = {"none": None, "gzip": grpc.Compression.Gzip, "deflate": grpc.Compression.Deflate}
 
 def print_diarization_output(finalized_diar_results):
     for segment in finalized_diar_results:
@@ -28,150 +37,334 @@ def save_in_time_label_format(output_name, finalized_diar_results):
             out.write(f"{segment.start_time_ms / 1000}\t{segment.end_time_ms / 1000}\t{segment.transcript.strip()}\n")
 
 
-def generate_requests(args, oracle_speaker_labels, audio_path):
+def iter_file_chunks(path, chunk_size):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def generate_requests(oracle_speaker_labels, restrict_to_oracle_speaker_labels, audio_chunks):
     # First request: Contains session options
-    yield stt_async.stt_async_service_pb2.RecognizeFileStreamingRequest(
-        options=stt_async.stt_async_service_pb2.RecognitionOptions(
+    yield stubs.stt_async_pb2.RecognizeFileStreamingRequest(
+        options=stubs.stt_async_pb2.RecognitionOptions(
             oracle_speaker_labels=oracle_speaker_labels,
-            restrict_to_oracle_speaker_labels=args.restrict_to_oracle_speaker_labels,
+            restrict_to_oracle_speaker_labels=restrict_to_oracle_speaker_labels,
             custom_options="{}",
         )
     )
 
-    # Subsequent requests: Stream audio chunks
-    with open(audio_path, "rb") as f:
-        while True:
-            chunk = f.read(CHUNK_SIZE)
-            if not chunk:
-                break
-            yield stt_async.stt_async_service_pb2.RecognizeFileStreamingRequest(audio_data=chunk)
+    # Subsequent requests: Stream audio chunks as they are produced
+    for chunk in audio_chunks:
+        yield stubs.stt_async_pb2.RecognizeFileStreamingRequest(audio_data=chunk)
+
+
+def create_channel(endpoint=ENDPOINT, insecure=False):
+    # insecure: plaintext, for a local mock_server.py
+    return open_channel(endpoint, insecure)
+
+
+def open_audio_chunks(path, no_convert):
+    """
+    Main audio is read lazily: each chunk is uploaded as soon as the converter
+    produces it, so conversion and upload overlap and no temp file is written.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Input file not found: {path}")
+    if no_convert:
+        return iter_file_chunks(path, CHUNK_SIZE)
+    return metrics.timed_chunks(iter_converted_audio(path, CHUNK_SIZE), "stt_async", "convert")
+
+
+def load_oracle_speaker_labels(oracle_speakers, no_convert, log=print, cache=None, workers=None, trace=None):
+    """
+    Build OracleSpeakerLabel messages from a JSONL file of audio_filepath/speaker_label.
+    Clips are converted in parallel (see oracle_loader.load_oracle_clips); with an
+    oracle_cache.OracleClipCache, clips converted before are read from the cache.
+    With a JobTrace, the conversion of every clip is traced.
+    """
+    if oracle_speakers is None:
+        return []
+
+    clips = read_oracle_speakers(oracle_speakers)
+    with metrics.stage("stt_async", "oracle_load"):
+        audio = load_oracle_clips(clips, no_convert, cache, workers, log, trace)
+    return [
+        stubs.stt_async_pb2.OracleSpeakerLabel(
+            audio_data=bytes(data),
+            speaker_label=speaker_label
+        )
+        for (speaker_label, _), data in zip(clips, audio)
+    ]
+
+
+def trace_chunks(chunks, trace):
+    """
+    Pass audio chunks through, tracing the wait for each chunk (track "audio":
+    conversion, or the read-ahead queue) and the time gRPC takes to send it
+    before asking for the next one (track "upload").
+    """
+    iterator = iter(chunks)
+    index = 0
+    while True:
+        start = trace.now()
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        ready = trace.now()
+        trace.add("audio", f"chunk {index}", start, ready, bytes=len(chunk))
+        yield chunk
+        trace.add("upload", f"chunk {index}", ready, trace.now(), bytes=len(chunk))
+        index += 1
+
+
+def call_metadata(token, job_id, lang):
+    """Metadata of every call of a job: the x-job-id it was created with pins its routing."""
+    return [
+        ("authorization", f"Bearer {token}"),
+        ("x-job-id", job_id),
+        ("x-language", lang),
+    ]
+
+
+def submit_recognition(stub, token, lang, audio_chunks, oracle_speaker_labels,
+                       restrict_to_oracle_speaker_labels=False, log=print, read_ahead=0, compression=None,
+                       trace=None):
+    """
+    Stream the audio with RecognizeFileStreaming. Returns the job as a dict with
+    the server's operation_id, the call metadata (its x-job-id pins routing, so
+    every later call must reuse it) and the uploaded audio duration.
+    With `read_ahead` > 0 the audio goes through an upload_stream.UploadStream
+    holding that many chunks; `compression` is a grpc.Compression for the call.
+    With a JobTrace, every chunk is traced (see trace_chunks) and the trace is
+    identified by the job's x-job-id and operation.id.
+    """
+    # Generate job_id on the client before any requests
+    job_id = str(uuid.uuid4())
+    initial_metadata = call_metadata(token, job_id, lang)
+    if trace is not None:
+        trace.identify(job_id=job_id)
+
+    upload_stream = None
+    if read_ahead > 0:
+        audio_chunks = upload_stream = UploadStream(audio_chunks, depth=read_ahead)
+    if trace is not None:
+        audio_chunks = trace_chunks(audio_chunks, trace)
+
+    uploaded_bytes = [0]  # audio size, gives the duration estimate used by the poller
+
+    def count_bytes(chunks):
+        for chunk in chunks:
+            uploaded_bytes[0] += len(chunk)
+            yield chunk
+
+    # Stream the requests to the server; with a lazily converted file, the upload time includes the conversion
+    upload_start = trace.now() if trace is not None else None
+    with metrics.stage("stt_async", "upload"):
+        operation = stub.RecognizeFileStreaming(
+            generate_requests(oracle_speaker_labels, restrict_to_oracle_speaker_labels, count_bytes(audio_chunks)),
+            metadata=initial_metadata,
+            compression=compression,
+        )
+    if upload_stream is not None:
+        log(upload_stream.summary())
+    if trace is not None:
+        trace.identify(operation_id=operation.id)
+        trace.add("upload", "RecognizeFileStreaming", upload_start, trace.now(), operation_id=operation.id)
+
+    # operation.id is returned by the server, but routing is pinned by x-job-id
+    log(f"server returned operation ID = {operation.id}")
+    return {
+        "operation_id": operation.id,
+        "metadata": initial_metadata,
+        "audio_duration_s": max(0, uploaded_bytes[0] - 44) / (16000 * 2),
+    }
+
+
+def get_progress(stub, job, trace=None):
+    """One GetProgress call; with a JobTrace, traced with the progress and status it returned."""
+    get_progress_request = stubs.stt_async_pb2.GetProgressRequest(operation_id=job["operation_id"])
+    if trace is None:
+        return stub.GetProgress(get_progress_request, metadata=job["metadata"])
+    with trace.span("poll", "GetProgress") as args:
+        response = stub.GetProgress(get_progress_request, metadata=job["metadata"])
+        args.update(progress=response.progress, status=response.status)
+    return response
+
+
+def wait_for_completion(stub, job, log=print, trace=None):
+    # Poll the progress until the status is "completed"
+    poller = AdaptivePoller(fixed_interval=5, audio_duration_s=job["audio_duration_s"])
+    timer = metrics.OperationTimer("stt_async")
+    while True:
+        progress_response = get_progress(stub, job, trace)
+
+        status, progress = progress_response.status, progress_response.progress
+        log(f"Progress: {progress}%, Status: {status}")
+        poller.record(progress)
+        timer.record(status)
+
+        if status == "completed":
+            timer.done()
+            break  # Exit the loop when the operation is completed
+        elif status == "failed":
+            timer.done(failed=True)
+            raise RuntimeError("Recognition operation failed: please contact support.")
+
+        poller.sleep()  # Wait before polling again, adapting to the observed progress rate
+    log(poller.summary())
+
+
+def iter_recognition(stub, job):
+    """The GetRecognition stream of a completed job: StreamingResponse messages as they arrive."""
+    get_recognition_request = stubs.stt_async_pb2.GetRecognitionRequest(operation_id=job["operation_id"])
+    return stub.GetRecognition(get_recognition_request, metadata=job["metadata"])
+
+
+def record_wall_times(responses, trace=None):
+    """
+    Pass StreamingResponse messages through, recording how long after the server
+    wrote them each one arrived. With a JobTrace, each response is a span on
+    track "download" from the request or the previous response to its arrival.
+    """
+    start = trace.now() if trace is not None else None
+    for index, response in enumerate(responses):
+        metrics.record_response_wall_time("stt_async", response.response_wall_time_ms)
+        if trace is not None:
+            arrived = trace.now()
+            trace.add("download", f"StreamingResponse {index}", start, arrived, segments=len(response.results),
+                      bytes=response.ByteSize(), response_wall_time_ms=response.response_wall_time_ms)
+            start = arrived
+        yield response
+
+
+def write_responses(responses, sink, time_map=None, record=None):
+    """
+    Write StreamingResponse messages into a result_sink.ResultSink; returns the number of segments.
+    With a vad.TimeMap, timestamps are moved back onto the timeline of the unfiltered audio.
+    With a `record` list, the responses are also appended to it serialized, as received (for result_cache).
+    """
+    for response in responses:
+        if record is not None:
+            record.append(response.SerializeToString())
+        if time_map is not None:
+            for segment in response.results:
+                time_map.remap(segment)
+        sink.write_response(response)
+    return sink.segments
+
+
+def stream_recognition(stub, job, sink, time_map=None, record=None, trace=None):
+    """Download the results of a completed job into a result_sink.ResultSink, see write_responses."""
+    with metrics.stage("stt_async", "download"):
+        return write_responses(record_wall_times(iter_recognition(stub, job), trace), sink, time_map, record)
+
+
+def get_recognition(stub, job, trace=None):
+    """Download the DiarizationResult segments of a completed job."""
+    finalized_diar_results = []  # list of tuples (speaker_label, text)
+    with metrics.stage("stt_async", "download"):
+        for r in record_wall_times(iter_recognition(stub, job), trace):
+            for segment in r.results:
+                finalized_diar_results.append(segment)
+    return finalized_diar_results
+
+
+def recognize(stub, token, lang, audio_chunks, oracle_speaker_labels,
+              restrict_to_oracle_speaker_labels=False, log=print, read_ahead=0, compression=None, trace=None):
+    """
+    Run one recognition job on an open channel: stream the audio, poll until the
+    operation completes and return the list of DiarizationResult segments.
+    """
+    job = submit_recognition(stub, token, lang, audio_chunks, oracle_speaker_labels,
+                             restrict_to_oracle_speaker_labels, log, read_ahead, compression, trace)
+    wait_for_completion(stub, job, log, trace)
+    return get_recognition(stub, job, trace)
 
 
 def run(args):
     if args.lang not in ["en", "ru"]:
         raise ValueError(f"expected --lang: 'en' or 'ru', got '{args.lang}'")
+    if args.ndjson and not args.save:
+        raise ValueError("--ndjson needs --save")
 
-    converted_path = None
-    converted_oracle_paths = []  # Track converted oracle files
+    exporter = metrics.start_export(args)
+    trace = JobTrace(os.path.basename(args.path)) if args.trace else None
+    # The TLS handshake runs in the background while the audio is converted
+    connections = ConnectionManager(insecure=args.insecure, endpoints={"stt_async": args.endpoint})
+    connections.warm(["stt_async"], wait=False)
 
+    audio = None
     try:
-        # Convert main audio file if needed
-        if args.no_convert:
+        time_map = None
+        if args.vad:
+            audio_chunks, time_map = open_vad_audio(args.path, args.no_convert, args.vad_min_silence_s, args.vad_threshold_db)
+            if audio_chunks is None:
+                print("Skipping recognition: no speech found")
+                if args.save:
+                    ResultSink(args.save, args.ndjson).close()  # empty outputs
+                return
+        elif args.no_convert:
             print("Skipping audio conversion for main file")
-            audio_path = args.path
+            audio_chunks = open_audio_chunks(args.path, args.no_convert)
         else:
-            print("Converting main audio to 16kHz mono WAV...")
-            converted_path = convert_audio(args.path)
-            audio_path = converted_path
+            print("Streaming main audio through 16kHz mono WAV conversion...")
+            audio_chunks = open_audio_chunks(args.path, args.no_convert)
 
         # Process oracle speakers
-        oracle_speaker_labels = []
-        if args.oracle_speakers is not None:
-            oracle_dir = os.path.dirname(os.path.abspath(args.oracle_speakers))
-            assert os.path.exists(args.oracle_speakers), f"Cannot find {args.oracle_speakers}"
-            with open(args.oracle_speakers, "r", encoding="utf-8") as inp:
-                for line_num, line in enumerate(inp, 1):
-                    try:
-                        info = json.loads(line.strip())
-                    except json.JSONDecodeError:
-                        raise ValueError(f"Invalid JSON in line {line_num} of {args.oracle_speakers}")
-
-                    # Resolve relative paths to oracle_speakers directory
-                    original_audio_path = os.path.normpath(
-                        os.path.join(oracle_dir, info["audio_filepath"])
-                    )
-
-                    if not os.path.exists(original_audio_path):
-                        raise FileNotFoundError(
-                            f"Oracle audio file not found: {original_audio_path} "
-                            f"(from line {line_num} in {args.oracle_speakers})"
-                        )
-                    
-                    # Convert oracle audio if needed
-                    if not args.no_convert:
-                        print(f"Converting oracle audio: {original_audio_path}")
-                        converted_oracle = convert_audio(original_audio_path)
-                        converted_oracle_paths.append(converted_oracle)
-                        audio_data_path = converted_oracle
-                    else:
-                        audio_data_path = original_audio_path
-
-                    with open(audio_data_path, "rb") as f:
-                        data = f.read()
-                    oracle_speaker_labels.append(
-                        stt_async.stt_async_service_pb2.OracleSpeakerLabel(
-                            audio_data=data,
-                            speaker_label=info["speaker_label"]
-                        )
-                    )
+        cache = None
+        if args.oracle_speakers and not args.no_oracle_cache:
+            cache = OracleClipCache(args.oracle_cache_dir, args.oracle_cache_max_mb * 1024 * 1024)
+        oracle_speaker_labels = load_oracle_speaker_labels(args.oracle_speakers, args.no_convert, cache=cache,
+                                                           workers=args.oracle_workers, trace=trace)
         print(f"len(oracle_speaker_labels)={len(oracle_speaker_labels)}")
+        if cache is not None:
+            print(cache.summary())
+            cache.close()
 
-        # Generate job_id on the client before any requests
-        job_id = str(uuid.uuid4())
-
-        # Установите соединение с сервером.
-        with grpc.secure_channel(
-            "stt-async.x2agi.com:8443",
-            grpc.ssl_channel_credentials(),
-            options=[
-                ("grpc.ssl_target_name_override", "stt-async.x2agi.com"),  # Force SNI
-                ("grpc.default_authority", "stt-async.x2agi.com"),
-                # Recommended optimizations:
-                ("grpc.keepalive_time_ms", 10000),
-                ("grpc.max_receive_message_length", 50 * 1024 * 1024)
-            ]
-        ) as channel:
-
-            stub = stt_async.stt_async_service_pb2_grpc.AsyncRecognizerStub(channel)
-
-            initial_metadata = [
-                ("authorization", f"Bearer {args.token}"),
-                ("x-job-id", job_id),
-                ("x-language", args.lang),
-            ]
-
-            # Stream the requests to the server
-            operation = stub.RecognizeFileStreaming(
-                generate_requests(args, oracle_speaker_labels, audio_path),
-                metadata=initial_metadata
-            )
-
-            # operation.id is returned by the server, but routing is pinned by x-job-id
-            print(f"server returned operation ID = {operation.id}")
-
-            # Poll the progress until the status is "completed"
-            while True:
-                get_progress_request = stt_async.stt_async_service_pb2.GetProgressRequest(operation_id=operation.id)
-                progress_response = stub.GetProgress(get_progress_request, metadata=initial_metadata)
-
-                status, progress = progress_response.status, progress_response.progress
-                print(f"Progress: {progress}%, Status: {status}")
-
-                if status == "completed":
-                    break  # Exit the loop when the operation is completed
-                elif status == "failed":
-                    raise RuntimeError("Recognition operation failed: please contact support.")
-
-                time.sleep(5)  # Wait before polling again
-
-            # Call GetRecognition
-            get_recognition_request = stt_async.stt_async_service_pb2.GetRecognitionRequest(operation_id=operation.id)
-            responses = stub.GetRecognition(get_recognition_request, metadata=initial_metadata)
-
-            finalized_diar_results = []  # list of tuples (speaker_label, text)
-            for r in responses:
-                for segment in r.results:
-                    finalized_diar_results.append(segment)
-            print_diarization_output(finalized_diar_results)
-            if args.save:
-                save_in_time_label_format(args.save, finalized_diar_results)
+        # The converted audio is hashed before upload: a recognition of the same
+        # audio with the same options is replayed from the result cache
+        result_cache = cached = None
+        if args.result_cache:
+            result_cache = ResultCache(args.result_cache_dir, args.result_cache_max_mb * 1024 * 1024)
+            audio = SpooledAudio(audio_chunks)
+            audio_chunks = audio.chunks()
+            cache_key = result_cache.key(audio.digest, args.lang, oracle_speaker_labels, args.restrict_to_oracle_speaker_labels)
+            cached = result_cache.lookup(cache_key, audio.duration_s)
 
+        if cached is not None:
+            print("Results from the result cache, nothing is submitted")
+            with ResultSink(args.save, args.ndjson, echo=print) as sink:
+                write_responses(cached, sink, time_map)
+        else:
+            # Установите соединение с сервером.
+            stub = stubs.stt_async_pb2_grpc.AsyncRecognizerStub(connections.channel("stt_async"))
+            job = submit_recognition(stub, args.token, args.lang, audio_chunks, oracle_speaker_labels,
+                                     args.restrict_to_oracle_speaker_labels, read_ahead=args.read_ahead,
+                                     compression=COMPRESSION[args.grpc_compression], trace=trace)
+            wait_for_completion(stub, job, trace=trace)
+            # Segments are printed and written out as each StreamingResponse arrives
+            record = [] if result_cache is not None else None
+            with ResultSink(args.save, args.ndjson, echo=print) as sink:
+                stream_recognition(stub, job, sink, time_map, record, trace)
+            if result_cache is not None:
+                result_cache.store(cache_key, record)
+        print("----")
+        if result_cache is not None:
+            print(result_cache.summary())
+        print(connections.summary())
     finally:
-        if converted_path and os.path.exists(converted_path):
-            os.remove(converted_path)
-        for path in converted_oracle_paths:
-            if os.path.exists(path):
-                os.remove(path)
+        connections.close()
+        if audio is not None:
+            audio.close()
+        exporter.close()
+        if trace is not None:
+            # Written for failed jobs too: they are the ones worth a look
+            trace.save(args.trace)
+            print(f"trace of job {trace.job_id} written to {args.trace}")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -181,6 +374,23 @@ if __name__ == '__main__':
     parser.add_argument("--restrict_to_oracle_speaker_labels", action="store_true", help="restrict speakers to oracle")
     parser.add_argument("--oracle_speakers", type=str, default=None, help="jsonl file with audio_filepath and speaker_label")
     parser.add_argument("--save", type=str, default=None, help="output file in format start_s \t end_s \t label")
+    parser.add_argument("--ndjson", action="store_true", help="also write <save>.ndjson with one JSON segment per line")
     parser.add_argument("--no_convert", action="store_true", help="Skip audio conversion (use if file is already 16kHz mono WAV)")
+    parser.add_argument("--vad", action="store_true", help="drop long silences before upload (timestamps are mapped back); files without speech are skipped")
+    parser.add_argument("--vad_min_silence_s", type=float, default=1.0, help="shortest silence removed by --vad")
+    parser.add_argument("--vad_threshold_db", type=float, default=None, help="speech level threshold of --vad in dBFS (default: adaptive)")
+    parser.add_argument("--oracle_cache_dir", type=str, default=DEFAULT_CACHE_DIR, help="directory of the converted oracle clip cache")
+    parser.add_argument("--oracle_cache_max_mb", type=int, default=512, help="size cap of the oracle clip cache, least recently used clips are evicted")
+    parser.add_argument("--no_oracle_cache", action="store_true", help="always convert oracle clips, bypassing the cache")
+    parser.add_argument("--result_cache", action="store_true", help="reuse the results of audio recognized before with the same options instead of submitting it again")
+    parser.add_argument("--result_cache_dir", type=str, default=DEFAULT_RESULT_CACHE_DIR, help="directory of the result cache")
+    parser.add_argument("--result_cache_max_mb", type=int, default=256, help="size cap of the result cache, least recently used results are evicted")
+    parser.add_argument("--read_ahead", type=int, default=0, help="read this many audio chunks ahead of the upload on a background thread, with adaptive message size (0: off)")
+    parser.add_argument("--grpc_compression", type=str, default="none", choices=list(COMPRESSION), help="compress upload messages (PCM audio gains little)")
+    parser.add_argument("--endpoint", type=str, default=ENDPOINT, help="gRPC endpoint host:port")
+    parser.add_argument("--insecure", action="store_true", help="plaintext channel, e.g. to a local mock_server.py")
+    parser.add_argument("--oracle_workers", type=int, default=None, help="maximum number of processes converting oracle clips in parallel (default: one per core; small sets are converted in-process)")
+    parser.add_argument("--trace", type=str, default=None, help="write a timeline of the job (Chrome trace JSON, open it in ui.perfetto.dev) to this file")
+    metrics.add_arguments(parser)
     args = parser.parse_args()
     run(args)
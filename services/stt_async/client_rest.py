@@ -1,11 +1,20 @@
 import argparse
 import base64
-import json
 import os
-import requests
-import time
+import urllib.parse
 import uuid
+
+from x2agi_speechkit import metrics
+from x2agi_speechkit.connections import ConnectionManager, open_session
+from x2agi_speechkit.progress_poller import AdaptivePoller
+
 from audio_converter import convert_audio
+from oracle_cache import DEFAULT_CACHE_DIR, OracleClipCache
+from oracle_loader import load_oracle_clips, read_oracle_speakers
+from rest_upload import Base64JsonBody
+from vad import write_vad_audio
+
+BASE_URL = "https://stt-async.x2agi.com:8444"
 
 def print_diarization_output(finalized_diar_results):
     for segment in finalized_diar_results:
@@ -23,16 +32,124 @@ def save_in_time_label_format(output_name, finalized_diar_results):
             out.write(f"{int(segment['start_time_ms']) / 1000}\t{int(segment['end_time_ms']) / 1000}\t{segment['transcript'].strip()}\n")
 
 
+def create_session(base_url=BASE_URL):
+    """requests session with retries on the service's transient errors."""
+    return open_session(base_url)
+
+
+def recognize(session, token, lang, audio_path, oracle_speaker_labels,
+              restrict_to_oracle_speaker_labels=False, base_url=BASE_URL, log=print):
+    """
+    Run one recognition job: upload the 16kHz mono WAV at `audio_path`, poll until
+    the operation completes and return the list of segments (dicts).
+    """
+    headers = {
+        "Host": urllib.parse.urlsplit(base_url).hostname,
+        "Authorization": f"Bearer {token}",
+        "x-job-id": str(uuid.uuid4()),
+        "x-language": lang,
+        "Content-Type": "application/json",
+        "Accept": "application/json"
+    }
+
+    # Initial recognition request: the main audio is base64-encoded into
+    # the JSON body chunk by chunk while it is sent
+    payload = {
+        "oracle_speaker_labels": oracle_speaker_labels,
+        "restrict_to_oracle_speaker_labels": restrict_to_oracle_speaker_labels,
+        "custom_options": "{}"
+    }
+    body = Base64JsonBody(payload, "audio_data", audio_path)
+    log(f"Uploading {body.source_size} bytes of audio ({len(body)} bytes request body)")
+
+    with metrics.stage("stt_async", "upload"):
+        response = session.post(
+            f"{base_url}/recognizeFileAsync",
+            headers=headers,
+            data=body,
+            timeout=10
+        )
+    
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed to start recognition: {response.status_code} - {response.text}")
+
+    operation_id = response.json().get("id")
+    log(f"Server returned operation ID = {operation_id}")
+
+    # Polling loop
+    audio_duration_s = max(0, body.source_size - 44) / (16000 * 2)
+    poller = AdaptivePoller(fixed_interval=2, audio_duration_s=audio_duration_s)
+    timer = metrics.OperationTimer("stt_async")
+    while True:
+        progress_resp = session.get(
+            f"{base_url}/getProgress?operation_id={operation_id}",
+            headers=headers,
+            timeout=10
+        )
+        
+        if progress_resp.status_code != 200:
+            raise RuntimeError(f"Progress check failed: {progress_resp.status_code}")
+        
+        progress_data = progress_resp.json()
+        log(f"Progress: {progress_data['progress']}%, Status: {progress_data['status']}")
+        poller.record(progress_data["progress"])
+        timer.record(progress_data["status"])
+
+        if progress_data["status"] == "completed":
+            timer.done()
+            break
+        elif progress_data["status"] == "failed":
+            timer.done(failed=True)
+            raise RuntimeError("Recognition failed on server")
+
+        poller.sleep()
+    log(poller.summary())
+
+    # Get final results
+    with metrics.stage("stt_async", "download"):
+        result_resp = session.get(
+            f"{base_url}/getRecognition?operation_id={operation_id}",
+            headers=headers,
+            timeout=10
+        )
+
+    if result_resp.status_code != 200:
+        raise RuntimeError(f"Failed to retrieve results: {result_resp.status_code}")
+
+    finalized_diar_results = []
+    for r in result_resp.json():
+        metrics.record_response_wall_time("stt_async", int(r.get("response_wall_time_ms") or 0))
+        for segment in r["results"]:
+            finalized_diar_results.append(segment)
+    return finalized_diar_results
+
+
 def run(args):
-    base_url = "https://stt-async.x2agi.com:8444"
     converted_path = None
-    converted_oracle_paths = []
+    time_map = None
+
+    # The keep-alive connection is opened in the background while the audio is converted
+    connections = ConnectionManager(base_urls={"stt_async": args.base_url})
+    connections.warm_sessions(["stt_async"], wait=False)
+    exporter = metrics.start_export(args)
 
     try:
         # Convert main audio if needed
-        if not args.no_convert:
+        if args.vad:
+            # Long silences are cut out before upload, timestamps are mapped back below
+            with metrics.stage("stt_async", "convert"):
+                converted_path, time_map = write_vad_audio(args.path, args.no_convert, args.vad_min_silence_s,
+                                                           args.vad_threshold_db)
+            if converted_path is None:
+                print("Skipping recognition: no speech found")
+                if args.save:
+                    save_in_time_label_format(args.save, [])
+                return
+            audio_path = converted_path
+        elif not args.no_convert:
             print("Converting main audio to 16kHz mono WAV...")
-            converted_path = convert_audio(args.path)
+            with metrics.stage("stt_async", "convert"):
+                converted_path = convert_audio(args.path)
             audio_path = converted_path
         else:
             audio_path = args.path
@@ -40,134 +157,41 @@ def run(args):
         # Process oracle speakers
         oracle_speaker_labels = []
         if args.oracle_speakers:
-            oracle_dir = os.path.dirname(os.path.abspath(args.oracle_speakers))
-            
-            with open(args.oracle_speakers, "r", encoding="utf-8") as f:
-                for line_num, line in enumerate(f, 1):
-                    info = json.loads(line.strip())
-                    
-                    # Resolve relative path
-                    original_audio_path = os.path.normpath(
-                        os.path.join(oracle_dir, info["audio_filepath"])
-                    )
-                    
-                    if not os.path.exists(original_audio_path):
-                        raise FileNotFoundError(
-                            f"Oracle audio not found: {original_audio_path} "
-                            f"(line {line_num} in {args.oracle_speakers})"
-                        )
-                    
-                    # Convert oracle audio if needed
-                    if not args.no_convert:
-                        print(f"Converting oracle audio: {original_audio_path}")
-                        converted_oracle = convert_audio(original_audio_path)
-                        converted_oracle_paths.append(converted_oracle)
-                        audio_data_path = converted_oracle
-                    else:
-                        audio_data_path = original_audio_path
-
-                    with open(audio_data_path, "rb") as audio_f:
-                        audio_data = base64.b64encode(audio_f.read()).decode("utf-8")
-                    
-                    oracle_speaker_labels.append({
-                        "speaker_label": info["speaker_label"],
-                        "audio_data": audio_data
-                    })
-
-        # Read and encode main audio
-        with open(audio_path, "rb") as audio_file:
-            audio_content = base64.b64encode(audio_file.read()).decode("utf-8")
-
-        # Setup request with retries
-        retry_strategy = requests.adapters.Retry(
-            total=5,
-            backoff_factor=2,
-            status_forcelist=[500, 502, 503, 504],
-            allowed_methods=["POST", "GET"],
-            backoff_jitter=0.3
+            cache = None
+            if not args.no_convert and not args.no_oracle_cache:
+                cache = OracleClipCache(args.oracle_cache_dir, args.oracle_cache_max_mb * 1024 * 1024)
+
+            # Clips are converted in parallel, cached clips are base64-encoded straight from their memory map
+            clips = read_oracle_speakers(args.oracle_speakers)
+            with metrics.stage("stt_async", "oracle_load"):
+                audio = load_oracle_clips(clips, args.no_convert, cache, args.oracle_workers)
+            for (speaker_label, _), audio_bytes in zip(clips, audio):
+                oracle_speaker_labels.append({
+                    "speaker_label": speaker_label,
+                    "audio_data": base64.b64encode(audio_bytes).decode("utf-8")
+                })
+            if cache is not None:
+                print(cache.summary())
+                cache.close()
+
+        finalized_diar_results = recognize(
+            connections.session("stt_async"), args.token, args.lang, audio_path, oracle_speaker_labels,
+            args.restrict_to_oracle_speaker_labels, args.base_url
         )
-        
-        with requests.Session() as session:
-            adapter = requests.adapters.HTTPAdapter(max_retries=retry_strategy)
-            session.mount("https://", adapter)
-            
-            headers = {
-                "Host": "stt-async.x2agi.com",
-                "Authorization": f"Bearer {args.token}",
-                "x-job-id": str(uuid.uuid4()),
-                "x-language": args.lang,
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            }
-
-            # Initial recognition request
-            payload = {
-                "oracle_speaker_labels": oracle_speaker_labels,
-                "restrict_to_oracle_speaker_labels": args.restrict_to_oracle_speaker_labels,
-                "custom_options": "{}",
-                "audio_data": audio_content
-            }
-
-            response = session.post(
-                f"{base_url}/recognizeFileAsync",
-                headers=headers,
-                json=payload,
-                timeout=10
-            )
-            
-            if response.status_code != 200:
-                raise RuntimeError(f"Failed to start recognition: {response.status_code} - {response.text}")
-
-            operation_id = response.json().get("id")
-            print(f"Server returned operation ID = {operation_id}")
-
-            # Polling loop
-            while True:
-                progress_resp = session.get(
-                    f"{base_url}/getProgress?operation_id={operation_id}",
-                    headers=headers,
-                    timeout=10
-                )
-                
-                if progress_resp.status_code != 200:
-                    raise RuntimeError(f"Progress check failed: {progress_resp.status_code}")
-                
-                progress_data = progress_resp.json()
-                print(f"Progress: {progress_data['progress']}%, Status: {progress_data['status']}")
-
-                if progress_data["status"] == "completed":
-                    break
-                elif progress_data["status"] == "failed":
-                    raise RuntimeError("Recognition failed on server")
-
-                time.sleep(2)
-
-            # Get final results
-            result_resp = session.get(
-                f"{base_url}/getRecognition?operation_id={operation_id}",
-                headers=headers,
-                timeout=10
-            )
-
-            if result_resp.status_code != 200:
-                raise RuntimeError(f"Failed to retrieve results: {result_resp.status_code}")
-
-            finalized_diar_results = []
-            for r in result_resp.json():
-                for segment in r["results"]:
-                    finalized_diar_results.append(segment)
-            print_diarization_output(finalized_diar_results)
-
-            if args.save:
-                save_in_time_label_format(args.save, finalized_diar_results)
+        if time_map is not None:
+            finalized_diar_results = [time_map.remap(segment) for segment in finalized_diar_results]
+        print_diarization_output(finalized_diar_results)
+
+        if args.save:
+            save_in_time_label_format(args.save, finalized_diar_results)
+        print(connections.summary())
 
     finally:
+        connections.close()
+        exporter.close()
         # Cleanup converted files
         if converted_path and os.path.exists(converted_path):
             os.remove(converted_path)
-        for path in converted_oracle_paths:
-            if os.path.exists(path):
-                os.remove(path)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -184,6 +208,23 @@ if __name__ == '__main__':
                        help="Base name for output files (.speakers and .text)")
     parser.add_argument("--no_convert", action="store_true", 
                        help="Skip audio conversion (files already 16kHz mono WAV)")
+    parser.add_argument("--vad", action="store_true",
+                       help="Drop long silences before upload (timestamps are mapped back); files without speech are skipped")
+    parser.add_argument("--vad_min_silence_s", type=float, default=1.0,
+                       help="Shortest silence removed by --vad")
+    parser.add_argument("--vad_threshold_db", type=float, default=None,
+                       help="Speech level threshold of --vad in dBFS (default: adaptive)")
+    parser.add_argument("--oracle_cache_dir", type=str, default=DEFAULT_CACHE_DIR,
+                       help="Directory of the converted oracle clip cache")
+    parser.add_argument("--oracle_cache_max_mb", type=int, default=512,
+                       help="Size cap of the oracle clip cache, least recently used clips are evicted")
+    parser.add_argument("--no_oracle_cache", action="store_true",
+                       help="Always convert oracle clips, bypassing the cache")
+    parser.add_argument("--oracle_workers", type=int, default=None,
+                       help="Maximum number of processes converting oracle clips in parallel (default: one per core; small sets are converted in-process)")
+    parser.add_argument("--base_url", type=str, default=BASE_URL,
+                       help="Service URL, e.g. http://127.0.0.1:8080 for mock_server.py")
+    metrics.add_arguments(parser)
 
     args = parser.parse_args()
     run(args)
@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+import time
+
+# Job states in the order a job goes through them; "failed" may follow any of them
+STATES = ("converted", "uploaded", "polling", "downloaded", "written", "failed")
+IN_FLIGHT = ("uploaded", "polling", "downloaded")  # an operation exists on the server
+
+
+class JobJournal:
+    """
+    Crash-safe log of the state transitions of batch jobs.
+
+    The journal is an append-only JSONL file with one record per transition:
+    {"time", "path", "save", "state", ...}. The "uploaded" record also carries
+    what is needed to find the operation again: operation_id, job_id (the
+    x-job-id the operation is pinned to), lang, audio_duration_s and, with
+    --vad, the kept sample ranges. The API key is never written.
+
+    Every record is flushed and fsynced before the job moves on, so after a
+    crash `state(job)` returns the last transition that happened. A line torn
+    by a crash in the middle of a write is ignored.
+
+        with JobJournal("results/journal.jsonl") as journal:
+            journal.record(job, "uploaded", operation_id=..., job_id=..., lang="en", audio_duration_s=...)
+            journal.state(job)["state"]  # "uploaded"
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._jobs = {}  # save -> all fields recorded for the job, latest values win
+        self._lock = threading.Lock()
+        ends_with_newline = True
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as inp:
+                for line in inp:
+                    ends_with_newline = line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._update(record)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        if not ends_with_newline:
+            self._file.write("\n")  # don't append to a torn line
+
+    def _update(self, record):
+        entry = self._jobs.setdefault(record["save"], {})
+        if record["state"] in ("converted", "failed"):
+            entry.clear()  # a new attempt: forget the previous operation
+        entry.update(record)
+
+    def record(self, job, state: str, **fields):
+        """Durably record that `job` reached `state`."""
+        if state not in STATES:
+            raise ValueError(f"unknown job state: {state}")
+        record = {"time": round(time.time(), 3), "path": job["path"], "save": job["save"], "state": state, **fields}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._update(record)
+
+    def state(self, job):
+        """The fields recorded for `job` since its last attempt started, or None."""
+        with self._lock:
+            entry = self._jobs.get(job["save"])
+            return dict(entry) if entry else None
+
+    def summary(self, jobs) -> str:
+        counts = {}
+        for job in jobs:
+            entry = self.state(job)
+            state = entry["state"] if entry else "new"
+            counts[state] = counts.get(state, 0) + 1
+        return "journal: " + ", ".join(f"{count} {state}" for state, count in sorted(counts.items())) + f" ({self.path})"
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,357 @@
+import argparse
+import collections
+import json
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import grpc
+from google.protobuf import empty_pb2, json_format
+
+from x2agi_speechkit import stubs
+
+pb2 = stubs.stt_async_pb2
+
+
+class RpcError(Exception):
+    """An error answer: mapped to a gRPC status or an HTTP status code."""
+
+    def __init__(self, code: grpc.StatusCode, http_status: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.http_status = http_status
+
+
+class MockBackend:
+    """
+    State and behaviour of the mock AsyncRecognizer, shared by the gRPC and REST front ends.
+
+    An operation is "pending" for `queue_delay_s`, then its progress grows
+    linearly over `realtime_factor` x the audio duration until "completed".
+    With probability `job_failure_rate` it turns "failed" halfway instead, and
+    every call is delayed by `latency_ms` +- `latency_jitter_ms` and answered
+    with UNAVAILABLE (HTTP 503) with probability `rpc_error_rate`.
+    """
+
+    def __init__(self, realtime_factor: float = 0.05, queue_delay_s: float = 0.0,
+                 latency_ms: float = 0.0, latency_jitter_ms: float = 0.0,
+                 rpc_error_rate: float = 0.0, job_failure_rate: float = 0.0,
+                 segment_s: float = 5.0, results_per_response: int = 10, seed: int = None):
+        self.realtime_factor = realtime_factor
+        self.queue_delay_s = queue_delay_s
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.rpc_error_rate = rpc_error_rate
+        self.job_failure_rate = job_failure_rate
+        self.segment_s = segment_s
+        self.results_per_response = results_per_response
+        self.calls = collections.Counter()
+        self.uploaded_bytes = 0
+        self._operations = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+
+    def begin(self, method: str, metadata: dict):
+        """Common prologue of every call: count it, check auth, inject latency and errors."""
+        with self._lock:
+            self.calls[method] += 1
+            delay_ms = max(0.0, self.latency_ms + self._rng.uniform(-1, 1) * self.latency_jitter_ms)
+            fail = self._rng.random() < self.rpc_error_rate
+        if not metadata.get("authorization", "").startswith("Bearer "):
+            raise RpcError(grpc.StatusCode.UNAUTHENTICATED, 401, "missing bearer token")
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+        if fail:
+            with self._lock:
+                self.calls["injected_errors"] += 1
+            raise RpcError(grpc.StatusCode.UNAVAILABLE, 503, "injected error")
+
+    def create(self, metadata: dict, audio_bytes: int, options) -> stubs.operation_pb2.Operation:
+        duration_s = max(0, audio_bytes - 44) / (16000 * 2)
+        labels = list(dict.fromkeys(label.speaker_label for label in options.oracle_speaker_labels))
+        if not labels or not options.restrict_to_oracle_speaker_labels:
+            labels += ["Speaker 1", "Speaker 2"]
+        num_segments = int(duration_s // self.segment_s) + (1 if duration_s % self.segment_s else 0)
+        segments = [
+            pb2.DiarizationResult(
+                start_time_ms=int(i * self.segment_s * 1000),
+                end_time_ms=int(min(duration_s, (i + 1) * self.segment_s) * 1000),
+                speaker_label=labels[i % len(labels)],
+                transcript=f"{metadata.get('x-language', '')} segment {i}",
+            )
+            for i in range(num_segments)
+        ]
+        operation_id = uuid.uuid4().hex[:24]
+        with self._lock:
+            self.uploaded_bytes += audio_bytes
+            self._operations[operation_id] = {
+                "job_id": metadata.get("x-job-id"),
+                "start": time.monotonic() + self.queue_delay_s,
+                "processing_s": max(0.1, duration_s * self.realtime_factor),
+                "fail": self._rng.random() < self.job_failure_rate,
+                "segments": segments,
+            }
+        return stubs.operation_pb2.Operation(id=operation_id, done=False)
+
+    def _get(self, operation_id: str, metadata: dict):
+        with self._lock:
+            operation = self._operations.get(operation_id)
+        # Like the service, operations are only found through the x-job-id they were created with
+        if operation is None or operation["job_id"] != metadata.get("x-job-id"):
+            raise RpcError(grpc.StatusCode.NOT_FOUND, 404, f"operation {operation_id} not found")
+        return operation
+
+    def progress(self, operation_id: str, metadata: dict) -> pb2.ProgressResponse:
+        operation = self._get(operation_id, metadata)
+        elapsed = time.monotonic() - operation["start"]
+        if elapsed < 0:
+            return pb2.ProgressResponse(operation_id=operation_id, status="pending", progress=0)
+        progress = min(100, int(100 * elapsed / operation["processing_s"]))
+        if operation["fail"] and progress >= 50:
+            return pb2.ProgressResponse(operation_id=operation_id, status="failed", progress=50, error="injected failure")
+        status = "completed" if progress >= 100 else "processing"
+        return pb2.ProgressResponse(operation_id=operation_id, status=status, progress=progress)
+
+    def results(self, operation_id: str, metadata: dict):
+        """StreamingResponse messages of a completed operation, `results_per_response` segments each."""
+        if self.progress(operation_id, metadata).status != "completed":
+            raise RpcError(grpc.StatusCode.FAILED_PRECONDITION, 400, "operation is not completed")
+        segments = self._get(operation_id, metadata)["segments"]
+        for i in range(0, len(segments), self.results_per_response):
+            yield pb2.StreamingResponse(
+                operation_id=operation_id,
+                response_wall_time_ms=int(time.time() * 1000),
+                results=segments[i:i + self.results_per_response],
+            )
+
+    def delete(self, operation_id: str, metadata: dict):
+        self._get(operation_id, metadata)
+        with self._lock:
+            self._operations.pop(operation_id, None)
+
+    def summary(self) -> str:
+        calls = ", ".join(f"{method}={count}" for method, count in sorted(self.calls.items()))
+        return f"mock server calls: {calls}; uploaded {self.uploaded_bytes / (1024 * 1024):.1f} MB"
+
+
+class MockAsyncRecognizer(stubs.stt_async_pb2_grpc.AsyncRecognizerServicer):
+    def __init__(self, backend: MockBackend):
+        self.backend = backend
+
+    def _call(self, method, context, handler):
+        metadata = dict(context.invocation_metadata())
+        try:
+            self.backend.begin(method, metadata)
+            return handler(metadata)
+        except RpcError as e:
+            context.abort(e.code, str(e))
+
+    def RecognizeFile(self, request, context):
+        return self._call("RecognizeFile", context, lambda metadata: self.backend.create(
+            metadata, len(request.audio_data), request))
+
+    def RecognizeFileStreaming(self, request_iterator, context):
+        def handler(metadata):
+            options = pb2.RecognitionOptions()
+            audio_bytes = 0
+            for request in request_iterator:
+                if request.HasField("options"):
+                    options = request.options
+                else:
+                    audio_bytes += len(request.audio_data)
+            return self.backend.create(metadata, audio_bytes, options)
+        return self._call("RecognizeFileStreaming", context, handler)
+
+    def GetRecognition(self, request, context):
+        responses = self._call("GetRecognition", context, lambda metadata: list(
+            self.backend.results(request.operation_id, metadata)))
+        yield from responses
+
+    def GetProgress(self, request, context):
+        return self._call("GetProgress", context, lambda metadata: self.backend.progress(
+            request.operation_id, metadata))
+
+    def DeleteRecognition(self, request, context):
+        self._call("DeleteRecognition", context, lambda metadata: self.backend.delete(
+            request.operation_id, metadata))
+        return empty_pb2.Empty()
+
+
+def _segment_json(segment):
+    # proto3 JSON mapping with field names kept: int64 values are strings
+    return {
+        "start_time_ms": str(segment.start_time_ms),
+        "end_time_ms": str(segment.end_time_ms),
+        "speaker_label": segment.speaker_label,
+        "transcript": segment.transcript,
+    }
+
+
+def make_rest_handler(backend: MockBackend):
+    """BaseHTTPRequestHandler class serving the REST routes of AsyncRecognizer from `backend`."""
+
+    class RestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real gateway
+
+        def do_POST(self):
+            url = urllib.parse.urlsplit(self.path)
+            if url.path != "/recognizeFileAsync":
+                return self._reply(404, {"message": f"unknown route {url.path}"})
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def handler(metadata):
+                request = json_format.Parse(body, pb2.RecognizeFileRequest())
+                operation = backend.create(metadata, len(request.audio_data), request)
+                return {"id": operation.id, "done": operation.done}
+            self._dispatch("recognizeFileAsync", handler)
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            operation_id = urllib.parse.parse_qs(url.query).get("operation_id", [""])[0]
+            if url.path == "/getProgress":
+                def handler(metadata):
+                    response = backend.progress(operation_id, metadata)
+                    return {"operation_id": response.operation_id, "status": response.status,
+                            "progress": response.progress, "error": response.error}
+            elif url.path == "/getRecognition":
+                def handler(metadata):
+                    return [
+                        {"operation_id": response.operation_id,
+                         "response_wall_time_ms": str(response.response_wall_time_ms),
+                         "results": [_segment_json(segment) for segment in response.results]}
+                        for response in backend.results(operation_id, metadata)
+                    ]
+            elif url.path == "/deleteRecognition":
+                def handler(metadata):
+                    backend.delete(operation_id, metadata)
+                    return {}
+            else:
+                return self._reply(404, {"message": f"unknown route {url.path}"})
+            self._dispatch(url.path.lstrip("/"), handler)
+
+        def _dispatch(self, method, handler):
+            metadata = {key.lower(): value for key, value in self.headers.items()}
+            try:
+                backend.begin(method, metadata)
+                self._reply(200, handler(metadata))
+            except RpcError as e:
+                self._reply(e.http_status, {"code": e.code.value[0], "message": str(e)})
+            except json_format.ParseError as e:
+                self._reply(400, {"code": grpc.StatusCode.INVALID_ARGUMENT.value[0], "message": str(e)})
+
+        def _reply(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return RestHandler
+
+
+class MockServer:
+    """
+    Local stand-in for stt-async.x2agi.com: gRPC on `grpc_port`, REST on `http_port`
+    (0 picks free ports). Point the clients at it with
+    `--endpoint <grpc_endpoint> --insecure` or `--base_url <base_url>`.
+    """
+
+    def __init__(self, backend: MockBackend = None, grpc_port: int = 50051, http_port: int = 8080,
+                 host: str = "127.0.0.1", max_workers: int = 64):
+        self.backend = backend or MockBackend()
+        self.host = host
+        self.grpc_port = grpc_port
+        self.http_port = http_port
+        self.max_workers = max_workers
+        self._grpc_server = None
+        self._http_server = None
+
+    @property
+    def grpc_endpoint(self) -> str:
+        return f"{self.host}:{self.grpc_port}"
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.http_port}"
+
+    def start(self):
+        self._grpc_server = grpc.server(
+            ThreadPoolExecutor(max_workers=self.max_workers),
+            options=[("grpc.max_receive_message_length", 1024 * 1024 * 1024)],
+        )
+        stubs.stt_async_pb2_grpc.add_AsyncRecognizerServicer_to_server(
+            MockAsyncRecognizer(self.backend), self._grpc_server)
+        self.grpc_port = self._grpc_server.add_insecure_port(f"{self.host}:{self.grpc_port}")
+        self._grpc_server.start()
+
+        self._http_server = ThreadingHTTPServer((self.host, self.http_port), make_rest_handler(self.backend))
+        self._http_server.daemon_threads = True
+        self.http_port = self._http_server.server_address[1]
+        threading.Thread(target=self._http_server.serve_forever, name="mock-rest", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._grpc_server is not None:
+            self._grpc_server.stop(grace=None)
+            self._grpc_server = None
+        if self._http_server is not None:
+            self._http_server.shutdown()
+            self._http_server.server_close()
+            self._http_server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def add_backend_arguments(parser):
+    parser.add_argument("--realtime_factor", type=float, default=0.05, help="processing time / audio duration")
+    parser.add_argument("--queue_delay_s", type=float, default=0.0, help="time every operation stays 'pending'")
+    parser.add_argument("--latency_ms", type=float, default=0.0, help="delay added to every call")
+    parser.add_argument("--latency_jitter_ms", type=float, default=0.0, help="uniform +- jitter of --latency_ms")
+    parser.add_argument("--rpc_error_rate", type=float, default=0.0, help="share of calls answered with UNAVAILABLE / HTTP 503")
+    parser.add_argument("--job_failure_rate", type=float, default=0.0, help="share of operations ending with status 'failed'")
+    parser.add_argument("--segment_s", type=float, default=5.0, help="length of the generated segments")
+    parser.add_argument("--results_per_response", type=int, default=10, help="segments per streamed StreamingResponse")
+    parser.add_argument("--seed", type=int, default=None, help="random seed of the injected latency and failures")
+
+
+def backend_from_args(args) -> MockBackend:
+    return MockBackend(
+        realtime_factor=args.realtime_factor, queue_delay_s=args.queue_delay_s,
+        latency_ms=args.latency_ms, latency_jitter_ms=args.latency_jitter_ms,
+        rpc_error_rate=args.rpc_error_rate, job_failure_rate=args.job_failure_rate,
+        segment_s=args.segment_s, results_per_response=args.results_per_response, seed=args.seed,
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local mock of the stt_async AsyncRecognizer service (gRPC and REST)")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="interface to listen on")
+    parser.add_argument("--grpc_port", type=int, default=50051, help="gRPC port")
+    parser.add_argument("--http_port", type=int, default=8080, help="REST port")
+    parser.add_argument("--max_workers", type=int, default=64, help="gRPC server threads")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockServer(backend_from_args(args), args.grpc_port, args.http_port, args.host, args.max_workers).start()
+    print(f"gRPC: --endpoint {server.grpc_endpoint} --insecure")
+    print(f"REST: --base_url {server.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(server.backend.summary())
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+
+from audio_converter import RESAMPLER_HALF_TAPS, TARGET_SAMPLE_RATE, convert_audio_to_buffer
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "X2AGI_ORACLE_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "x2agi-speechkit", "oracle_clips"),
+)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Everything besides the source content that changes the converted bytes.
+# Entries made with other parameters get other keys and age out of the cache.
+CONVERSION_PARAMS = {
+    "format": "wav_pcm16_mono",
+    "sample_rate": TARGET_SAMPLE_RATE,
+    "resampler_half_taps": RESAMPLER_HALF_TAPS,
+}
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DiskLRU:
+    """
+    A directory of `<key><suffix>` entries kept under `max_bytes`.
+
+    Entries are written through a temp file and os.replace, so concurrent
+    clients sharing the directory never see partial entries. `touch` bumps an
+    entry's mtime on every hit, and `evict` removes the least recently used
+    entries first. Files with other suffixes are left alone.
+    """
+
+    def __init__(self, cache_dir: str, suffix: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def touch(self, key: str) -> str:
+        """Mark the entry of `key` as recently used and return its path; FileNotFoundError on a miss."""
+        entry_path = self.path(key)
+        os.utime(entry_path)
+        return entry_path
+
+    def write(self, key: str, chunks):
+        """Store the bytes of `chunks` as the entry of `key`, then evict."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in chunks:
+                    out.write(chunk)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in `max_bytes`."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.suffix):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class OracleClipCache:
+    """
+    Persistent on-disk cache of converted oracle speaker clips.
+
+    Entries are keyed by the SHA-256 of the source file content plus
+    CONVERSION_PARAMS, so a renamed or copied clip is still a hit while an edited
+    one is not. Hits are served from a read-only memory map of the cached WAV
+    instead of running the converter again; the entry's mtime is bumped on every
+    hit and the least recently used entries are evicted once the cache grows
+    past `max_bytes`.
+
+        with OracleClipCache() as cache:
+            audio_data = cache.get("godfather_oracle/vito.wav")  # mmap of the 16kHz mono WAV
+
+    Entries live in a DiskLRU, so concurrent clients sharing the directory
+    never see partial entries.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES, log=print):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.log = log
+        self.hits = 0
+        self.misses = 0
+        self._params = hashlib.sha256(json.dumps(CONVERSION_PARAMS, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        self._maps = []
+        self._entries = DiskLRU(cache_dir, ".wav", max_bytes)
+
+    def key(self, source_path: str) -> str:
+        return f"{_file_digest(source_path)}-{self._params}"
+
+    def lookup(self, key: str):
+        """Cached audio for `key` as a read-only buffer (mmap), or None."""
+        try:
+            data = self._map(self._entries.touch(key))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def store(self, key: str, data):
+        self._entries.write(key, [data])
+
+    def get(self, source_path: str):
+        """Converted audio of `source_path` as a read-only buffer (mmap), converting it on a miss."""
+        key = self.key(source_path)
+        data = self.lookup(key)
+        if data is not None:
+            self.log(f"Oracle audio from cache: {source_path}")
+            return data
+        self.log(f"Converting oracle audio: {source_path}")
+        data = convert_audio_to_buffer(source_path)
+        self.store(key, data)
+        return data
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in `max_bytes`."""
+        self._entries.evict()
+
+    def summary(self) -> str:
+        return f"oracle clip cache: {self.hits} hits, {self.misses} misses ({self.cache_dir})"
+
+    def close(self):
+        for m in self._maps:
+            m.close()
+        self._maps.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _map(self, entry_path: str):
+        with open(entry_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(m)
+        return m
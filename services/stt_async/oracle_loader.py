@@ -0,0 +1,123 @@
+import json
+import multiprocessing
+import os
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+from audio_converter import TARGET_SAMPLE_RATE, convert_audio_to_buffer
+
+# Input to convert that a pool worker must get to pay for its start-up (see benchmark_oracle_loader.py):
+# smaller loads are converted in-process
+POOL_MIN_BYTES_PER_WORKER = 64 * 2**20
+
+
+def read_oracle_speakers(oracle_speakers: str):
+    """(speaker_label, audio path) pairs of a JSONL file of audio_filepath/speaker_label, in file order."""
+    oracle_dir = os.path.dirname(os.path.abspath(oracle_speakers))
+    assert os.path.exists(oracle_speakers), f"Cannot find {oracle_speakers}"
+    clips = []
+    with open(oracle_speakers, "r", encoding="utf-8") as inp:
+        for line_num, line in enumerate(inp, 1):
+            if not line.strip():
+                continue
+            try:
+                info = json.loads(line.strip())
+            except json.JSONDecodeError:
+                raise ValueError(f"Invalid JSON in line {line_num} of {oracle_speakers}")
+
+            # Resolve relative paths to oracle_speakers directory
+            original_audio_path = os.path.normpath(
+                os.path.join(oracle_dir, info["audio_filepath"])
+            )
+
+            if not os.path.exists(original_audio_path):
+                raise FileNotFoundError(
+                    f"Oracle audio file not found: {original_audio_path} "
+                    f"(from line {line_num} in {oracle_speakers})"
+                )
+            clips.append((info["speaker_label"], original_audio_path))
+    return clips
+
+
+def _conversion_bytes(path: str) -> int:
+    """Input size of a clip that needs converting; 0 for a 16kHz mono WAV, which is passed through."""
+    try:
+        with wave.open(path, "rb") as reader:
+            if (reader.getframerate(), reader.getnchannels(), reader.getsampwidth()) == (TARGET_SAMPLE_RATE, 1, 2):
+                return 0
+    except (wave.Error, EOFError):
+        pass
+    return os.path.getsize(path)
+
+
+def _convert_clip(path: str):
+    # The wall-clock start and the worker's pid place the clip on a trace
+    started_at = time.time()
+    start = time.perf_counter()
+    data = convert_audio_to_buffer(path)
+    return data, time.perf_counter() - start, started_at, os.getpid()
+
+
+def _convert_clips(paths, workers: int):
+    """_convert_clip results of every path, in order, on a pool of `workers` processes (in-process for 1)."""
+    if workers <= 1:
+        return [_convert_clip(path) for path in paths]
+    # Spawned rather than forked: the clients' gRPC channels are already connecting in other threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(_convert_clip, paths))
+
+
+def load_oracle_clips(clips, no_convert: bool, cache=None, workers: int = None, log=print, trace=None):
+    """
+    Audio of every (speaker_label, path) clip, in the same order.
+
+    Clips missing from `cache` (an oracle_cache.OracleClipCache, optional) are
+    converted and added to the cache: in-process, or on a pool of up to `workers`
+    processes (one per core by default) when every process gets at least
+    POOL_MIN_BYTES_PER_WORKER of input to convert. The conversion time of every
+    clip and of the whole stage is reported through `log`; with an x2agi_speechkit
+    JobTrace, every conversion is a span on the track of the worker that ran it.
+    """
+    start = time.perf_counter()
+    if no_convert:
+        audio = []
+        for _, path in clips:
+            with open(path, "rb") as f:
+                audio.append(f.read())
+        return audio
+
+    audio = [None] * len(clips)
+    keys = [None] * len(clips)
+    pending = []
+    for i, (_, path) in enumerate(clips):
+        if cache is not None:
+            keys[i] = cache.key(path)
+            audio[i] = cache.lookup(keys[i])
+            if audio[i] is not None:
+                log(f"Oracle audio from cache: {path}")
+                if trace is not None:
+                    trace.instant("oracle cache", os.path.basename(path), path=path, speaker_label=clips[i][0])
+                continue
+        pending.append(i)
+
+    paths = [clips[i][1] for i in pending]
+    input_bytes = sum(_conversion_bytes(path) for path in paths)
+    workers = min(workers or os.cpu_count() or 1, len(pending), input_bytes // POOL_MIN_BYTES_PER_WORKER)
+    conversion_s = 0.0
+    if pending:
+        results = _convert_clips(paths, workers)
+        for i, (data, elapsed, started_at, pid) in zip(pending, results):
+            log(f"Converted oracle audio in {elapsed * 1000:.0f} ms: {clips[i][1]}")
+            if trace is not None:
+                trace.add(f"oracle worker {pid}", os.path.basename(clips[i][1]), started_at, started_at + elapsed,
+                          path=clips[i][1], speaker_label=clips[i][0], bytes=len(data))
+            audio[i] = data
+            conversion_s += elapsed
+            if cache is not None:
+                cache.store(keys[i], data)
+
+    log(f"Loaded {len(clips)} oracle clips in {time.perf_counter() - start:.2f}s "
+        f"({len(pending)} converted on {max(workers, 1)} workers in {conversion_s:.2f}s of conversion time, "
+        f"{len(clips) - len(pending)} from cache)")
+    return audio
@@ -0,0 +1,80 @@
+import mmap
+import struct
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # 16-bit mono PCM, the format the service expects
+
+
+def wav_header(num_bytes: int) -> bytes:
+    """44-byte header of a 16kHz mono 16-bit WAV with `num_bytes` of PCM data."""
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + num_bytes, b"WAVE",
+        b"fmt ", 16, 1, 1, SAMPLE_RATE, SAMPLE_RATE * SAMPLE_WIDTH, SAMPLE_WIDTH, 16,
+        b"data", num_bytes,
+    )
+
+
+def open_pcm(path: str):
+    """
+    Memory-map a 16kHz mono 16-bit WAV (the converter's output): returns
+    (mmap, offset, length) of its data chunk. Samples are read with
+    np.frombuffer(data, "<i2", length // 2, offset) without loading the file.
+    """
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        data.close()
+        raise ValueError(f"{path} is not a WAV file")
+    position = 12
+    fmt = None
+    while position + 8 <= len(data):
+        chunk_id, chunk_size = struct.unpack_from("<4sI", data, position)
+        body = position + 8
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack_from("<HHIIHH", data, body)
+        elif chunk_id == b"data":
+            if fmt is None or (fmt[0], fmt[1], fmt[2], fmt[5]) != (1, 1, SAMPLE_RATE, 16):
+                data.close()
+                raise ValueError(f"{path} is not 16kHz mono 16-bit PCM, convert it first")
+            # Streamed WAVs may carry a placeholder size: trust the file length
+            length = min(chunk_size, len(data) - body) // SAMPLE_WIDTH * SAMPLE_WIDTH
+            return data, body, length
+        position = body + chunk_size + (chunk_size & 1)
+    data.close()
+    raise ValueError(f"{path} has no data chunk")
+
+
+def frame_energy_db(samples, frame_ms: int = 20, block_frames: int = 4096):
+    """
+    RMS level in dBFS of consecutive `frame_ms` frames (the last partial frame
+    is dropped). Computed `block_frames` frames at a time, so a memory-mapped
+    recording is never copied whole: only one block is held as floats.
+    """
+    frame = SAMPLE_RATE * frame_ms // 1000
+    num_frames = len(samples) // frame
+    energy = np.empty(num_frames, dtype=np.float32)
+    for first in range(0, num_frames, block_frames):
+        last = min(first + block_frames, num_frames)
+        frames = np.asarray(samples[first * frame:last * frame], dtype=np.float32).reshape(last - first, frame)
+        frames /= 32768.0
+        np.square(frames, out=frames)
+        energy[first:last] = np.sqrt(np.mean(frames, axis=1))
+    return 20 * np.log10(np.maximum(energy, 1e-5))
+
+
+def quietest_point(samples, start: int, end: int, frame_ms: int = 20, window_ms: int = 500) -> int:
+    """
+    Sample index in [start, end) at the centre of the quietest `window_ms`
+    stretch, i.e. the best place to cut without splitting a word.
+    """
+    start, end = max(0, start), min(len(samples), end)
+    energy = frame_energy_db(samples[start:end], frame_ms)
+    window = max(1, window_ms // frame_ms)
+    if len(energy) <= window:
+        return (start + end) // 2
+    smoothed = np.convolve(energy, np.ones(window) / window, mode="valid")
+    best = int(np.argmin(smoothed))
+    return start + (best + window // 2) * (SAMPLE_RATE * frame_ms // 1000)
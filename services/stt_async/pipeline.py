@@ -0,0 +1,305 @@
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+_STOP = object()
+_WORKERS = {"thread": "threads", "process": "processes", "async": "in flight"}
+
+
+class Cancelled(RuntimeError):
+    """The error of items that were still queued when the pipeline was cancelled."""
+
+
+class Finished:
+    """Returned by a stage function to take an item out of the pipeline early with `value` as its result."""
+
+    def __init__(self, value=None):
+        self.value = value
+
+
+class StageStats:
+    """
+    Counters of one stage. Busy time and queue depth are integrated over time,
+    so utilization is the busy fraction of the stage's workers and the queue
+    depth an average, not a snapshot.
+    """
+
+    def __init__(self, name: str, kind: str, workers: int, queue_size: int):
+        self.name = name
+        self.kind = kind
+        self.workers = workers
+        self.queue_size = queue_size
+        self.items = 0
+        self.failed = 0
+        self.finished = 0  # items that left the pipeline at this stage, e.g. cache hits
+        self.busy_s = 0.0
+        self.blocked_s = 0.0  # time finished items waited for room in the next stage's queue
+        self.queued = 0
+        self.max_queued = 0
+        self.active = 0
+        self._queued_s = 0.0  # integral of the queue depth over time
+        self._since = self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _advance(self, now):
+        self._queued_s += self.queued * (now - self._since)
+        self._since = now
+
+    def queue_depth(self, depth: int):
+        with self._lock:
+            self._advance(time.monotonic())
+            self.queued = depth
+            self.max_queued = max(self.max_queued, depth)
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def utilization(self, elapsed_s: float) -> float:
+        return self.busy_s / (self.workers * elapsed_s) if elapsed_s > 0 else 0.0
+
+    def mean_queued(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._advance(now)
+            return self._queued_s / (now - self._start) if now > self._start else 0.0
+
+    def status(self) -> str:
+        return f"{self.name} {self.active}/{self.workers} busy, {self.queued} queued"
+
+    def summary(self, elapsed_s: float) -> str:
+        text = (f"{self.name:<10}{self.workers:>3} {_WORKERS[self.kind]:<10} utilization {100 * self.utilization(elapsed_s):3.0f}%, "
+                f"queue {self.mean_queued():.1f} avg / {self.max_queued} max of {self.queue_size}, "
+                f"{self.items} items ({self.failed} failed")
+        if self.finished:
+            text += f", {self.finished} finished here"
+        return text + f"), {self.blocked_s:.1f}s blocked on the next stage"
+
+
+def _ignore_interrupt():
+    # Ctrl-C reaches the whole process group: leave it to the parent, which cancels the
+    # pipeline and gets the results of the work in progress instead of half-written files
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class _Stage:
+    def __init__(self, pipeline, name, fn, workers, kind, queue_size):
+        self.pipeline = pipeline
+        self.name = name
+        self.fn = fn
+        self.kind = kind
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = StageStats(name, kind, workers, queue_size)
+        self.next = None
+        # Spawned rather than forked: forking a process whose gRPC threads are running is unsafe
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_ignore_interrupt) if kind == "process" else None
+        self._slots = threading.BoundedSemaphore(workers) if kind == "async" else None
+        count = 1 if kind == "async" else workers
+        self._threads = [threading.Thread(target=self._dispatch if kind == "async" else self._work,
+                                          name=f"pipeline-{name}", daemon=True) for _ in range(count)]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, item):
+        self.queue.put(item)
+        self.stats.queue_depth(self.queue.qsize())
+
+    def _get(self):
+        item = self.queue.get()
+        if item is not _STOP:
+            self.stats.queue_depth(self.queue.qsize())
+        return item
+
+    def _forward(self, item, result):
+        """Hand a processed item on; blocks while the next stage's queue is full (backpressure)."""
+        if isinstance(result, Finished):
+            self.stats.add(finished=1)
+            self.pipeline._finish(item, result.value, None)
+        elif self.next is None:
+            self.pipeline._finish(item, result, None)
+        elif self.pipeline.cancelled:
+            self.pipeline._finish(result, None, Cancelled("pipeline cancelled"))
+        else:
+            start = time.monotonic()
+            self.next.put(result)
+            self.stats.add(blocked_s=time.monotonic() - start)
+
+    def _fail(self, item, error):
+        self.stats.add(failed=1)
+        self.pipeline._finish(item, None, error)
+
+    def _work(self):
+        while True:
+            item = self._get()
+            if item is _STOP:
+                return
+            if self.pipeline.cancelled:
+                self.pipeline._finish(item, None, Cancelled("pipeline cancelled"))
+                continue
+            self.stats.add(active=1)
+            start = time.monotonic()
+            try:
+                if self._pool is not None:
+                    result = self._pool.submit(self.fn, item).result()
+                else:
+                    result = self.fn(item)
+            except BaseException as e:  # including a KeyboardInterrupt of a pool process
+                result, error = None, e
+            else:
+                error = None
+            self.stats.add(active=-1, items=1, busy_s=time.monotonic() - start)
+            if error is not None:
+                self._fail(item, error)
+            else:
+                self._forward(item, result)
+
+    def _dispatch(self):
+        # One thread starts the work of each item; completions are handed on from the
+        # thread that resolves the future. An item holds its slot until it is handed on,
+        # so at most `workers` items are in flight and the next queue pushes back here.
+        while True:
+            self._slots.acquire()
+            item = self._get()
+            if item is _STOP:
+                self._slots.release()
+                return
+            if self.pipeline.cancelled:
+                self._slots.release()
+                self.pipeline._finish(item, None, Cancelled("pipeline cancelled"))
+                continue
+            self.stats.add(active=1)
+            start = time.monotonic()
+            try:
+                future = self.fn(item)
+            except Exception as e:
+                self._done(item, start, None, e)
+                continue
+            future.add_done_callback(lambda future, item=item, start=start: self._on_done(item, start, future))
+
+    def _on_done(self, item, start, future):
+        error = future.exception()
+        result = future.result() if error is None else None
+        if isinstance(result, Finished):
+            self._done(item, start, result, None)
+        else:
+            self._done(item, start, item, error)
+
+    def _done(self, item, start, result, error):
+        try:
+            self.stats.add(active=-1, items=1, busy_s=time.monotonic() - start)
+            if error is not None:
+                self._fail(item, error)
+            else:
+                self._forward(item, result)
+        finally:
+            self._slots.release()
+
+    def stop(self, cancel=False):
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        if self._slots is not None and not cancel:
+            for _ in range(self.stats.workers):
+                self._slots.acquire()  # the items still in flight have been handed on
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=cancel)
+
+
+class Pipeline:
+    """
+    Items flow through a chain of stages, each with its own pool of workers and
+    a bounded input queue. A stage that falls behind fills its queue and the
+    stages before it block on handing items on, so a slow network stalls
+    conversion instead of piling up converted audio, and a full pipeline
+    blocks `put()`.
+
+    A stage function takes an item and returns the item for the next stage,
+    or Finished(value) to leave the pipeline early. Stage kinds:
+      - "thread": `workers` threads, for blocking I/O such as gRPC calls;
+      - "process": a pool of `workers` spawned processes, for CPU-bound work; the
+        function and the items must be picklable, and the returned item replaces the input;
+      - "async": the function starts the work and returns a Future, e.g. from
+        progress_scheduler.ProgressScheduler.track(); the item moves on once the
+        Future resolves, at most `workers` items are in flight.
+    An exception fails the item. Every item comes out through `on_result(item,
+    value, error)`, called from the worker that finished it; `value` is the
+    result of the last stage or of Finished. Leaving the `with` block on an
+    exception (e.g. Ctrl-C) cancels the pipeline: the items in progress are
+    finished, the queued ones come out with a Cancelled error.
+
+        with Pipeline(on_result) as pipeline:
+            pipeline.add_stage("convert", convert, workers=8, kind="process")
+            pipeline.add_stage("upload", upload, workers=4)
+            for item in items:
+                pipeline.put(item)
+            ...  # wait for every on_result
+        print(pipeline.summary())
+    """
+
+    def __init__(self, on_result, queue_size: int = 4):
+        self.on_result = on_result
+        self.queue_size = queue_size
+        self.stages = []
+        self.cancelled = False
+        self._started = None
+        self._ended = None
+
+    def add_stage(self, name: str, fn, workers: int = 1, kind: str = "thread", queue_size: int = None):
+        if kind not in ("thread", "process", "async"):
+            raise ValueError(f"unknown stage kind: {kind}")
+        if self._started is not None:
+            raise RuntimeError("stages must be added before the first item")
+        stage = _Stage(self, name, fn, max(1, workers), kind, queue_size or self.queue_size)
+        if self.stages:
+            self.stages[-1].next = stage
+        self.stages.append(stage)
+        return stage.stats
+
+    def put(self, item):
+        """Feed an item to the first stage; blocks while its queue is full."""
+        if self._started is None:
+            self._started = time.monotonic()
+            for stage in self.stages:
+                stage.start()
+        self.stages[0].put(item)
+
+    def _finish(self, item, value, error):
+        self.on_result(item, value, error)
+
+    def close(self, cancel: bool = False):
+        """
+        Stop the workers once the items already fed have come out; with `cancel`,
+        once the items in progress have, without waiting for the async stages.
+        """
+        self.cancelled = self.cancelled or cancel
+        if self._started is not None and self._ended is None:
+            for stage in self.stages:
+                stage.stop(self.cancelled)
+            self._ended = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        self.close(cancel=exc_type is not None)
+
+    def elapsed_s(self) -> float:
+        if self._started is None:
+            return 0.0
+        return (self._ended or time.monotonic()) - self._started
+
+    def status(self) -> str:
+        """One line of the current state of every stage, for periodic reporting."""
+        return " | ".join(stage.stats.status() for stage in self.stages)
+
+    def summary(self) -> str:
+        elapsed = self.elapsed_s()
+        return f"pipeline ({elapsed:.1f}s):" + "".join(f"\n\t{stage.stats.summary(elapsed)}" for stage in self.stages)
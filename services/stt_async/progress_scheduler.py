@@ -0,0 +1,133 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from x2agi_speechkit.progress_poller import AdaptivePoller
+
+
+class OperationFailed(RuntimeError):
+    """The server reported the operation as failed (as opposed to a failed GetProgress call)."""
+
+
+class ProgressScheduler:
+    """
+    Polls the progress of many outstanding operations on one shared schedule.
+
+    GetProgress takes a single operation_id, so polls cannot be merged into one
+    RPC; instead every tracked operation keeps an AdaptivePoller that decides
+    when it is next due, and one scheduler thread dispatches due polls in order
+    while keeping the total rate under `max_polls_per_second`, however many
+    operations are in flight. When the budget is exhausted polls are delayed,
+    the earliest-due first.
+
+    `track()` returns a Future resolved with the final ProgressResponse once the
+    operation completes (OperationFailed if it fails, or the exception raised
+    by `poll` or `on_progress`), so GetRecognition can be started from its
+    done-callback without a thread waiting per job.
+
+        with ProgressScheduler(max_polls_per_second=10) as scheduler:
+            future = scheduler.track(lambda: stub.GetProgress(request, metadata=metadata))
+            future.add_done_callback(download)
+
+    The scheduler is service-agnostic: `poll` may call stt_async or
+    postprocess_asr, it only has to return a ProgressResponse.
+    """
+
+    def __init__(self, max_polls_per_second: float = 5.0, max_concurrent_polls: int = 4,
+                 fixed_interval: float = 5.0, on_progress=None):
+        self.max_polls_per_second = max_polls_per_second
+        self.fixed_interval = fixed_interval
+        self.on_progress = on_progress
+        self.polls = 0
+        self.completed = 0
+        self.fixed_interval_polls = 0  # what per-job fixed-interval loops would have spent on the completed jobs
+        self._dispatch_interval = 1.0 / max_polls_per_second
+        self._heap = []  # (due time, sequence, entry)
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._stopped = False
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_polls)
+        self._thread = threading.Thread(target=self._run, name="progress-scheduler", daemon=True)
+        self._thread.start()
+
+    def track(self, poll, audio_duration_s: float = None) -> Future:
+        """Start polling an operation; `poll()` must issue one GetProgress call and return its response."""
+        future = Future()
+        entry = (poll, AdaptivePoller(self.fixed_interval, audio_duration_s), future)
+        self._push(time.monotonic(), entry)
+        return future
+
+    def close(self):
+        with self._cond:
+            self._stopped = True
+            pending = [entry for _, _, entry in self._heap]
+            self._heap.clear()
+            self._cond.notify()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+        for _, _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("progress scheduler stopped before the operation completed"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def summary(self) -> str:
+        return (f"GetProgress calls: {self.polls} for {self.completed} completed operations "
+                f"(budget {self.max_polls_per_second:g}/s; polling each every {self.fixed_interval:g}s "
+                f"would take {self.fixed_interval_polls})")
+
+    def _push(self, due, entry):
+        with self._cond:
+            if not self._stopped:
+                heapq.heappush(self._heap, (due, next(self._sequence), entry))
+                self._cond.notify()
+                return
+        # Rescheduled by a poll that was in progress when the scheduler was closed
+        entry[2].set_exception(RuntimeError("progress scheduler stopped before the operation completed"))
+
+    def _run(self):
+        next_slot = time.monotonic()
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    now = time.monotonic()
+                    if self._heap and self._heap[0][0] <= now and next_slot <= now:
+                        break
+                    timeout = max(self._heap[0][0], next_slot) - now if self._heap else None
+                    self._cond.wait(timeout)
+                _, _, entry = heapq.heappop(self._heap)
+            next_slot = now + self._dispatch_interval
+            self._executor.submit(self._poll, entry)
+
+    def _poll(self, entry):
+        poll, poller, future = entry
+        try:
+            response = poll()
+            poller.record(response.progress)
+            with self._stats_lock:
+                self.polls += 1
+            if self.on_progress is not None:
+                self.on_progress(response)
+        except Exception as e:
+            # Resolved either way, or wait() on the job would never return
+            future.set_exception(e)
+            return
+
+        if response.status == "completed":
+            with self._stats_lock:
+                self.completed += 1
+                self.fixed_interval_polls += poller.fixed_interval_polls()
+            future.set_result(response)
+        elif response.status == "failed":
+            future.set_exception(OperationFailed(f"Operation {response.operation_id} failed: {response.error or 'please contact support.'}"))
+        else:
+            self._push(time.monotonic() + poller.next_interval(), entry)
@@ -0,0 +1,61 @@
+import base64
+import json
+import os
+
+# Raw bytes encoded per step: a multiple of 3, so the base64 pieces concatenate
+# to exactly the encoding of the whole file (no padding in between)
+ENCODE_CHUNK_SIZE = 3 * 256 * 1024
+
+
+class Base64JsonBody:
+    """
+    Request body `{...payload, "<field>": "<base64 of source>"}` produced chunk by
+    chunk instead of building the base64 string and the JSON document in memory.
+
+    `source` is a file path or a bytes-like object (bytes, bytearray, mmap,
+    memoryview); paths are read ENCODE_CHUNK_SIZE bytes at a time and buffers are
+    sliced through a memoryview without copying, so peak memory stays at about
+    one chunk whatever the file length. The output is byte-identical to
+    `json.dumps({**payload, field: base64.b64encode(data).decode()})`.
+
+    The body length is known up front, so requests sends it with Content-Length
+    rather than chunked transfer encoding, and the body can be iterated again
+    when urllib3 retries the request:
+
+        session.post(url, data=Base64JsonBody(payload, "audio_data", path), headers=headers)
+    """
+
+    def __init__(self, payload: dict, field: str, source, chunk_size: int = ENCODE_CHUNK_SIZE):
+        if chunk_size % 3:
+            raise ValueError(f"chunk_size must be a multiple of 3, got {chunk_size}")
+        self.source = source
+        self.chunk_size = chunk_size
+        self.source_size = os.path.getsize(source) if isinstance(source, (str, os.PathLike)) else memoryview(source).nbytes
+
+        fields = {key: value for key, value in payload.items() if key != field}
+        document = json.dumps({**fields, field: ""})
+        split = len(document) - 2  # between the quotes of the placeholder value
+        self._prefix = document[:split].encode("utf-8")
+        self._suffix = document[split:].encode("utf-8")
+
+    def __len__(self):
+        return len(self._prefix) + 4 * ((self.source_size + 2) // 3) + len(self._suffix)
+
+    def __iter__(self):
+        yield self._prefix
+        for chunk in self._iter_source():
+            yield base64.b64encode(chunk)
+        yield self._suffix
+
+    def _iter_source(self):
+        if isinstance(self.source, (str, os.PathLike)):
+            with open(self.source, "rb") as inp:
+                while True:
+                    chunk = inp.read(self.chunk_size)
+                    if not chunk:
+                        return
+                    yield chunk
+        else:
+            view = memoryview(self.source).cast("B")
+            for offset in range(0, len(view), self.chunk_size):
+                yield view[offset:offset + self.chunk_size]
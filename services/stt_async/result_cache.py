@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+
+from x2agi_speechkit import stubs
+
+from oracle_cache import DiskLRU
+
+DEFAULT_RESULT_CACHE_DIR = os.environ.get(
+    "X2AGI_RESULT_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "x2agi-speechkit", "results"),
+)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+
+class SpooledAudio:
+    """
+    Converted upload audio spooled to an anonymous temp file while its SHA-256
+    is computed, so the result cache can be checked before anything is sent.
+    `chunks()` then streams the spooled audio for the upload.
+    """
+
+    def __init__(self, audio_chunks, chunk_size: int = SPOOL_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.size = 0
+        digest = hashlib.sha256()
+        self._file = tempfile.TemporaryFile()
+        try:
+            for chunk in audio_chunks:
+                digest.update(chunk)
+                self._file.write(chunk)
+                self.size += len(chunk)
+        except BaseException:
+            self._file.close()
+            raise
+        self.digest = digest.hexdigest()
+
+    @property
+    def duration_s(self) -> float:
+        return max(0, self.size - 44) / (16000 * 2)
+
+    def chunks(self):
+        self._file.seek(0)
+        for chunk in iter(lambda: self._file.read(self.chunk_size), b""):
+            yield chunk
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ResultCache:
+    """
+    Persistent on-disk cache of finished recognitions.
+
+    Entries are keyed by the SHA-256 of the converted audio (see SpooledAudio)
+    plus everything else that changes the result: the x-language, the oracle
+    speaker labels with the hashes of their audio, and
+    restrict_to_oracle_speaker_labels. An entry holds the job's StreamingResponse
+    messages, so a hit replays them instead of calling RecognizeFileStreaming
+    and is not billed again.
+
+        cache = ResultCache()
+        with SpooledAudio(audio_chunks) as audio:
+            key = cache.key(audio.digest, lang, oracle_speaker_labels, restrict)
+            responses = cache.lookup(key)  # None on a miss
+
+    As with the oracle clip cache, entries live in a DiskLRU: they are written
+    through a temp file and os.replace, their mtime is bumped on every hit and
+    the least recently used ones are evicted once the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_RESULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.saved_s = 0.0  # audio duration served from the cache instead of being re-submitted
+        self._lock = threading.Lock()  # the counters are shared by batch_grpc.py's upload threads
+        self._entries = DiskLRU(cache_dir, ".pb", max_bytes)
+
+    def key(self, audio_digest: str, lang: str, oracle_speaker_labels, restrict_to_oracle_speaker_labels: bool) -> str:
+        options = {
+            "audio": audio_digest,
+            "lang": lang,
+            "oracle": [[label.speaker_label, hashlib.sha256(label.audio_data).hexdigest()]
+                       for label in oracle_speaker_labels],
+            "restrict": bool(restrict_to_oracle_speaker_labels),
+        }
+        return hashlib.sha256(json.dumps(options, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str, duration_s: float = 0.0):
+        """The cached StreamingResponse messages of `key`, or None; `duration_s` of a hit counts as saved."""
+        try:
+            with open(self._entries.touch(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        responses = []
+        position = 0
+        while position < len(data):
+            size, = struct.unpack_from("<I", data, position)
+            response = stubs.stt_async_pb2.StreamingResponse()
+            response.ParseFromString(data[position + 4:position + 4 + size])
+            responses.append(response)
+            position += 4 + size
+        with self._lock:
+            self.hits += 1
+            self.saved_s += duration_s
+        return responses
+
+    def store(self, key: str, responses):
+        """Store the serialized StreamingResponse messages of a finished job."""
+        self._entries.write(key, (struct.pack("<I", len(response)) + response for response in responses))
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in `max_bytes`."""
+        self._entries.evict()
+
+    def summary(self) -> str:
+        return (f"result cache: {self.hits} hits, {self.misses} misses, "
+                f"{self.saved_s:.1f}s of audio not re-submitted ({self.cache_dir})")
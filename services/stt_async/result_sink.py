@@ -0,0 +1,91 @@
+import json
+import os
+
+
+def segment_fields(segment):
+    """(start_ms, end_ms, speaker_label, transcript) of a DiarizationResult or its REST dict."""
+    if isinstance(segment, dict):
+        return int(segment["start_time_ms"]), int(segment["end_time_ms"]), segment["speaker_label"], segment["transcript"]
+    return segment.start_time_ms, segment.end_time_ms, segment.speaker_label, segment.transcript
+
+
+class ResultSink:
+    """
+    Writes recognition results as they are downloaded instead of after the whole
+    GetRecognition stream has been buffered.
+
+    Every segment is appended to `<output_name>.speakers` and `<output_name>.text`
+    (the format of save_in_time_label_format) and, with `ndjson=True`, as one
+    JSON object per line to `<output_name>.ndjson`. Files are flushed after each
+    StreamingResponse, so tools tailing them can start before the download ends,
+    and memory use does not grow with the number of segments. If the download
+    fails inside the `with` block the partial files are removed, so they are
+    never mistaken for complete results.
+
+        with ResultSink("call.result", ndjson=True) as sink:
+            for response in responses:
+                sink.write_response(response)
+    """
+
+    def __init__(self, output_name: str = None, ndjson: bool = False, echo=None):
+        self.echo = echo  # e.g. print, to show every segment as it arrives
+        self.segments = 0
+        self._files = []
+        self._speakers = self._text = self._ndjson = None
+        if output_name is not None:
+            self._speakers = self._open(output_name + ".speakers")
+            self._text = self._open(output_name + ".text")
+            if ndjson:
+                self._ndjson = self._open(output_name + ".ndjson")
+
+    def _open(self, path):
+        out = open(path, "w", encoding="utf-8")
+        self._files.append(out)
+        return out
+
+    def write(self, segment):
+        start_ms, end_ms, speaker_label, transcript = segment_fields(segment)
+        if self.echo is not None:
+            self.echo(f"\tfinal {speaker_label} : {transcript}")
+        if self._speakers is not None:
+            self._speakers.write(f"{start_ms / 1000}\t{end_ms / 1000}\t{speaker_label}\n")
+            self._text.write(f"{start_ms / 1000}\t{end_ms / 1000}\t{transcript.strip()}\n")
+        if self._ndjson is not None:
+            self._ndjson.write(json.dumps({
+                "start_time_ms": start_ms,
+                "end_time_ms": end_ms,
+                "speaker_label": speaker_label,
+                "transcript": transcript,
+            }, ensure_ascii=False) + "\n")
+        self.segments += 1
+
+    def write_response(self, response):
+        """Write the segments of one StreamingResponse (or REST response dict) and flush."""
+        for segment in (response["results"] if isinstance(response, dict) else response.results):
+            self.write(segment)
+        self.flush()
+
+    def flush(self):
+        for out in self._files:
+            out.flush()
+
+    def close(self):
+        for out in self._files:
+            out.close()
+        self._files.clear()
+
+    def discard(self):
+        """Close and delete the output files."""
+        paths = [out.name for out in self._files]
+        self.close()
+        for path in paths:
+            os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.discard()
+        else:
+            self.close()
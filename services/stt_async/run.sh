@@ -29,6 +29,28 @@ python client_grpc.py \
     --save godfather_lasvegas.result \
     --oracle_speakers ${REPO_ROOT}/example_data/stt_async/en/godfather_lasvegas_oracle.json 
 
+## Batch gRPC client
+python batch_grpc.py \
+    --token ${X2AGI_API_KEY} \
+    --lang en \
+    --manifest ${REPO_ROOT}/example_data/stt_async/en/godfather_oracle \
+    --output_dir godfather_oracle.results \
+    --concurrency 8
+
+python batch_grpc.py \
+    --token ${X2AGI_API_KEY} \
+    --lang en \
+    --manifest ${REPO_ROOT}/example_data/stt_async/en/godfather_oracle \
+    --output_dir godfather_oracle.results \
+    --trace
+python -m x2agi_speechkit.trace merge godfather_oracle.trace.json "godfather_oracle.results/*.trace.json"
+
+## Language detection, recognition and post-processing
+python transcribe_grpc.py \
+    --token ${X2AGI_API_KEY} \
+    --manifest ${REPO_ROOT}/example_data/stt_async/en/godfather_oracle \
+    --output_dir godfather_oracle.transcripts
+
 ## REST client
 python client_rest.py \
     --token ${X2AGI_API_KEY} \
@@ -55,3 +77,13 @@ python client_rest.py \
     --path ${REPO_ROOT}/example_data/stt_async/en/godfather_lasvegas.wav \
     --save godfather_lasvegas.result \
     --oracle_speakers ${REPO_ROOT}/example_data/stt_async/en/godfather_lasvegas_oracle.json 
+
+## Local mock server (load testing without the service)
+python mock_server.py --grpc_port 50051 --http_port 8080 &
+python client_grpc.py \
+    --token test \
+    --lang en \
+    --path ${REPO_ROOT}/example_data/stt_async/en/godfather_lasvegas.wav \
+    --endpoint 127.0.0.1:50051 \
+    --insecure
+python benchmark_mock_server.py --jobs 100 --concurrency 16
@@ -0,0 +1,235 @@
+import argparse
+import array
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from result_sink import segment_fields
+
+MAGIC = b"X2AGISEG"
+VERSION = 1
+ALIGNMENT = 64  # section start alignment in the file, as in Arrow IPC buffers
+
+# Column name -> dtype of the fixed-width sections of the file
+COLUMNS = {
+    "start_ms": "<i8",
+    "end_ms": "<i8",
+    "label_ids": "<i4",
+    "transcript_offsets": "<i8",
+    "transcript_blob": "u1",
+}
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class SegmentStore:
+    """
+    Column-oriented store of diarization segments.
+
+    Instead of one DiarizationResult message or dict per segment, a store keeps:
+    `start_ms`/`end_ms` int64 arrays, `label_ids` int32 indices into the
+    `labels` dictionary, and the UTF-8 transcripts concatenated into
+    `transcript_blob`, where transcript i is bytes
+    transcript_offsets[i]:transcript_offsets[i + 1].
+
+    This is the memory layout of an Arrow table with int64, dictionary<int32, string>
+    and large_string columns, so `to_arrow()` wraps the arrays without copying.
+
+        store = SegmentStore.from_segments(get_recognition(stub, job))
+        store.save("call.segments")
+        store = SegmentStore.load("call.segments")  # memory-mapped, no parsing
+        store.to_time_label_files("call")           # .speakers / .text
+    """
+
+    def __init__(self, start_ms, end_ms, label_ids, labels, transcript_offsets, transcript_blob):
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.label_ids = label_ids
+        self.labels = list(labels)
+        self.transcript_offsets = transcript_offsets
+        self.transcript_blob = transcript_blob
+        self._mmap = None
+
+    @classmethod
+    def from_segments(cls, segments):
+        """Build a store from DiarizationResult messages or REST segment dicts."""
+        starts, ends, label_ids, offsets = array.array("q"), array.array("q"), array.array("i"), array.array("q", [0])
+        label_index = {}
+        blob = bytearray()
+        for segment in segments:
+            start_ms, end_ms, speaker_label, transcript = segment_fields(segment)
+            starts.append(start_ms)
+            ends.append(end_ms)
+            label_ids.append(label_index.setdefault(speaker_label, len(label_index)))
+            blob += transcript.encode("utf-8")
+            offsets.append(len(blob))
+        return cls(
+            np.frombuffer(starts, dtype="i8").astype("<i8", copy=False),
+            np.frombuffer(ends, dtype="i8").astype("<i8", copy=False),
+            np.frombuffer(label_ids, dtype="i4").astype("<i4", copy=False),
+            list(label_index),
+            np.frombuffer(offsets, dtype="i8").astype("<i8", copy=False),
+            np.frombuffer(blob, dtype="u1"),
+        )
+
+    @classmethod
+    def from_time_label_files(cls, output_name: str):
+        """Read the `<output_name>.speakers` / `.text` pair written by save_in_time_label_format."""
+        def segments():
+            with open(output_name + ".speakers", "r", encoding="utf-8") as speakers, \
+                    open(output_name + ".text", "r", encoding="utf-8") as text:
+                for line_num, (speaker_line, text_line) in enumerate(zip(speakers, text), 1):
+                    start_s, end_s, speaker_label = speaker_line.rstrip("\n").split("\t", 2)
+                    text_start_s, text_end_s, transcript = text_line.rstrip("\n").split("\t", 2)
+                    if (start_s, end_s) != (text_start_s, text_end_s):
+                        raise ValueError(f"{output_name}.speakers and .text disagree on line {line_num}")
+                    yield {
+                        "start_time_ms": round(float(start_s) * 1000),
+                        "end_time_ms": round(float(end_s) * 1000),
+                        "speaker_label": speaker_label,
+                        "transcript": transcript,
+                    }
+        return cls.from_segments(segments())
+
+    def __len__(self):
+        return len(self.start_ms)
+
+    def transcript(self, i: int) -> str:
+        return bytes(self.transcript_blob[self.transcript_offsets[i]:self.transcript_offsets[i + 1]]).decode("utf-8")
+
+    def speaker_label(self, i: int) -> str:
+        return self.labels[self.label_ids[i]]
+
+    def __getitem__(self, i: int):
+        """(start_ms, end_ms, speaker_label, transcript) of segment i."""
+        return int(self.start_ms[i]), int(self.end_ms[i]), self.speaker_label(i), self.transcript(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def segments_of(self, speaker_label: str):
+        """Indices of the segments of one speaker."""
+        if speaker_label not in self.labels:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(self.label_ids == self.labels.index(speaker_label))
+
+    def nbytes(self) -> int:
+        """Size of the column data."""
+        return sum(getattr(self, name).nbytes for name in COLUMNS) + sum(len(label.encode("utf-8")) for label in self.labels)
+
+    def to_time_label_files(self, output_name: str):
+        """Write `<output_name>.speakers` / `.text` exactly as save_in_time_label_format does."""
+        with open(output_name + ".speakers", "w", encoding="utf-8") as speakers, \
+                open(output_name + ".text", "w", encoding="utf-8") as text:
+            for start_ms, end_ms, speaker_label, transcript in self:
+                speakers.write(f"{start_ms / 1000}\t{end_ms / 1000}\t{speaker_label}\n")
+                text.write(f"{start_ms / 1000}\t{end_ms / 1000}\t{transcript.strip()}\n")
+
+    def save(self, path: str):
+        """
+        Write the store as: MAGIC, uint32 header length, JSON header (version,
+        count, labels, section offsets), then every column as a raw little-endian
+        array starting on an ALIGNMENT boundary.
+        """
+        sections = {}
+        offset = 0
+        for name in COLUMNS:
+            sections[name] = [offset, getattr(self, name).nbytes]
+            offset += _align(getattr(self, name).nbytes)
+        header = json.dumps({"version": VERSION, "count": len(self), "labels": self.labels,
+                             "sections": sections}).encode("utf-8")
+        data_start = _align(len(MAGIC) + 4 + len(header))
+
+        with open(path, "wb") as out:
+            out.write(MAGIC + struct.pack("<I", len(header)) + header)
+            for name in COLUMNS:
+                out.seek(data_start + sections[name][0])
+                out.write(np.ascontiguousarray(getattr(self, name), dtype=COLUMNS[name]).data)
+            out.truncate(data_start + offset)
+
+    @classmethod
+    def load(cls, path: str):
+        """Open a file written by save(); the columns are read-only views of a memory map."""
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError(f"{path} is empty")
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:len(MAGIC)] != MAGIC:
+            data.close()
+            raise ValueError(f"{path} is not a segment store file")
+        header_len, = struct.unpack_from("<I", data, len(MAGIC))
+        header = json.loads(data[len(MAGIC) + 4:len(MAGIC) + 4 + header_len])
+        if header["version"] != VERSION:
+            data.close()
+            raise ValueError(f"{path}: unsupported segment store version {header['version']}")
+        data_start = _align(len(MAGIC) + 4 + header_len)
+
+        columns = {}
+        for name, dtype in COLUMNS.items():
+            offset, nbytes = header["sections"][name]
+            columns[name] = np.frombuffer(data, dtype=dtype, count=nbytes // np.dtype(dtype).itemsize,
+                                          offset=data_start + offset)
+        store = cls(labels=header["labels"], **columns)
+        store._mmap = data
+        return store
+
+    def to_arrow(self):
+        """
+        pyarrow.Table with start_time_ms, end_time_ms, speaker_label and transcript
+        columns sharing this store's buffers (requires `pip install pyarrow`).
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("SegmentStore.to_arrow() requires pyarrow: pip install pyarrow")
+        n = len(self)
+        transcript = pa.LargeStringArray.from_buffers(
+            n, pa.py_buffer(self.transcript_offsets), pa.py_buffer(self.transcript_blob))
+        speaker_label = pa.DictionaryArray.from_arrays(
+            pa.Array.from_buffers(pa.int32(), n, [None, pa.py_buffer(self.label_ids)]), pa.array(self.labels, pa.string()))
+        return pa.table({
+            "start_time_ms": pa.Array.from_buffers(pa.int64(), n, [None, pa.py_buffer(self.start_ms)]),
+            "end_time_ms": pa.Array.from_buffers(pa.int64(), n, [None, pa.py_buffer(self.end_ms)]),
+            "speaker_label": speaker_label,
+            "transcript": transcript,
+        })
+
+    def close(self):
+        """Release the memory map of a loaded store; its arrays must not be used afterwards."""
+        if self._mmap is not None:
+            self.start_ms = self.end_ms = self.label_ids = self.transcript_offsets = self.transcript_blob = None
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert between .speakers/.text results and segment store files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    pack = subparsers.add_parser("pack", help="<name>.speakers + <name>.text -> store file")
+    pack.add_argument("name", help="base name of the .speakers/.text pair")
+    pack.add_argument("store", help="output store file")
+    unpack = subparsers.add_parser("unpack", help="store file -> <name>.speakers + <name>.text")
+    unpack.add_argument("store", help="input store file")
+    unpack.add_argument("name", help="base name of the output .speakers/.text pair")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        store = SegmentStore.from_time_label_files(args.name)
+        store.save(args.store)
+        print(f"{len(store)} segments, {len(store.labels)} speakers -> {args.store}")
+    else:
+        with SegmentStore.load(args.store) as store:
+            store.to_time_label_files(args.name)
+            print(f"{len(store)} segments -> {args.name}.speakers, {args.name}.text")
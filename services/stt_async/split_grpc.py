@@ -0,0 +1,171 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from x2agi_speechkit import stubs
+
+from audio_converter import convert_audio
+from client_grpc import CHUNK_SIZE, ENDPOINT, create_channel, load_oracle_speaker_labels, recognize
+from pcm import SAMPLE_RATE, SAMPLE_WIDTH, open_pcm, quietest_point, wav_header
+from result_sink import ResultSink
+
+ANCHOR_LABEL_PREFIX = "anchor:"  # oracle labels cut from the anchor part, mapped back when stitching
+
+
+def plan_parts(samples, anchor_s: float, part_s: float, search_s: float):
+    """
+    (start, end) sample ranges covering the whole recording: a first "anchor" part
+    of about `anchor_s`, then parts of about `part_s`. Every cut is moved to the
+    quietest point within `search_s` of its target, so no word is split.
+    """
+    num_samples = len(samples)
+    if num_samples <= (anchor_s + part_s / 2) * SAMPLE_RATE:
+        return [(0, num_samples)]
+    search = int(search_s * SAMPLE_RATE)
+    anchor = int(anchor_s * SAMPLE_RATE)
+    bounds = [0, quietest_point(samples, anchor - search, anchor + search)]
+    rest = num_samples - bounds[1]
+    num_rest = max(1, int(round(rest / (part_s * SAMPLE_RATE))))
+    for i in range(1, num_rest):
+        target = bounds[1] + rest * i // num_rest
+        bounds.append(quietest_point(samples, target - search, target + search))
+    bounds.append(num_samples)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def iter_part_chunks(data, offset: int, start: int, end: int, chunk_size: int = CHUNK_SIZE):
+    """WAV header + PCM samples [start, end) of the mapped recording, in upload chunks."""
+    yield wav_header((end - start) * SAMPLE_WIDTH)
+    for position in range(offset + start * SAMPLE_WIDTH, offset + end * SAMPLE_WIDTH, chunk_size):
+        yield data[position:min(position + chunk_size, offset + end * SAMPLE_WIDTH)]
+
+
+def cut_oracle_clips(data, offset: int, segments, clips_per_speaker: int = 3,
+                     min_clip_s: float = 2.0, max_clip_s: float = 15.0):
+    """
+    OracleSpeakerLabel clips cut from the longest segments of every speaker
+    found in the anchor part, labelled ANCHOR_LABEL_PREFIX + its label.
+    """
+    by_speaker = {}
+    for segment in segments:
+        if segment.speaker_label.startswith("["):  # [unidentifiable]
+            continue
+        by_speaker.setdefault(segment.speaker_label, []).append(segment)
+
+    clips = []
+    for speaker_label, speaker_segments in by_speaker.items():
+        speaker_segments.sort(key=lambda segment: segment.end_time_ms - segment.start_time_ms, reverse=True)
+        for segment in speaker_segments[:clips_per_speaker]:
+            duration_s = (segment.end_time_ms - segment.start_time_ms) / 1000
+            if duration_s < min_clip_s:
+                break
+            start = segment.start_time_ms * SAMPLE_RATE // 1000
+            end = start + int(min(duration_s, max_clip_s) * SAMPLE_RATE)
+            pcm = data[offset + start * SAMPLE_WIDTH:offset + end * SAMPLE_WIDTH]
+            clips.append(stubs.stt_async_pb2.OracleSpeakerLabel(
+                audio_data=wav_header(len(pcm)) + pcm,
+                speaker_label=ANCHOR_LABEL_PREFIX + speaker_label,
+            ))
+    return clips
+
+
+def stitch(part_results, parts, oracle_labels):
+    """
+    Shift every part's segments onto the global timeline and reconcile labels:
+    anchor clip labels map back to the anchor's speaker, labels of speakers new in
+    a later part get a "(part N)" suffix so they cannot collide across parts.
+    """
+    for i, (segments, (start, _)) in enumerate(zip(part_results, parts)):
+        offset_ms = start * 1000 // SAMPLE_RATE
+        for segment in segments:
+            speaker_label = segment.speaker_label
+            if speaker_label.startswith(ANCHOR_LABEL_PREFIX):
+                speaker_label = speaker_label[len(ANCHOR_LABEL_PREFIX):]
+            elif i > 0 and speaker_label not in oracle_labels and not speaker_label.startswith("["):
+                speaker_label = f"{speaker_label} (part {i + 1})"
+            yield stubs.stt_async_pb2.DiarizationResult(
+                start_time_ms=segment.start_time_ms + offset_ms,
+                end_time_ms=segment.end_time_ms + offset_ms,
+                speaker_label=speaker_label,
+                transcript=segment.transcript,
+            )
+
+
+def run(args):
+    if args.lang not in ["en", "ru"]:
+        raise ValueError(f"expected --lang: 'en' or 'ru', got '{args.lang}'")
+    if args.ndjson and not args.save:
+        raise ValueError("--ndjson needs --save")
+
+    start_time = time.time()
+    converted_path = None
+    if not args.no_convert:
+        print("Converting main audio to 16kHz mono WAV...")
+        converted_path = convert_audio(args.path)
+    data, offset, length = open_pcm(converted_path or args.path)
+    try:
+        samples = np.frombuffer(data, dtype="<i2", count=length // SAMPLE_WIDTH, offset=offset)
+        parts = plan_parts(samples, args.anchor_s, args.part_s, args.search_s)
+        del samples  # the map is closed at the end, no view may outlive it
+        print(f"{length / SAMPLE_WIDTH / SAMPLE_RATE:.1f}s of audio in {len(parts)} parts: " + ", ".join(
+            f"{start / SAMPLE_RATE:.1f}-{end / SAMPLE_RATE:.1f}s" for start, end in parts))
+
+        oracle_speaker_labels = load_oracle_speaker_labels(args.oracle_speakers, args.no_convert)
+        oracle_labels = {label.speaker_label for label in oracle_speaker_labels}
+
+        with create_channel(args.endpoint, args.insecure) as channel:
+            stub = stubs.stt_async_pb2_grpc.AsyncRecognizerStub(channel)
+
+            def recognize_part(i, part_oracle_speaker_labels):
+                part_start = time.time()
+                segments = recognize(
+                    stub, args.token, args.lang, iter_part_chunks(data, offset, *parts[i]),
+                    part_oracle_speaker_labels, args.restrict_to_oracle_speaker_labels,
+                    log=lambda message: print(f"[part {i + 1}/{len(parts)}] {message}") if args.verbose else None,
+                )
+                print(f"[part {i + 1}/{len(parts)}] {len(segments)} segments in {time.time() - part_start:.1f}s")
+                return segments
+
+            # The anchor part goes first: clips of its speakers become oracle
+            # labels of all the other parts, which then run concurrently
+            part_results = [recognize_part(0, oracle_speaker_labels)]
+            if len(parts) > 1:
+                anchor_clips = cut_oracle_clips(data, offset, part_results[0])
+                print(f"{len(anchor_clips)} oracle clips cut from the anchor part")
+                with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                    futures = [pool.submit(recognize_part, i, oracle_speaker_labels + anchor_clips)
+                               for i in range(1, len(parts))]
+                    part_results += [future.result() for future in futures]
+
+        with ResultSink(args.save, args.ndjson, echo=print) as sink:
+            for segment in stitch(part_results, parts, oracle_labels):
+                sink.write(segment)
+        print("----")
+        print(f"{len(parts)} parts, {sink.segments} segments, {time.time() - start_time:.1f}s wall clock")
+    finally:
+        data.close()
+        if converted_path and os.path.exists(converted_path):
+            os.remove(converted_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recognize a long recording as concurrent sub-jobs cut at silences")
+    parser.add_argument("--token", type=str, required=True, help="IAM token or API key")
+    parser.add_argument("--lang", type=str, required=True, help="Language of input audio: ['ru', 'en']")
+    parser.add_argument("--path", type=str, required=True, help="audio file path")
+    parser.add_argument("--save", type=str, default=None, help="base name of the stitched .speakers and .text outputs")
+    parser.add_argument("--ndjson", action="store_true", help="also write <save>.ndjson with one JSON segment per line")
+    parser.add_argument("--anchor_s", type=float, default=300.0, help="length of the first part, whose speakers are passed as oracle clips to the others")
+    parser.add_argument("--part_s", type=float, default=900.0, help="target length of the other parts")
+    parser.add_argument("--search_s", type=float, default=30.0, help="how far a cut may move to reach silence")
+    parser.add_argument("--concurrency", type=int, default=8, help="maximum number of parts processed at once")
+    parser.add_argument("--restrict_to_oracle_speaker_labels", action="store_true", help="restrict speakers to oracle")
+    parser.add_argument("--oracle_speakers", type=str, default=None, help="jsonl file with audio_filepath and speaker_label, sent with every part")
+    parser.add_argument("--no_convert", action="store_true", help="Skip audio conversion (use if file is already 16kHz mono WAV)")
+    parser.add_argument("--endpoint", type=str, default=ENDPOINT, help="gRPC endpoint host:port")
+    parser.add_argument("--insecure", action="store_true", help="plaintext channel, e.g. to a local mock_server.py")
+    parser.add_argument("--verbose", action="store_true", help="print per-part progress")
+    args = parser.parse_args()
+    run(args)
@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from x2agi_speechkit import AsrPostprocessorClient, AsyncRecognizerClient, LangDetectorClient
+from x2agi_speechkit.aio import LANG_DETECT_TARGET, POSTPROCESS_ASR_TARGET, STT_ASYNC_TARGET
+from x2agi_speechkit.orchestrator import Orchestrator
+
+from audio_converter import convert_audio_to_buffer
+from batch_grpc import read_manifest
+
+
+def load_audio(args, path: str) -> bytes:
+    if args.no_convert:
+        with open(path, "rb") as f:
+            return f.read()
+    return convert_audio_to_buffer(path)
+
+
+def save_result(result, save: str):
+    os.makedirs(os.path.dirname(save) or ".", exist_ok=True)
+    with open(save + ".speakers", "w", encoding="utf-8") as f:
+        f.write(result.speakers + "\n")
+    with open(save + ".text", "w", encoding="utf-8") as f:
+        f.write(result.utterances + "\n")
+
+
+async def run(args):
+    jobs = read_manifest(args.manifest, args.output_dir, args.lang)
+    print(f"{len(jobs)} files to process, max_files={args.max_files}")
+    if not jobs:
+        return 0
+    saves = {job["path"]: job["save"] for job in jobs}
+    secure = not args.insecure
+    batch_start = time.time()
+    failed = 0
+    async with LangDetectorClient(args.token, args.endpoint or LANG_DETECT_TARGET, secure=secure) as lang_detect, \
+            AsyncRecognizerClient(args.token, args.endpoint or STT_ASYNC_TARGET, secure=secure) as stt, \
+            AsrPostprocessorClient(args.token, args.endpoint or POSTPROCESS_ASR_TARGET, secure=secure) as postprocessor:
+        orchestrator = Orchestrator(
+            lang_detect, stt, postprocessor, allowed_languages=["en", "ru"], detect_windows=args.windows,
+            window_s=args.window_s, window_concurrency=args.window_concurrency, min_windows=args.min_windows,
+            confidence_threshold=args.confidence_threshold, max_files=args.max_files, max_loads=args.convert_workers,
+            max_uploads=args.upload_workers, poll_interval=args.poll_interval,
+            postprocess_poll_interval=args.postprocess_poll_interval,
+            min_pause_to_separate=args.min_pause_to_separate, as_monologue=args.as_monologue,
+        )
+        items = [(job["path"], job["lang"]) for job in jobs]
+        done = 0
+        async for result in orchestrator.run(items, lambda path: load_audio(args, path)):
+            done += 1
+            timings = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in result.timings.items())
+            if result.ok:
+                save_result(result, saves[result.path])
+                detected = f" (detected, {result.lang_confidence:.2f})" if result.lang_confidence is not None else ""
+                print(f"[{done}/{len(jobs)}] ok {result.path} -> {saves[result.path]}: {result.lang}{detected}, "
+                      f"{len(result.segments)} segments ({timings})")
+            else:
+                failed += 1
+                print(f"[{done}/{len(jobs)}] FAILED {result.path} at {result.failed_stage}: {result.error}")
+
+    print("----")
+    print(orchestrator.summary())
+    print(f"processed {len(jobs)} files in {time.time() - batch_start:.1f}s, failed: {failed}")
+    return failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Detect the language, recognize and post-process every file of a manifest")
+    parser.add_argument("--token", type=str, required=True, help="IAM token or API key")
+    parser.add_argument("--manifest", type=str, required=True, help="directory, glob pattern (quote it) or JSONL file with one {\"path\": ...} per line")
+    parser.add_argument("--output_dir", type=str, required=True, help="directory for the post-processed <name>.speakers and <name>.text outputs")
+    parser.add_argument("--lang", type=str, default=None, help="language of files without one in the manifest: ['ru', 'en'] (default: detect it)")
+    parser.add_argument("--max_files", type=int, default=8, help="files in progress at once; their converted audio is held in memory until uploaded")
+    parser.add_argument("--convert_workers", type=int, default=2, help="files converted at once")
+    parser.add_argument("--upload_workers", type=int, default=4, help="files uploaded at once")
+    parser.add_argument("--windows", type=int, default=3, help="windows sampled across each file for language detection")
+    parser.add_argument("--window_s", type=float, default=20.0, help="length of each language detection window in seconds")
+    parser.add_argument("--window_concurrency", type=int, default=2, help="windows of a file detected at the same time")
+    parser.add_argument("--min_windows", type=int, default=2, help="windows needed before an early exit")
+    parser.add_argument("--confidence_threshold", type=float, default=0.9, help="combined confidence at which the remaining windows are skipped")
+    parser.add_argument("--poll_interval", type=float, default=5.0, help="seconds between GetProgress calls of a recognition")
+    parser.add_argument("--postprocess_poll_interval", type=float, default=2.0, help="seconds between GetProgress calls of a post-processing")
+    parser.add_argument("--min_pause_to_separate", type=float, default=5.0, help="pause in seconds that starts a new utterance in post-processing")
+    parser.add_argument("--as_monologue", action="store_true", help="post-process the transcript as a monologue")
+    parser.add_argument("--endpoint", type=str, default=None, help="host:port serving all three services, e.g. a local FakeServer (default: the public endpoints)")
+    parser.add_argument("--insecure", action="store_true", help="plaintext channels, e.g. to a local fake server")
+    parser.add_argument("--no_convert", action="store_true", help="Skip audio conversion (use if files are already 16kHz mono WAV)")
+    args = parser.parse_args()
+    sys.exit(1 if asyncio.run(run(args)) else 0)
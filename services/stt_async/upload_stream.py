@@ -0,0 +1,133 @@
+import queue
+import threading
+import time
+
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 2 * 1024 * 1024  # well below the 4 MB default message limit of gRPC servers
+INITIAL_CHUNK_SIZE = 1024 * 1024
+
+_END = object()
+
+
+class UploadStream:
+    """
+    Read-ahead, adaptively chunked audio stream for RecognizeFileStreaming.
+
+    A background thread pulls the source chunks (file reads or the converter)
+    into a bounded queue of `depth` buffers, so reading and converting the next
+    chunks overlaps with sending the current one instead of alternating with it.
+
+    The consumer side cuts the buffered bytes into upload messages whose size
+    follows the measured send throughput. gRPC asks for the next message once the
+    previous one has been handed to the transport, so the time from yielding a
+    message to the next pull is its send time. The next message is sized to take about
+    `target_send_s` at the measured rate, within [min_chunk_size, max_chunk_size].
+    A pull that takes longer than `stall_s` means HTTP/2 flow control held the
+    stream back, and the size is halved.
+
+        stream = UploadStream(iter_converted_audio(path))
+        stub.RecognizeFileStreaming(generate_requests(labels, False, stream), metadata=...)
+        print(stream.summary())
+    """
+
+    def __init__(self, audio_chunks, depth: int = 4, initial_chunk_size: int = INITIAL_CHUNK_SIZE,
+                 min_chunk_size: int = MIN_CHUNK_SIZE, max_chunk_size: int = MAX_CHUNK_SIZE,
+                 target_send_s: float = 0.25, stall_s: float = 1.0):
+        self.chunk_size = initial_chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.target_send_s = target_send_s
+        self.stall_s = stall_s
+        self.bytes_sent = 0
+        self.messages = 0
+        self.stalls = 0
+        self.source_wait_s = 0.0  # time the sender waited for the reader: the source was the bottleneck
+        self._queue = queue.Queue(maxsize=max(1, depth))
+        self._stop = threading.Event()
+        self._start = self._end = None
+        self._reader = threading.Thread(target=self._read, args=(audio_chunks,), daemon=True)
+        self._reader.start()
+
+    def _read(self, audio_chunks):
+        try:
+            for chunk in audio_chunks:
+                if not self._put(chunk):
+                    break
+            else:
+                self._put(_END)
+        except BaseException as e:
+            self._put(e)
+        finally:
+            close = getattr(audio_chunks, "close", None)
+            if close is not None:
+                close()  # runs the source's cleanup (temp files, SoX) on the thread that iterated it
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self):
+        wait_start = time.monotonic()
+        item = self._queue.get()
+        self.source_wait_s += time.monotonic() - wait_start
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def _adapt(self, sent: int, elapsed_s: float):
+        if elapsed_s > self.stall_s:
+            self.stalls += 1
+            size = self.chunk_size // 2
+        elif elapsed_s > 0:
+            size = int(sent / elapsed_s * self.target_send_s)
+        else:
+            size = self.chunk_size * 2
+        self.chunk_size = max(self.min_chunk_size, min(self.max_chunk_size, size))
+
+    def __iter__(self):
+        buffer = bytearray()
+        done = False
+        try:
+            while True:
+                while not done and len(buffer) < self.chunk_size:
+                    item = self._get()
+                    if item is _END:
+                        done = True
+                    else:
+                        buffer += item
+                if not buffer:
+                    self._end = time.monotonic()
+                    return
+                message = bytes(buffer[:self.chunk_size])
+                del buffer[:len(message)]
+                sent_at = time.monotonic()
+                if self._start is None:
+                    self._start = sent_at
+                yield message
+                # Control is back once gRPC has handed the message to the transport and wants the next one
+                self._adapt(len(message), time.monotonic() - sent_at)
+                self.bytes_sent += len(message)
+                self.messages += 1
+        finally:
+            self.close()
+
+    def close(self):
+        self._stop.set()
+        # Unblock a reader waiting on a full queue
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def summary(self) -> str:
+        elapsed = (self._end or time.monotonic()) - self._start if self._start is not None else 0.0
+        rate = self.bytes_sent / elapsed / 1024 / 1024 if elapsed > 0 else 0.0
+        return (f"upload: {self.bytes_sent / 1024 / 1024:.1f} MB in {self.messages} messages, {elapsed:.2f}s "
+                f"({rate:.1f} MB/s), last chunk {self.chunk_size // 1024} KB, {self.stalls} flow-control stalls, "
+                f"{self.source_wait_s:.2f}s waiting for audio")
@@ -0,0 +1,155 @@
+import bisect
+import os
+import tempfile
+
+import numpy as np
+
+from audio_converter import convert_audio
+from pcm import SAMPLE_RATE, SAMPLE_WIDTH, frame_energy_db, open_pcm, wav_header
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def detect_speech(samples, threshold_db: float = None, min_silence_s: float = 1.0, pad_s: float = 0.3,
+                  frame_ms: int = 20, margin_db: float = 12.0):
+    """
+    Sample ranges [(start, end), ...] to keep: everything except non-speech
+    stretches longer than `min_silence_s`.
+
+    A frame is speech when its level is above `threshold_db` (dBFS). By default
+    the threshold adapts to the recording: `margin_db` above its noise floor
+    (10th percentile of frame levels), clamped to [-60, -35] dBFS so a file that
+    is all speech or all hiss is not misjudged. Speech is padded by `pad_s` on
+    both sides so word onsets and tails survive. Returns [] for a silent file.
+    """
+    energy = frame_energy_db(samples, frame_ms)
+    if len(energy) == 0:
+        return []
+    if threshold_db is None:
+        threshold_db = float(np.clip(np.percentile(energy, 10) + margin_db, -60.0, -35.0))
+    speech = energy > threshold_db
+    if not speech.any():
+        return []
+
+    # Pad speech, then keep short pauses: they carry turn-taking and punctuation cues
+    pad = int(round(pad_s * 1000 / frame_ms))
+    if pad:
+        speech = np.convolve(speech, np.ones(2 * pad + 1), mode="same") > 0
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.astype(np.int8), [0]))))
+    runs = edges.reshape(-1, 2)  # [start frame, end frame) of every speech run
+    min_gap = min_silence_s * 1000 / frame_ms
+    ranges = [[int(runs[0][0]), int(runs[0][1])]]
+    for start, end in runs[1:]:
+        if start - ranges[-1][1] < min_gap:
+            ranges[-1][1] = int(end)
+        else:
+            ranges.append([int(start), int(end)])
+
+    frame = SAMPLE_RATE * frame_ms // 1000
+    return [(start * frame, min(len(samples), end * frame)) for start, end in ranges]
+
+
+class TimeMap:
+    """
+    Maps times in the filtered audio (what the service saw) back onto the
+    original recording, from the kept sample ranges.
+    """
+
+    def __init__(self, ranges):
+        self.ranges = [(int(start), int(end)) for start, end in ranges]
+        self.original_starts = [start for start, _ in ranges]
+        self.filtered_starts = []
+        position = 0
+        for start, end in ranges:
+            self.filtered_starts.append(position)
+            position += end - start
+        self.filtered_samples = position
+
+    def to_original_ms(self, ms: int, is_end: bool = False) -> int:
+        """Original time of filtered time `ms`; segment ends at a cut stay in the range before it."""
+        sample = ms * SAMPLE_RATE // 1000
+        search = bisect.bisect_left if is_end else bisect.bisect_right
+        i = max(0, search(self.filtered_starts, sample) - 1)
+        return (self.original_starts[i] + sample - self.filtered_starts[i]) * 1000 // SAMPLE_RATE
+
+    def remap(self, segment):
+        """Move a DiarizationResult (in place) or a REST segment dict (copied) onto the original timeline."""
+        if isinstance(segment, dict):
+            return {
+                **segment,
+                "start_time_ms": self.to_original_ms(int(segment["start_time_ms"])),
+                "end_time_ms": self.to_original_ms(int(segment["end_time_ms"]), is_end=True),
+            }
+        segment.start_time_ms, segment.end_time_ms = (
+            self.to_original_ms(segment.start_time_ms), self.to_original_ms(segment.end_time_ms, is_end=True))
+        return segment
+
+
+def iter_filtered_wav(data, offset: int, ranges, chunk_size: int = CHUNK_SIZE):
+    """WAV header + the kept sample ranges of the mapped PCM, in upload chunks."""
+    yield wav_header(sum(end - start for start, end in ranges) * SAMPLE_WIDTH)
+    for start, end in ranges:
+        for position in range(offset + start * SAMPLE_WIDTH, offset + end * SAMPLE_WIDTH, chunk_size):
+            yield data[position:min(position + chunk_size, offset + end * SAMPLE_WIDTH)]
+
+
+def open_vad_audio(path: str, no_convert: bool, min_silence_s: float = 1.0, threshold_db: float = None, log=print):
+    """
+    Convert `path`, find its speech and return (audio_chunks, time_map): the WAV
+    without long silences as an iterator of upload chunks, and the TimeMap of
+    the returned timestamps. Returns (None, None) when the file has no speech.
+    Temporary files are removed once the chunks have been consumed.
+    """
+    converted_path = None if no_convert else convert_audio(path)
+    data, offset, length = open_pcm(converted_path or path)
+
+    def cleanup():
+        data.close()
+        if converted_path and os.path.exists(converted_path):
+            os.remove(converted_path)
+
+    try:
+        samples = np.frombuffer(data, dtype="<i2", count=length // SAMPLE_WIDTH, offset=offset)
+        ranges = detect_speech(samples, threshold_db, min_silence_s)
+        del samples  # no view may outlive the map
+    except BaseException:
+        cleanup()
+        raise
+
+    total_s = length / SAMPLE_WIDTH / SAMPLE_RATE
+    if not ranges:
+        log(f"VAD: no speech in {total_s:.1f}s of audio")
+        cleanup()
+        return None, None
+    time_map = TimeMap(ranges)
+    kept_s = time_map.filtered_samples / SAMPLE_RATE
+    log(f"VAD: keeping {kept_s:.1f}s of {total_s:.1f}s ({100 * (1 - kept_s / max(total_s, 1e-9)):.0f}% silence removed, "
+        f"{len(ranges)} speech regions)")
+
+    def audio_chunks():
+        try:
+            yield from iter_filtered_wav(data, offset, ranges)
+        finally:
+            cleanup()
+
+    return audio_chunks(), time_map
+
+
+def write_vad_audio(path: str, no_convert: bool, min_silence_s: float = 1.0, threshold_db: float = None, log=print):
+    """
+    open_vad_audio() for path-based uploads: returns (temp_wav_path, time_map),
+    or (None, None) when the file has no speech. The caller removes the file.
+    """
+    audio_chunks, time_map = open_vad_audio(path, no_convert, min_silence_s, threshold_db, log)
+    if audio_chunks is None:
+        return None, None
+    fd, output_path = tempfile.mkstemp(suffix=".wav")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in audio_chunks:
+                out.write(chunk)
+    except BaseException:
+        audio_chunks.close()
+        os.remove(output_path)
+        raise
+    return output_path, time_map
@@ -1,63 +0,0 @@
-# -*- coding: utf-8 -*-
-# Generated by the protocol buffer compiler.  DO NOT EDIT!
-# source: yandex/cloud/validation.proto
-"""Generated protocol buffer code."""
-from google.protobuf import descriptor as _descriptor
-from google.protobuf import descriptor_pool as _descriptor_pool
-from google.protobuf import message as _message
-from google.protobuf import reflection as _reflection
-from google.protobuf import symbol_database as _symbol_database
-# @@protoc_insertion_point(imports)
-
-_sym_db = _symbol_database.Default()
-
-
-from google.protobuf import descriptor_pb2 as google_dot_protobuf_dot_descriptor__pb2
-
-
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1dyandex/cloud/validation.proto\x12\x0cyandex.cloud\x1a google/protobuf/descriptor.proto\"<\n\nMapKeySpec\x12\r\n\x05value\x18\x01 \x01(\t\x12\x0f\n\x07pattern\x18\x02 \x01(\t\x12\x0e\n\x06length\x18\x03 \x01(\t:4\n\x0b\x65xactly_one\x12\x1d.google.protobuf.OneofOptions\x18\x98\x98\x06 \x01(\x08:1\n\x08required\x12\x1d.google.protobuf.FieldOptions\x18\xfd\x98\x06 \x01(\x08:0\n\x07pattern\x12\x1d.google.protobuf.FieldOptions\x18\xfe\x98\x06 \x01(\t:.\n\x05value\x12\x1d.google.protobuf.FieldOptions\x18\xff\x98\x06 \x01(\t:-\n\x04size\x12\x1d.google.protobuf.FieldOptions\x18\x80\x99\x06 \x01(\t:/\n\x06length\x12\x1d.google.protobuf.FieldOptions\x18\x81\x99\x06 \x01(\t:/\n\x06unique\x12\x1d.google.protobuf.FieldOptions\x18\x82\x99\x06 \x01(\x08:J\n\x07map_key\x12\x1d.google.protobuf.FieldOptions\x18\x86\x99\x06 \x01(\x0b\x32\x18.yandex.cloud.MapKeySpec:.\n\x05\x62ytes\x12\x1d.google.protobuf.FieldOptions\x18\x87\x99\x06 \x01(\tBJ\n\x10yandex.cloud.apiZ6github.com/yandex-cloud/go-genproto/yandex/cloud;cloudb\x06proto3')
-
-
-EXACTLY_ONE_FIELD_NUMBER = 101400
-exactly_one = DESCRIPTOR.extensions_by_name['exactly_one']
-REQUIRED_FIELD_NUMBER = 101501
-required = DESCRIPTOR.extensions_by_name['required']
-PATTERN_FIELD_NUMBER = 101502
-pattern = DESCRIPTOR.extensions_by_name['pattern']
-VALUE_FIELD_NUMBER = 101503
-value = DESCRIPTOR.extensions_by_name['value']
-SIZE_FIELD_NUMBER = 101504
-size = DESCRIPTOR.extensions_by_name['size']
-LENGTH_FIELD_NUMBER = 101505
-length = DESCRIPTOR.extensions_by_name['length']
-UNIQUE_FIELD_NUMBER = 101506
-unique = DESCRIPTOR.extensions_by_name['unique']
-MAP_KEY_FIELD_NUMBER = 101510
-map_key = DESCRIPTOR.extensions_by_name['map_key']
-BYTES_FIELD_NUMBER = 101511
-bytes = DESCRIPTOR.extensions_by_name['bytes']
-
-_MAPKEYSPEC = DESCRIPTOR.message_types_by_name['MapKeySpec']
-MapKeySpec = _reflection.GeneratedProtocolMessageType('MapKeySpec', (_message.Message,), {
-  'DESCRIPTOR' : _MAPKEYSPEC,
-  '__module__' : 'yandex.cloud.validation_pb2'
-  # @@protoc_insertion_point(class_scope:yandex.cloud.MapKeySpec)
-  })
-_sym_db.RegisterMessage(MapKeySpec)
-
-if _descriptor._USE_C_DESCRIPTORS == False:
-  google_dot_protobuf_dot_descriptor__pb2.OneofOptions.RegisterExtension(exactly_one)
-  google_dot_protobuf_dot_descriptor__pb2.FieldOptions.RegisterExtension(required)
-  google_dot_protobuf_dot_descriptor__pb2.FieldOptions.RegisterExtension(pattern)
-  google_dot_protobuf_dot_descriptor__pb2.FieldOptions.RegisterExtension(value)
-  google_dot_protobuf_dot_descriptor__pb2.FieldOptions.RegisterExtension(size)
-  google_dot_protobuf_dot_descriptor__pb2.FieldOptions.RegisterExtension(length)
-  google_dot_protobuf_dot_descriptor__pb2.FieldOptions.RegisterExtension(unique)
-  google_dot_protobuf_dot_descriptor__pb2.FieldOptions.RegisterExtension(map_key)
-  google_dot_protobuf_dot_descriptor__pb2.FieldOptions.RegisterExtension(bytes)
-
-  DESCRIPTOR._options = None
-  DESCRIPTOR._serialized_options = b'\n\020yandex.cloud.apiZ6github.com/yandex-cloud/go-genproto/yandex/cloud;cloud'
-  _MAPKEYSPEC._serialized_start=81
-  _MAPKEYSPEC._serialized_end=141
-# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,22 @@
+"""
+Python client library for the x2agi speech services
+(lang_detect, stt_async and postprocess_asr).
+
+The clients are imported on first use, so `from x2agi_speechkit import stubs`
+does not load grpc.aio.
+"""
+import importlib
+
+__all__ = [
+    "AsrPostprocessorClient",
+    "AsyncRecognizerClient",
+    "Job",
+    "LangDetectorClient",
+    "create_channel",
+]
+
+
+def __getattr__(name):
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(".aio", __name__), name)
@@ -0,0 +1,232 @@
+"""
+asyncio clients for the x2agi speech services, built on grpc.aio.
+
+One event loop can keep hundreds of operations in flight over a single channel:
+
+    async with AsyncRecognizerClient(token) as client:
+        job = await client.submit(open("call.wav", "rb").read(), lang="en")
+        await client.wait(job)
+        segments = await client.get_result(job)
+"""
+import asyncio
+import uuid
+
+import grpc
+
+from . import stubs
+
+STT_ASYNC_TARGET = "stt-async.x2agi.com:8443"
+LANG_DETECT_TARGET = "lang-detect.x2agi.com:8443"
+POSTPROCESS_ASR_TARGET = "postprocess-asr.x2agi.ru:8443"
+
+CHANNEL_OPTIONS = [
+    # Recommended optimizations:
+    ("grpc.keepalive_time_ms", 10000),
+    ("grpc.max_receive_message_length", 50 * 1024 * 1024),
+]
+
+
+def create_channel(target: str, secure: bool = True) -> grpc.aio.Channel:
+    """Open a grpc.aio channel with the options the client scripts use."""
+    if not secure:
+        return grpc.aio.insecure_channel(target, options=CHANNEL_OPTIONS)
+    host = target.rsplit(":", 1)[0]
+    return grpc.aio.secure_channel(
+        target,
+        grpc.ssl_channel_credentials(),
+        options=[
+            ("grpc.ssl_target_name_override", host),  # Force SNI
+            ("grpc.default_authority", host),
+        ] + CHANNEL_OPTIONS,
+    )
+
+
+class Job:
+    """
+    Handle of a submitted asynchronous operation.
+    `job_id` is sent as x-job-id with every call, which pins routing to the
+    backend that owns the operation.
+    """
+
+    def __init__(self, operation_id: str, job_id: str, metadata):
+        self.operation_id = operation_id
+        self.job_id = job_id
+        self.metadata = metadata
+
+    def __repr__(self):
+        return f"Job(operation_id={self.operation_id!r}, job_id={self.job_id!r})"
+
+
+class _Client:
+    def __init__(self, token: str, target: str, channel=None, secure: bool = True):
+        self.token = token
+        self._owns_channel = channel is None
+        self.channel = channel if channel is not None else create_channel(target, secure)
+
+    async def close(self):
+        if self._owns_channel:
+            await self.channel.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _metadata(self, job_id=None, **extra):
+        metadata = [("authorization", f"Bearer {self.token}")]
+        if job_id is not None:
+            metadata.append(("x-job-id", job_id))
+        metadata.extend((key.replace("_", "-"), value) for key, value in extra.items())
+        return metadata
+
+
+class _OperationClient(_Client):
+    """Progress polling shared by the two asynchronous services."""
+
+    _service = None  # prefix of the service's modules in `stubs`
+    _failure_message = "operation failed"
+
+    @property
+    def _pb2(self):
+        return getattr(stubs, f"{self._service}_pb2")
+
+    async def get_progress(self, job: Job):
+        request = self._pb2.GetProgressRequest(operation_id=job.operation_id)
+        return await self._stub.GetProgress(request, metadata=job.metadata)
+
+    async def wait(self, job: Job, poll_interval: float = 5.0, on_progress=None):
+        """Poll GetProgress until the operation completes; returns the last ProgressResponse."""
+        while True:
+            progress_response = await self.get_progress(job)
+            if on_progress is not None:
+                on_progress(job, progress_response)
+            if progress_response.status == "completed":
+                return progress_response
+            if progress_response.status == "failed":
+                raise RuntimeError(f"{self._failure_message}: {progress_response.error or 'please contact support.'}")
+            await asyncio.sleep(poll_interval)
+
+    async def delete(self, job: Job):
+        request = self._pb2.DeleteRecognitionRequest(operation_id=job.operation_id)
+        await self._stub.DeleteRecognition(request, metadata=job.metadata)
+
+
+async def _iter_audio_requests(audio, options):
+    yield stubs.stt_async_pb2.RecognizeFileStreamingRequest(options=options)
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        yield stubs.stt_async_pb2.RecognizeFileStreamingRequest(audio_data=bytes(audio))
+    elif hasattr(audio, "__aiter__"):
+        async for chunk in audio:
+            yield stubs.stt_async_pb2.RecognizeFileStreamingRequest(audio_data=chunk)
+    else:
+        # Sync iterables (e.g. audio_converter.iter_converted_audio) may do
+        # CPU-bound conversion per chunk: run it off the event loop
+        iterator = iter(audio)
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, None)
+            if chunk is None:
+                break
+            yield stubs.stt_async_pb2.RecognizeFileStreamingRequest(audio_data=chunk)
+
+
+class AsyncRecognizerClient(_OperationClient):
+    """Client of the stt_async `AsyncRecognizer` service."""
+
+    _service = "stt_async"
+    _failure_message = "Recognition operation failed"
+
+    def __init__(self, token: str, target: str = STT_ASYNC_TARGET, channel=None, secure: bool = True):
+        super().__init__(token, target, channel, secure)
+        self._stub = stubs.stt_async_pb2_grpc.AsyncRecognizerStub(self.channel)
+
+    async def submit(self, audio, lang: str, oracle_speaker_labels=(),
+                     restrict_to_oracle_speaker_labels: bool = False, custom_options: str = "{}") -> Job:
+        """
+        Upload audio with RecognizeFileStreaming and return the job handle.
+        `audio` is the WAV file as bytes, or a sync/async iterable of byte chunks.
+        `oracle_speaker_labels` holds OracleSpeakerLabel messages or (label, wav_bytes) pairs.
+        """
+        labels = [
+            label if isinstance(label, stubs.stt_async_pb2.OracleSpeakerLabel)
+            else stubs.stt_async_pb2.OracleSpeakerLabel(speaker_label=label[0], audio_data=label[1])
+            for label in oracle_speaker_labels
+        ]
+        options = stubs.stt_async_pb2.RecognitionOptions(
+            oracle_speaker_labels=labels,
+            restrict_to_oracle_speaker_labels=restrict_to_oracle_speaker_labels,
+            custom_options=custom_options,
+        )
+        job_id = str(uuid.uuid4())
+        metadata = self._metadata(job_id, x_language=lang)
+        operation = await self._stub.RecognizeFileStreaming(_iter_audio_requests(audio, options), metadata=metadata)
+        return Job(operation.id, job_id, metadata)
+
+    async def iter_results(self, job: Job):
+        """Async iterator over the StreamingResponse messages of a completed job."""
+        request = stubs.stt_async_pb2.GetRecognitionRequest(operation_id=job.operation_id)
+        async for response in self._stub.GetRecognition(request, metadata=job.metadata):
+            yield response
+
+    async def get_result(self, job: Job):
+        """List of DiarizationResult segments of a completed job."""
+        return [segment async for response in self.iter_results(job) for segment in response.results]
+
+    async def recognize(self, audio, lang: str, poll_interval: float = 5.0, **options):
+        """submit + wait + get_result."""
+        job = await self.submit(audio, lang, **options)
+        await self.wait(job, poll_interval)
+        return await self.get_result(job)
+
+
+class LangDetectorClient(_Client):
+    """Client of the synchronous `LangDetector` service."""
+
+    def __init__(self, token: str, target: str = LANG_DETECT_TARGET, channel=None, secure: bool = True):
+        super().__init__(token, target, channel, secure)
+        self._stub = stubs.lang_detect_pb2_grpc.LangDetectorStub(self.channel)
+
+    async def detect(self, audio_data: bytes, allowed_languages=()):
+        """DetectFromAudio; returns the LangDetectResponse."""
+        request = stubs.lang_detect_pb2.AudioLangDetectRequest(
+            audio_data=bytes(audio_data),
+            allowed_languages=list(allowed_languages),
+        )
+        return await self._stub.DetectFromAudio(request, metadata=self._metadata())
+
+
+class AsrPostprocessorClient(_OperationClient):
+    """Client of the postprocess_asr `AsyncAsrPostprocessor` service."""
+
+    _service = "postprocess_asr"
+    _failure_message = "Asr postprocessor operation failed"
+
+    def __init__(self, token: str, target: str = POSTPROCESS_ASR_TARGET, channel=None, secure: bool = True):
+        super().__init__(token, target, channel, secure)
+        self._stub = stubs.postprocess_asr_pb2_grpc.AsyncAsrPostprocessorStub(self.channel)
+
+    async def submit(self, speakers: str, utterances: str, lang: str,
+                     min_pause_to_separate: float = 5.0, as_monologue: bool = False) -> Job:
+        """Start post-processing of .speakers/.text contents and return the job handle."""
+        request = stubs.postprocess_asr_pb2.PostprocessAsrRequest(
+            speakers=speakers,
+            utterances=utterances,
+            min_pause_to_separate=min_pause_to_separate,
+            as_monologue=as_monologue,
+            language=lang,
+        )
+        job_id = str(uuid.uuid4())
+        metadata = self._metadata(job_id)
+        operation = await self._stub.PostprocessAsr(request, metadata=metadata)
+        return Job(operation.id, job_id, metadata)
+
+    async def get_result(self, job: Job):
+        """PostprocessAsrResponse of a completed job."""
+        request = stubs.postprocess_asr_pb2.GetRecognitionRequest(operation_id=job.operation_id)
+        return await self._stub.GetRecognition(request, metadata=job.metadata)
+
+    async def postprocess(self, speakers: str, utterances: str, lang: str, poll_interval: float = 2.0, **options):
+        """submit + wait + get_result."""
+        job = await self.submit(speakers, utterances, lang, **options)
+        await self.wait(job, poll_interval)
+        return await self.get_result(job)
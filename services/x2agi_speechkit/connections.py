@@ -0,0 +1,419 @@
+"""
+Pooled, long-lived gRPC channels and REST sessions to the x2agi services,
+shared by the client scripts of all three services (see ConnectionManager).
+"""
+import functools
+import threading
+import time
+import urllib.parse
+
+from x2agi_speechkit import metrics
+
+# grpc and requests are imported on first use: the REST clients never load
+# grpc and the gRPC clients never load requests, which shortens their startup
+
+GRPC_ENDPOINTS = {
+    "stt_async": "stt-async.x2agi.com:8443",
+    "lang_detect": "lang-detect.x2agi.com:8443",
+    "postprocess_asr": "postprocess-asr.x2agi.ru:8443",
+}
+REST_BASE_URLS = {
+    "stt_async": "https://stt-async.x2agi.com:8444",
+    "lang_detect": "https://lang-detect.x2agi.com:8444",
+    "postprocess_asr": "https://postprocess-asr.x2agi.ru:8444",
+}
+MAX_MESSAGE_LENGTH = 50 * 1024 * 1024
+RECONNECT_OPTIONS = [
+    # A dropped connection is re-established by gRPC with jittered exponential backoff, 1s up to 10s
+    ("grpc.initial_reconnect_backoff_ms", 1000),
+    ("grpc.min_reconnect_backoff_ms", 1000),
+    ("grpc.max_reconnect_backoff_ms", 10000),
+]
+
+
+def open_channel(endpoint, insecure=False, options=()):
+    """gRPC channel with the options recommended for the x2agi services."""
+    import grpc
+
+    if insecure:
+        # Plaintext, for a local mock server
+        return grpc.insecure_channel(
+            endpoint,
+            options=[("grpc.max_receive_message_length", MAX_MESSAGE_LENGTH)] + RECONNECT_OPTIONS + list(options)
+        )
+    host = endpoint.rsplit(":", 1)[0]
+    return grpc.secure_channel(
+        endpoint,
+        grpc.ssl_channel_credentials(),
+        options=[
+            ("grpc.ssl_target_name_override", host),  # Force SNI
+            ("grpc.default_authority", host),
+            # Recommended optimizations:
+            ("grpc.keepalive_time_ms", 10000),
+            ("grpc.max_receive_message_length", MAX_MESSAGE_LENGTH)
+        ] + RECONNECT_OPTIONS + list(options)
+    )
+
+
+def open_session(base_url, pool_size=10):
+    """requests session with retries (exponential backoff with jitter) on the services' transient errors."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry_strategy = Retry(
+        total=5,
+        backoff_factor=2,
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=["POST", "GET"],
+        raise_on_status=False,
+        backoff_jitter=0.3
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=1, pool_maxsize=pool_size)
+    session.mount(base_url, adapter)
+    return session
+
+
+def _format_bytes(size):
+    return f"{size / 1024 / 1024:.2f} MB" if size >= 1024 * 1024 else f"{size / 1024:.1f} KB"
+
+
+class ConnectionStats:
+    """
+    Counters of one pooled channel or session, updated from the threads that use it.
+    Bytes are also added to the process-wide metrics of the service and transport.
+    """
+
+    def __init__(self, service: str, transport: str, name: str = None):
+        self.service = service
+        self.transport = transport
+        self.name = name or f"{service} {transport}"
+        self.rpcs = 0
+        self.failed = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.connects = 0
+        self.reconnects = 0
+        self.connect_s = 0.0  # time spent establishing connections (TCP + TLS + HTTP/2)
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+        if counts.get("bytes_sent"):
+            metrics.BYTES_SENT.inc(counts["bytes_sent"], service=self.service, transport=self.transport)
+        if counts.get("bytes_received"):
+            metrics.BYTES_RECEIVED.inc(counts["bytes_received"], service=self.service, transport=self.transport)
+
+    def summary(self) -> str:
+        text = (f"{self.name}: {self.rpcs} calls ({self.failed} failed), {_format_bytes(self.bytes_sent)} sent, "
+                f"{_format_bytes(self.bytes_received)} received, {self.connects} connects")
+        if self.reconnects is not None:
+            text += f" ({self.connect_s:.2f}s), {self.reconnects} reconnects"
+        return text
+
+
+class _CountedResponses:
+    """Response iterator of a streaming call that counts the received bytes; the rest of the call is passed through."""
+
+    def __init__(self, call, stats):
+        self._call = call
+        self._stats = stats
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        response = next(self._call)
+        self._stats.add(bytes_received=response.ByteSize())
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._call, name)
+
+
+@functools.lru_cache(maxsize=None)
+def _stats_interceptor_class():
+    import grpc
+
+    class StatsInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor,
+                           grpc.StreamUnaryClientInterceptor, grpc.StreamStreamClientInterceptor):
+        """Counts the calls and the serialized message bytes of a channel, and records each call's latency and code."""
+
+        def __init__(self, stats: ConnectionStats):
+            self.stats = stats
+
+        def _count_requests(self, requests):
+            for request in requests:
+                self.stats.add(bytes_sent=request.ByteSize())
+                yield request
+
+        def _on_done(self, call, unary_response, method, start):
+            try:
+                failed = call.exception() is not None
+                code = call.code().name
+            except grpc.FutureCancelledError:
+                failed, code = True, "CANCELLED"
+            metrics.record_rpc(self.stats.service, "grpc", method, code, time.monotonic() - start)
+            if failed:
+                self.stats.add(failed=1)
+            elif unary_response:
+                self.stats.add(bytes_received=call.result().ByteSize())
+
+        def _track(self, call, client_call_details, unary_response, start):
+            method = client_call_details.method.rsplit("/", 1)[-1]
+            call.add_done_callback(lambda call: self._on_done(call, unary_response, method, start))
+
+        # The clock starts before the continuation: for blocking calls it returns with the call already done
+        def intercept_unary_unary(self, continuation, client_call_details, request):
+            start = time.monotonic()
+            self.stats.add(rpcs=1, bytes_sent=request.ByteSize())
+            call = continuation(client_call_details, request)
+            self._track(call, client_call_details, True, start)
+            return call
+
+        def intercept_unary_stream(self, continuation, client_call_details, request):
+            start = time.monotonic()
+            self.stats.add(rpcs=1, bytes_sent=request.ByteSize())
+            call = continuation(client_call_details, request)
+            self._track(call, client_call_details, False, start)
+            return _CountedResponses(call, self.stats)
+
+        def intercept_stream_unary(self, continuation, client_call_details, request_iterator):
+            start = time.monotonic()
+            self.stats.add(rpcs=1)
+            call = continuation(client_call_details, self._count_requests(request_iterator))
+            self._track(call, client_call_details, True, start)
+            return call
+
+        def intercept_stream_stream(self, continuation, client_call_details, request_iterator):
+            start = time.monotonic()
+            self.stats.add(rpcs=1)
+            call = continuation(client_call_details, self._count_requests(request_iterator))
+            self._track(call, client_call_details, False, start)
+            return _CountedResponses(call, self.stats)
+
+    return StatsInterceptor
+
+
+class _PooledChannel:
+    def __init__(self, service, name, endpoint, insecure, connect=False):
+        import grpc
+
+        self.stats = ConnectionStats(service, "grpc", name)
+        self.state = grpc.ChannelConnectivity.IDLE
+        self._connecting_since = time.monotonic() if connect else None
+        self.ready = threading.Event()
+        # A local subchannel pool gives every pooled channel its own connection:
+        # by default gRPC shares one between channels created with the same arguments
+        self.raw = open_channel(endpoint, insecure, [("grpc.use_local_subchannel_pool", 1)])
+        self.channel = grpc.intercept_channel(self.raw, _stats_interceptor_class()(self.stats))
+        # Connecting through the first subscription rather than a channel_ready_future: gRPC's
+        # polling thread outlives an extra subscriber and dies with "Channel closed!" on close()
+        self.raw.subscribe(self._on_state, try_to_connect=connect)
+
+    def _on_state(self, state):
+        import grpc
+
+        previous, self.state = self.state, state
+        if state in (grpc.ChannelConnectivity.CONNECTING, grpc.ChannelConnectivity.TRANSIENT_FAILURE) \
+                and self._connecting_since is None:
+            self._connecting_since = time.monotonic()
+        elif state is grpc.ChannelConnectivity.READY and previous is not grpc.ChannelConnectivity.READY:
+            connect_s = time.monotonic() - self._connecting_since if self._connecting_since is not None else 0.0
+            self._connecting_since = None
+            self.stats.add(connects=1, reconnects=1 if self.stats.connects else 0, connect_s=connect_s)
+        if state is grpc.ChannelConnectivity.READY:
+            self.ready.set()
+        else:
+            self.ready.clear()
+
+    def connect(self):
+        """Start connecting an idle channel; `ready` is set once the connection is up."""
+        import grpc
+
+        if self._connecting_since is None and self.state is grpc.ChannelConnectivity.IDLE:
+            self._connecting_since = time.monotonic()
+            self.raw.unsubscribe(self._on_state)
+            self.raw.subscribe(self._on_state, try_to_connect=True)
+
+    def healthy(self) -> bool:
+        import grpc
+
+        return self.state not in (grpc.ChannelConnectivity.TRANSIENT_FAILURE, grpc.ChannelConnectivity.SHUTDOWN)
+
+    def close(self):
+        self.raw.unsubscribe(self._on_state)
+        self.raw.close()
+
+
+class ConnectionManager:
+    """
+    Pooled, long-lived connections to the x2agi services, shared by everything
+    a process sends to them instead of one channel or session per job.
+
+    `channel(service)` hands out the gRPC channels of a service round-robin
+    from a pool of `channels_per_service`, each on its own HTTP/2 connection,
+    and skips channels whose connection is down while another one is up. A
+    dropped connection is re-established by gRPC with backoff
+    (RECONNECT_OPTIONS). `session(service)` is one requests session per
+    service whose keep-alive pool holds up to `pool_size` connections and
+    retries transient errors with backoff.
+
+    `warm()` connects the channels ahead of the first call, so the TCP and TLS
+    handshakes overlap with audio conversion instead of delaying the upload.
+    Every channel and session counts its calls, bytes, connects and reconnects:
+
+        with ConnectionManager(endpoints={"stt_async": args.endpoint}) as connections:
+            connections.warm(["stt_async"], wait=False)
+            stub = AsyncRecognizerStub(connections.channel("stt_async"))
+            ...
+            print(connections.summary())
+
+    `endpoints` and `base_urls` override the production addresses per service,
+    e.g. with a local mock server and `insecure=True`.
+    """
+
+    def __init__(self, channels_per_service: int = 1, insecure: bool = False, endpoints=None, base_urls=None,
+                 pool_size: int = 10):
+        self.channels_per_service = max(1, channels_per_service)
+        self.insecure = insecure
+        self.endpoints = {**GRPC_ENDPOINTS, **(endpoints or {})}
+        self.base_urls = {**REST_BASE_URLS, **(base_urls or {})}
+        self.pool_size = pool_size
+        self._channels = {}  # service -> [_PooledChannel]
+        self._sessions = {}  # service -> (session, stats)
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, service, connect=False):
+        with self._lock:
+            pool = self._channels.get(service)
+            if pool is None:
+                names = [f"{service} grpc"] if self.channels_per_service == 1 else [
+                    f"{service} grpc #{i + 1}" for i in range(self.channels_per_service)]
+                pool = self._channels[service] = [
+                    _PooledChannel(service, name, self.endpoints[service], self.insecure, connect) for name in names]
+            return pool
+
+    def channel(self, service: str) -> "grpc.Channel":
+        """The next channel of the service's pool that is not in a connection failure."""
+        pool = self._pool(service)
+        with self._lock:
+            start = self._next.get(service, 0)
+            self._next[service] = start + 1
+        for i in range(len(pool)):
+            pooled = pool[(start + i) % len(pool)]
+            if pooled.healthy():
+                return pooled.channel
+        return pool[start % len(pool)].channel  # all down: the call waits for gRPC to reconnect
+
+    def channels(self, service: str):
+        """All channels of the service's pool, e.g. to create one stub per channel."""
+        return [pooled.channel for pooled in self._pool(service)]
+
+    def healthy(self, service: str) -> bool:
+        """True unless every channel of the service is in a connection failure."""
+        return any(pooled.healthy() for pooled in self._pool(service))
+
+    def session(self, service: str) -> "requests.Session":
+        """The shared requests session of the service's REST API."""
+        with self._lock:
+            if service not in self._sessions:
+                session = open_session(self.base_urls[service], self.pool_size)
+                stats = ConnectionStats(service, "rest")
+                stats.reconnects = None  # urllib3 does not tell a reconnect from a connection opened for concurrency
+                session.hooks["response"].append(
+                    lambda response, *args, **kwargs: self._count_response(stats, response, kwargs.get("stream")))
+                self._sessions[service] = (session, stats)
+            return self._sessions[service][0]
+
+    @staticmethod
+    def _count_response(stats, response, stream):
+        body = response.request.body
+        sent = int(response.request.headers.get("Content-Length") or 0) or (len(body) if isinstance(body, (bytes, str)) else 0)
+        received = int(response.headers.get("Content-Length") or 0) if stream else len(response.content)
+        stats.add(rpcs=1, failed=1 if response.status_code >= 400 else 0, bytes_sent=sent, bytes_received=received)
+        method = urllib.parse.urlsplit(response.request.url).path.rsplit("/", 1)[-1]
+        metrics.record_rpc(stats.service, "rest", method, str(response.status_code), response.elapsed.total_seconds())
+        # The urllib3 Retry that answered the request keeps the attempts that were retried
+        retries = getattr(response.raw, "retries", None)
+        if retries is not None and retries.history:
+            metrics.RETRIES.inc(len(retries.history), service=stats.service, transport="rest")
+
+    def warm(self, services=None, timeout: float = 10.0, wait: bool = True) -> dict:
+        """
+        Connect the gRPC channels of `services` (default: all three) now.
+        With `wait`, block until they are ready or `timeout` passes and return
+        {service: ready}; otherwise return at once and let them connect in the background.
+        """
+        pools = {service: self._pool(service, connect=True) for service in (services or self.endpoints)}
+        for pool in pools.values():
+            for pooled in pool:
+                pooled.connect()  # channels that were already opened idle by channel()
+        if not wait:
+            return {}
+        deadline = time.monotonic() + timeout
+        # Not ready is not an error: gRPC keeps reconnecting with backoff
+        return {service: all([pooled.ready.wait(max(0.0, deadline - time.monotonic())) for pooled in pool])
+                for service, pool in pools.items()}
+
+    def warm_sessions(self, services, timeout: float = 10.0, wait: bool = True):
+        """Open a keep-alive connection of each REST session with a HEAD request to the service's URL."""
+        import requests
+
+        def connect(service):
+            session, url = self.session(service), self.base_urls[service]
+            try:
+                # Straight through the adapter: the warm-up is not counted as a call of the session
+                response = session.get_adapter(url).send(session.prepare_request(requests.Request("HEAD", url)),
+                                                         timeout=timeout)
+                response.content  # hands the connection back to the keep-alive pool
+            except requests.exceptions.RequestException:
+                pass  # the first real request connects (and retries) on its own
+
+        threads = [threading.Thread(target=connect, args=(service,), daemon=True) for service in services]
+        for thread in threads:
+            thread.start()
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def stats(self):
+        """ConnectionStats of every channel and session opened so far."""
+        with self._lock:
+            pools = list(self._channels.values())
+            sessions = list(self._sessions.values())
+        stats = [pooled.stats for pool in pools for pooled in pool]
+        for session, session_stats in sessions:
+            # urllib3 counts the connections each host pool has opened, reused keep-alive ones are not counted again
+            connects = 0
+            for adapter in session.adapters.values():
+                for key in list(adapter.poolmanager.pools.keys()):
+                    pool = adapter.poolmanager.pools.get(key)
+                    if pool is not None:
+                        connects += pool.num_connections
+            session_stats.connects = connects
+            stats.append(session_stats)
+        return stats
+
+    def summary(self) -> str:
+        return "connections:" + "".join(f"\n\t{stats.summary()}" for stats in self.stats())
+
+    def close(self):
+        with self._lock:
+            pools, self._channels = list(self._channels.values()), {}
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for pool in pools:
+            for pooled in pool:
+                pooled.close()
+        for session, _ in sessions:
+            session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,199 @@
+"""
+In-process fake of the three x2agi services for tests, on an insecure local port.
+
+    async with FakeServer() as server:
+        async with AsyncRecognizerClient("token", target=server.target, secure=False) as client:
+            segments = await client.recognize(wav_bytes, lang="en", poll_interval=0)
+
+Asynchronous operations advance by `progress_step` percent per GetProgress call,
+so tests are deterministic and never sleep. Every call is recorded in `calls`.
+"""
+import uuid
+
+import grpc
+from google.protobuf import empty_pb2
+
+from .stubs import (
+    lang_detect_pb2,
+    lang_detect_pb2_grpc,
+    operation_pb2,
+    postprocess_asr_pb2,
+    postprocess_asr_pb2_grpc,
+    stt_async_pb2,
+    stt_async_pb2_grpc,
+)
+
+
+async def _check_auth(context):
+    metadata = dict(context.invocation_metadata())
+    if not metadata.get("authorization", "").startswith("Bearer "):
+        await context.abort(grpc.StatusCode.UNAUTHENTICATED, "missing bearer token")
+    return metadata
+
+
+class _Operations:
+    def __init__(self, server):
+        self.server = server
+        self.operations = {}
+
+    def create(self, payload):
+        operation_id = uuid.uuid4().hex[:24]
+        self.operations[operation_id] = {"progress": 0, "payload": payload}
+        return operation_pb2.Operation(id=operation_id, done=False)
+
+    async def get(self, operation_id, context):
+        if operation_id not in self.operations:
+            await context.abort(grpc.StatusCode.NOT_FOUND, f"unknown operation {operation_id}")
+        return self.operations[operation_id]
+
+    async def progress(self, pb2, request, context):
+        operation = await self.get(request.operation_id, context)
+        if operation["progress"] < 100:
+            operation["progress"] = min(100, operation["progress"] + self.server.progress_step)
+        if self.server.fail_operations:
+            return pb2.ProgressResponse(operation_id=request.operation_id, status="failed",
+                                        progress=operation["progress"], error="injected failure")
+        status = "completed" if operation["progress"] >= 100 else "processing"
+        return pb2.ProgressResponse(operation_id=request.operation_id, status=status, progress=operation["progress"])
+
+    async def result(self, request, context):
+        operation = await self.get(request.operation_id, context)
+        if operation["progress"] < 100:
+            await context.abort(grpc.StatusCode.FAILED_PRECONDITION, "operation is not completed")
+        return operation["payload"]
+
+
+class FakeAsyncRecognizer(stt_async_pb2_grpc.AsyncRecognizerServicer):
+    def __init__(self, server):
+        self.server = server
+        self.operations = _Operations(server)
+
+    async def RecognizeFileStreaming(self, request_iterator, context):
+        metadata = await _check_auth(context)
+        options = None
+        audio = bytearray()
+        async for request in request_iterator:
+            if request.HasField("options"):
+                options = request.options
+            else:
+                audio.extend(request.audio_data)
+        self.server.calls.append(("RecognizeFileStreaming", metadata, len(audio)))
+        segments = self.server.recognition_results(bytes(audio), options, metadata)
+        return self.operations.create(segments)
+
+    async def GetProgress(self, request, context):
+        self.server.calls.append(("stt_async.GetProgress", dict(context.invocation_metadata()), request.operation_id))
+        return await self.operations.progress(stt_async_pb2, request, context)
+
+    async def GetRecognition(self, request, context):
+        self.server.calls.append(("stt_async.GetRecognition", dict(context.invocation_metadata()), request.operation_id))
+        segments = await self.operations.result(request, context)
+        for segment in segments:
+            yield stt_async_pb2.StreamingResponse(operation_id=request.operation_id, results=[segment])
+
+    async def DeleteRecognition(self, request, context):
+        self.operations.operations.pop(request.operation_id, None)
+        return empty_pb2.Empty()
+
+
+class FakeLangDetector(lang_detect_pb2_grpc.LangDetectorServicer):
+    def __init__(self, server):
+        self.server = server
+
+    async def DetectFromAudio(self, request, context):
+        metadata = await _check_auth(context)
+        self.server.calls.append(("DetectFromAudio", metadata, len(request.audio_data)))
+        language = self.server.detected_language
+        allowed = list(request.allowed_languages)
+        allowed_language = language if not allowed or language in allowed else allowed[0]
+        return lang_detect_pb2.LangDetectResponse(
+            allowed_language=allowed_language,
+            allowed_language_confidence=0.95 if allowed_language == language else 0.4,
+            detected_language=language,
+            detected_language_confidence=0.95,
+        )
+
+
+class FakeAsrPostprocessor(postprocess_asr_pb2_grpc.AsyncAsrPostprocessorServicer):
+    def __init__(self, server):
+        self.server = server
+        self.operations = _Operations(server)
+
+    async def PostprocessAsr(self, request, context):
+        metadata = await _check_auth(context)
+        self.server.calls.append(("PostprocessAsr", metadata, request.language))
+        response = postprocess_asr_pb2.PostprocessAsrResponse(
+            speakers=request.speakers,
+            # "Punctuate" the text column of each line
+            utterances="\n".join(
+                line.rpartition("\t")[0] + line.rpartition("\t")[1] + line.rpartition("\t")[2].capitalize() + "."
+                if line.strip() else line
+                for line in request.utterances.split("\n")
+            ),
+        )
+        return self.operations.create(response)
+
+    async def GetProgress(self, request, context):
+        self.server.calls.append(("postprocess_asr.GetProgress", dict(context.invocation_metadata()), request.operation_id))
+        return await self.operations.progress(postprocess_asr_pb2, request, context)
+
+    async def GetRecognition(self, request, context):
+        self.server.calls.append(("postprocess_asr.GetRecognition", dict(context.invocation_metadata()), request.operation_id))
+        response = await self.operations.result(request, context)
+        response.operation_id = request.operation_id
+        return response
+
+
+def default_recognition_results(audio: bytes, options, metadata):
+    """One segment per oracle label (or a single "Speaker 1") spanning the audio."""
+    duration_ms = max(0, len(audio) - 44) * 1000 // (16000 * 2)
+    labels = [label.speaker_label for label in options.oracle_speaker_labels] if options else []
+    labels = list(dict.fromkeys(labels)) or ["Speaker 1"]
+    step = duration_ms // len(labels) if duration_ms else 0
+    return [
+        stt_async_pb2.DiarizationResult(
+            start_time_ms=i * step,
+            end_time_ms=(i + 1) * step,
+            speaker_label=label,
+            transcript=f"{metadata.get('x-language', '')} segment {i}",
+        )
+        for i, label in enumerate(labels)
+    ]
+
+
+class FakeServer:
+    """Serves fake AsyncRecognizer, LangDetector and AsyncAsrPostprocessor on one port."""
+
+    def __init__(self, port: int = 0, progress_step: int = 50, detected_language: str = "en",
+                 recognition_results=default_recognition_results):
+        self.port = port
+        self.progress_step = progress_step
+        self.detected_language = detected_language
+        self.recognition_results = recognition_results
+        self.fail_operations = False
+        self.calls = []
+        self._server = None
+
+    @property
+    def target(self) -> str:
+        return f"127.0.0.1:{self.port}"
+
+    async def start(self):
+        self._server = grpc.aio.server()
+        stt_async_pb2_grpc.add_AsyncRecognizerServicer_to_server(FakeAsyncRecognizer(self), self._server)
+        lang_detect_pb2_grpc.add_LangDetectorServicer_to_server(FakeLangDetector(self), self._server)
+        postprocess_asr_pb2_grpc.add_AsyncAsrPostprocessorServicer_to_server(FakeAsrPostprocessor(self), self._server)
+        self.port = self._server.add_insecure_port(f"127.0.0.1:{self.port}")
+        await self._server.start()
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            await self._server.stop(grace=None)
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
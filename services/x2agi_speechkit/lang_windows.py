@@ -0,0 +1,54 @@
+"""
+Windows sampled across a recording for language detection, and the vote that
+combines their results. Shared by the lang_detect clients (window_sampler.py)
+and the Orchestrator.
+"""
+
+
+def plan_windows(duration_s: float, num_windows: int, window_s: float):
+    """
+    (start_s, duration_s) of `num_windows` windows of `window_s` spread evenly
+    over the recording, each centred in its share of the file, so intros and
+    outros do not dominate. A file too short to hold them gives one window.
+    """
+    if duration_s <= num_windows * window_s:
+        return [(0.0, duration_s)]
+    share = duration_s / num_windows
+    return [(i * share + (share - window_s) / 2, window_s) for i in range(num_windows)]
+
+
+def spread_order(num_windows: int):
+    """
+    Window indices ordered so that each next window is the farthest from those
+    already sent: the middle first, then the ends, then the gaps. After an
+    early exit the windows that were sent still cover the whole file.
+    """
+    if num_windows == 0:
+        return []
+    order = [num_windows // 2]
+    while len(order) < num_windows:
+        order.append(max((i for i in range(num_windows) if i not in order),
+                         key=lambda i: min(abs(i - j) for j in order)))
+    return order
+
+
+def combine_votes(results, key: str = "detected_language"):
+    """
+    Weighted vote over per-window results: every window votes for its `key`
+    language with weight confidence * window length. Returns (language, confidence):
+    the confidence is the winner's weight over the total window length, i.e. its
+    mean confidence with windows that voted otherwise counting as 0.
+    """
+    weights = {}
+    total = 0.0
+    for result, window_s in results:
+        language = result[key]
+        confidence = float(result[key + "_confidence"])
+        if not language:
+            continue
+        weights[language] = weights.get(language, 0.0) + confidence * window_s
+        total += window_s
+    if not weights:
+        return "", 0.0
+    language = max(weights, key=weights.get)
+    return language, weights[language] / total
@@ -0,0 +1,332 @@
+"""
+Prometheus metrics of the x2agi clients: stage durations, RPCs, bytes,
+retries and the server's response wall time, in the text exposition format.
+
+Everything recorded goes to the process-wide REGISTRY. The pooled channels
+and sessions of connections.ConnectionManager record every call; the client
+scripts time their stages:
+
+    with metrics.stage("stt_async", "upload"):
+        job = submit_recognition(...)
+
+`add_arguments(parser)` gives a script --metrics_port (serve /metrics over
+HTTP while it runs) and --metrics_textfile (rewrite a file for the
+node_exporter textfile collector, and once more on exit); `start_export(args)`
+starts whichever was asked for. Only the standard library is used, and
+http.server only once a port is served, to keep the clients' startup short.
+"""
+import bisect
+import contextlib
+import os
+import threading
+import time
+
+# Stages range from a 10 ms RPC to hours of recognition of a long file
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+RPC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter family with labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram family with labels, as Prometheus histograms are exposed."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(tuple(labels[name] for name in self.labels))
+        return entry[2] if entry else 0
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels(self.labels, key, [('le', _format_value(float(bound)))])} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {count}"
+
+
+class Registry:
+    """Metric families by name, rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            existing = self._metrics.setdefault(metric.name, metric)
+        if type(existing) is not type(metric) or existing.labels != metric.labels:
+            raise ValueError(f"metric {metric.name} is already registered with other labels")
+        return existing
+
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels=(), buckets=DURATION_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """Write the metrics to `path` atomically, so the textfile collector never reads half a file."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "x2agi_stage_duration_seconds", "Time spent in a client stage (conversion, upload, queueing, processing, download...)",
+    ("service", "stage"))
+STAGE_FAILURES = REGISTRY.counter(
+    "x2agi_stage_failures_total", "Client stages that ended with an error", ("service", "stage"))
+RPCS = REGISTRY.counter(
+    "x2agi_rpcs_total", "Calls to the services by method and status code (gRPC code name or HTTP status)",
+    ("service", "transport", "method", "code"))
+RPC_SECONDS = REGISTRY.histogram(
+    "x2agi_rpc_duration_seconds", "Call latency, until the last response message of a stream",
+    ("service", "transport", "method"), RPC_BUCKETS)
+BYTES_SENT = REGISTRY.counter(
+    "x2agi_sent_bytes_total", "Serialized request bytes (gRPC) or request body bytes (REST)", ("service", "transport"))
+BYTES_RECEIVED = REGISTRY.counter(
+    "x2agi_received_bytes_total", "Serialized response bytes (gRPC) or response body bytes (REST)", ("service", "transport"))
+RETRIES = REGISTRY.counter(
+    "x2agi_retries_total", "Requests sent again: REST retries of transient errors, uploads repeated for lost operations",
+    ("service", "transport"))
+RESPONSE_DELAY_SECONDS = REGISTRY.histogram(
+    "x2agi_response_delay_seconds",
+    "Time from the server writing a StreamingResponse (response_wall_time_ms) to the client receiving it",
+    ("service",), RPC_BUCKETS)
+
+
+def observe_stage(service: str, stage: str, seconds: float, failed: bool = False):
+    STAGE_SECONDS.observe(seconds, service=service, stage=stage)
+    if failed:
+        STAGE_FAILURES.inc(service=service, stage=stage)
+
+
+@contextlib.contextmanager
+def stage(service: str, name: str):
+    """Time the block as stage `name` of `service`; an exception counts as a failure of the stage."""
+    start = time.monotonic()
+    try:
+        yield
+    except BaseException:
+        observe_stage(service, name, time.monotonic() - start, failed=True)
+        raise
+    observe_stage(service, name, time.monotonic() - start)
+
+
+def timed_chunks(chunks, service: str, name: str):
+    """
+    Pass `chunks` through, timing stage `name` as the time spent producing
+    them, e.g. the conversion of audio that is uploaded while it is converted.
+    """
+    busy = 0.0
+    iterator = iter(chunks)
+    try:
+        while True:
+            start = time.monotonic()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                busy += time.monotonic() - start
+                break
+            busy += time.monotonic() - start
+            yield chunk
+    except BaseException:
+        observe_stage(service, name, busy, failed=True)
+        raise
+    observe_stage(service, name, busy)
+
+
+class OperationTimer:
+    """
+    Splits the wait for an asynchronous operation, polled with GetProgress, into
+    stage "queue" while the server reports it pending and stage "process"
+    from the first other status until it completes. Both are only as precise
+    as the polling interval.
+    """
+
+    QUEUED_STATUSES = ("pending", "queued")
+
+    def __init__(self, service: str):
+        self.service = service
+        self.start = time.monotonic()
+        self.processing_since = None
+
+    def record(self, status: str):
+        if self.processing_since is None and status not in self.QUEUED_STATUSES:
+            self.processing_since = time.monotonic()
+            observe_stage(self.service, "queue", self.processing_since - self.start)
+
+    def done(self, failed: bool = False):
+        now = time.monotonic()
+        if self.processing_since is None:
+            observe_stage(self.service, "queue", now - self.start, failed)
+        else:
+            observe_stage(self.service, "process", now - self.processing_since, failed)
+
+
+def record_rpc(service: str, transport: str, method: str, code: str, seconds: float):
+    RPCS.inc(service=service, transport=transport, method=method, code=code)
+    RPC_SECONDS.observe(seconds, service=service, transport=transport, method=method)
+
+
+def record_response_wall_time(service: str, response_wall_time_ms: int):
+    """Delay of a response stamped with the server's wall clock; unset (0) stamps are ignored."""
+    if response_wall_time_ms > 0:
+        RESPONSE_DELAY_SECONDS.observe(max(0.0, time.time() - response_wall_time_ms / 1000), service=service)
+
+
+def _handler_class(registry):
+    import http.server
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes are not worth a line in the client's output
+
+    return Handler
+
+
+class Exporter:
+    """Serves the registry on `port` and/or rewrites `textfile` every `interval` seconds, until close()."""
+
+    def __init__(self, registry=REGISTRY, port: int = None, textfile: str = None, interval: float = 15.0,
+                 host: str = "127.0.0.1"):
+        self.registry = registry
+        self.textfile = textfile
+        self.interval = interval
+        self._server = None
+        self._stop = threading.Event()
+        self._threads = []
+        if port is not None:
+            import http.server
+
+            self._server = http.server.ThreadingHTTPServer((host, port), _handler_class(registry))
+            self._server.daemon_threads = True
+            self._threads.append(threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True))
+        if textfile is not None:
+            self._threads.append(threading.Thread(target=self._write_periodically, name="metrics-textfile", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def port(self):
+        return self._server.server_address[1] if self._server is not None else None
+
+    def _write_periodically(self):
+        while not self._stop.wait(self.interval):
+            self.registry.write_textfile(self.textfile)
+
+    def close(self):
+        """Stop serving and write the textfile a last time, with the final values."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        if self.textfile is not None:
+            self.registry.write_textfile(self.textfile)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def add_arguments(parser):
+    parser.add_argument("--metrics_port", type=int, default=None,
+                        help="serve Prometheus metrics on http://127.0.0.1:<port>/metrics while running")
+    parser.add_argument("--metrics_textfile", type=str, default=None,
+                        help="write Prometheus metrics to this file (node_exporter textfile collector), every 15s and on exit")
+
+
+def start_export(args) -> Exporter:
+    """Exporter for the --metrics_port / --metrics_textfile of `args`; a no-op one when neither is given."""
+    return Exporter(port=args.metrics_port, textfile=args.metrics_textfile)
@@ -0,0 +1,242 @@
+"""
+End-to-end transcription: lang_detect -> stt_async -> postprocess_asr per file,
+with the results of each step passed in memory to the next.
+
+The detected language becomes the x-language of the recognition and the
+language of the post-processing; the recognized segments are formatted as
+.speakers/.text contents for PostprocessAsr without touching the disk. Many
+files are processed at once, each at its own step, so one file is uploaded
+while another is being recognized and a third post-processed:
+
+    async with LangDetectorClient(token) as lang_detect, AsyncRecognizerClient(token) as stt, \\
+            AsrPostprocessorClient(token) as postprocessor:
+        orchestrator = Orchestrator(lang_detect, stt, postprocessor)
+        async for result in orchestrator.run(paths, load_audio=read_wav):
+            print(result.path, result.lang, result.utterances)
+"""
+import asyncio
+import io
+import struct
+import time
+import wave
+
+from .lang_windows import combine_votes, plan_windows, spread_order
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+STAGES = ("load", "detect", "upload", "recognize", "download", "postprocess")
+
+
+def wav_header(data_size: int) -> bytes:
+    """44-byte header of a 16kHz mono 16-bit PCM WAV with `data_size` bytes of samples."""
+    return (b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVEfmt "
+            + struct.pack("<IHHIIHH", 16, 1, 1, SAMPLE_RATE, SAMPLE_RATE * SAMPLE_WIDTH, SAMPLE_WIDTH, 16)
+            + b"data" + struct.pack("<I", data_size))
+
+
+def sample_windows(wav: bytes, num_windows: int = 3, window_s: float = 20.0):
+    """
+    (window WAV, duration_s) of the windows plan_windows() spreads over a 16kHz
+    mono WAV, as the lang_detect clients sample them. The samples are located
+    through the WAV's chunks, so headers with extra (e.g. LIST) chunks work too.
+    """
+    with wave.open(io.BytesIO(wav), "rb") as reader:
+        if (reader.getframerate(), reader.getnchannels(), reader.getsampwidth()) != (SAMPLE_RATE, 1, SAMPLE_WIDTH):
+            raise ValueError("audio is not 16kHz mono 16-bit WAV, convert it first")
+        frames = reader.getnframes()
+        windows = []
+        for start_s, duration_s in plan_windows(frames / SAMPLE_RATE, num_windows, window_s):
+            reader.setpos(min(int(start_s * SAMPLE_RATE), frames))
+            pcm = reader.readframes(int(duration_s * SAMPLE_RATE))
+            windows.append((wav_header(len(pcm)) + pcm, duration_s))
+    return windows
+
+
+def time_label_format(segments):
+    """
+    (speakers, utterances): the .speakers and .text contents of DiarizationResult
+    segments, as stt_async/client_grpc.py:save_in_time_label_format writes them.
+    """
+    speakers = "".join(f"{s.start_time_ms / 1000}\t{s.end_time_ms / 1000}\t{s.speaker_label}\n" for s in segments)
+    utterances = "".join(f"{s.start_time_ms / 1000}\t{s.end_time_ms / 1000}\t{s.transcript.strip()}\n" for s in segments)
+    return speakers, utterances
+
+
+class FileResult:
+    """Outcome of one file: the language, the raw segments and the post-processed transcript, or the error."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lang = None
+        self.lang_confidence = None  # None when the language was given
+        self.segments = []
+        self.speakers = None  # post-processed .speakers / .text contents
+        self.utterances = None
+        self.timings = {}  # stage -> seconds
+        self.error = None
+        self.failed_stage = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        state = f"error={self.error!r}" if self.error else f"lang={self.lang!r}, segments={len(self.segments)}"
+        return f"FileResult({self.path!r}, {state})"
+
+
+class Orchestrator:
+    """
+    Runs every file through load -> detect -> upload -> recognize -> download ->
+    postprocess. `load` converts the file in a thread (CPU-bound), the other
+    steps are calls on the clients' channels. A file whose language is given
+    skips detection; the others are detected from `detect_windows` windows,
+    `window_concurrency` at a time, with the early exit of the lang_detect
+    clients (`min_windows`, `confidence_threshold`).
+
+    Concurrency is bounded per step, so the steps of different files overlap:
+    at most `max_files` files are in progress (their audio is held in memory
+    from load to upload), `max_loads` load at once and `max_uploads` upload at
+    once. Waiting for the services (recognize, postprocess) holds no thread.
+    `stats()` reports, per step, the files that went through it, the time
+    they spent there and the most files that were in it at the same time.
+    """
+
+    def __init__(self, lang_detect, stt, postprocessor, allowed_languages=("en", "ru"), detect_windows: int = 3,
+                 window_s: float = 20.0, window_concurrency: int = 2, min_windows: int = 2,
+                 confidence_threshold: float = 0.9, max_files: int = 8, max_loads: int = 2, max_uploads: int = 4,
+                 poll_interval: float = 5.0, postprocess_poll_interval: float = 2.0,
+                 min_pause_to_separate: float = 5.0, as_monologue: bool = False):
+        self.lang_detect = lang_detect
+        self.stt = stt
+        self.postprocessor = postprocessor
+        self.allowed_languages = list(allowed_languages)
+        self.detect_windows = detect_windows
+        self.window_s = window_s
+        self.window_concurrency = window_concurrency
+        self.min_windows = min_windows
+        self.confidence_threshold = confidence_threshold
+        self.max_files = max_files
+        self.poll_interval = poll_interval
+        self.postprocess_poll_interval = postprocess_poll_interval
+        self.min_pause_to_separate = min_pause_to_separate
+        self.as_monologue = as_monologue
+        self._loads = asyncio.Semaphore(max_loads)
+        self._uploads = asyncio.Semaphore(max_uploads)
+        self._stats = {stage: {"files": 0, "seconds": 0.0, "active": 0, "max_active": 0} for stage in STAGES}
+
+    async def _stage(self, result, stage, awaitable):
+        stats = self._stats[stage]
+        stats["active"] += 1
+        stats["max_active"] = max(stats["max_active"], stats["active"])
+        start = time.monotonic()
+        try:
+            return await awaitable
+        except Exception:
+            result.failed_stage = stage
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            result.timings[stage] = elapsed
+            stats["active"] -= 1
+            stats["files"] += 1
+            stats["seconds"] += elapsed
+
+    async def _detect(self, wav: bytes):
+        windows = sample_windows(wav, self.detect_windows, self.window_s)
+        key = "allowed_language" if self.allowed_languages else "detected_language"
+        turns = asyncio.Semaphore(self.window_concurrency)
+
+        async def detect_window(window):
+            async with turns:
+                response = await self.lang_detect.detect(window, self.allowed_languages)
+            return {key: getattr(response, key), key + "_confidence": getattr(response, key + "_confidence")}
+
+        # Started in spread_order(); once the vote is confident enough, windows not yet sent are skipped
+        pending = {asyncio.ensure_future(detect_window(windows[index][0])): index
+                   for index in spread_order(len(windows))}
+        votes = []
+        try:
+            while pending:
+                finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    votes.append((task.result(), windows[pending.pop(task)][1]))
+                _, confidence = combine_votes(votes, key)
+                if len(votes) >= self.min_windows and confidence >= self.confidence_threshold:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+        return combine_votes(votes, key)
+
+    async def transcribe(self, path, load_audio, lang: str = None) -> FileResult:
+        """
+        Process one file; `load_audio(path)` returns it as 16kHz mono WAV bytes.
+        Errors are returned in the FileResult, with the step that failed.
+        """
+        result = FileResult(path)
+        try:
+            async with self._loads:  # a step's time and concurrency exclude the wait for its turn
+                wav = await self._stage(result, "load", asyncio.to_thread(load_audio, path))
+            if lang is None:
+                lang, result.lang_confidence = await self._stage(result, "detect", self._detect(wav))
+                if not lang:
+                    raise RuntimeError("no language detected")
+            result.lang = lang
+            async with self._uploads:
+                job = await self._stage(result, "upload", self.stt.submit(wav, lang))
+            del wav
+            await self._stage(result, "recognize", self.stt.wait(job, self.poll_interval))
+            result.segments = await self._stage(result, "download", self.stt.get_result(job))
+            speakers, utterances = time_label_format(result.segments)
+            response = await self._stage(result, "postprocess", self.postprocessor.postprocess(
+                speakers, utterances, lang, self.postprocess_poll_interval,
+                min_pause_to_separate=self.min_pause_to_separate, as_monologue=self.as_monologue))
+            result.speakers, result.utterances = response.speakers, response.utterances
+        except Exception as e:
+            result.error = e
+        return result
+
+    async def run(self, items, load_audio):
+        """
+        Process `items` (paths, or (path, lang) pairs with lang None to detect it)
+        with up to `max_files` in progress; yields the FileResults as files finish.
+        """
+        files = asyncio.Semaphore(self.max_files)
+        done = asyncio.Queue()
+
+        async def process(path, lang):
+            try:
+                await done.put(await self.transcribe(path, load_audio, lang))
+            finally:
+                files.release()
+
+        tasks = []
+        yielded = 0
+        try:
+            for item in items:
+                path, lang = item if isinstance(item, tuple) else (item, None)
+                await files.acquire()
+                tasks.append(asyncio.ensure_future(process(path, lang)))
+                while not done.empty():
+                    yielded += 1
+                    yield done.get_nowait()
+            while yielded < len(tasks):
+                yielded += 1
+                yield await done.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self):
+        """Per step: files, total seconds and the most files in the step at once."""
+        return {stage: {name: value for name, value in stats.items() if name != "active"}
+                for stage, stats in self._stats.items()}
+
+    def summary(self) -> str:
+        lines = []
+        for stage, stats in self.stats().items():
+            if stats["files"]:
+                lines.append(f"\t{stage:<12}{stats['files']:>5} files, {stats['seconds'] / stats['files']:.2f}s avg, "
+                             f"up to {stats['max_active']} at once")
+        return "stages:\n" + "\n".join(lines)
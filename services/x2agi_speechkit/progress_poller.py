@@ -0,0 +1,102 @@
+"""
+Adaptive GetProgress polling of the services' asynchronous operations, for
+the stt_async and postprocess_asr clients (see AdaptivePoller).
+"""
+import random
+import time
+
+
+class AdaptivePoller:
+    """
+    Chooses the delay before each GetProgress call instead of a fixed sleep.
+
+    Once `progress` (0-100) starts moving, completion time is extrapolated from
+    its recent rate of change and the next poll is scheduled halfway to the
+    estimate, so polls get sparse on long jobs and dense near the end. Until
+    then the delay backs off exponentially, capped by the expected processing
+    time of `audio_duration_s` while that has not run out, and never shorter
+    than `fixed_interval`: a queued job is never polled more often than a
+    fixed-interval loop would poll it. Every delay gets `jitter` so many
+    clients started together do not poll in lockstep.
+
+        poller = AdaptivePoller(fixed_interval=5, audio_duration_s=3600)
+        while True:
+            ...GetProgress...
+            poller.record(progress)
+            if status == "completed":
+                break
+            poller.sleep()
+        print(poller.summary())
+    """
+
+    def __init__(self, fixed_interval: float, audio_duration_s: float = None,
+                 min_interval: float = 0.5, max_interval: float = 60.0, initial_interval: float = 1.0,
+                 backoff: float = 2.0, jitter: float = 0.2, realtime_factor: float = 0.1, window: int = 5):
+        self.fixed_interval = fixed_interval
+        self.audio_duration_s = audio_duration_s
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.realtime_factor = realtime_factor  # expected processing time / audio duration
+        self.window = window
+        self.polls = 0
+        self._backoff_interval = initial_interval
+        self._samples = []  # (monotonic time, progress) of each poll
+        self._start = time.monotonic()
+
+    def estimated_remaining_s(self):
+        """Seconds until completion extrapolated from the progress rate, or None without a rate yet."""
+        if not self._samples:
+            return None
+        now, progress = self._samples[-1]
+        for then, earlier in self._samples[-self.window:-1]:
+            if earlier < progress and now > then:
+                rate = (progress - earlier) / (now - then)
+                return max(0.0, (100 - progress) / rate)
+        return None
+
+    def record(self, progress: float):
+        """Record the `progress` returned by a GetProgress call."""
+        self.polls += 1
+        self._samples.append((time.monotonic(), progress))
+        del self._samples[:-self.window]
+
+    def next_interval(self) -> float:
+        """Delay before the next GetProgress call."""
+        remaining = self.estimated_remaining_s()
+        if remaining is not None:
+            interval = remaining / 2
+            self._backoff_interval = max(self.min_interval, interval)
+            interval = min(self.max_interval, max(self.min_interval, interval))
+            return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+        interval = self._backoff_interval
+        self._backoff_interval = min(self.max_interval, self._backoff_interval * self.backoff)
+        if self.audio_duration_s:
+            elapsed = time.monotonic() - self._start
+            expected_remaining = self.audio_duration_s * self.realtime_factor - elapsed
+            # Past the expected processing time the job is late (e.g. queued): keep backing off
+            if expected_remaining > 0:
+                interval = min(interval, expected_remaining / 2)
+        # Without a measured rate, no faster than the fixed interval; jitter only lengthens the delay
+        interval = min(self.max_interval, max(self.fixed_interval, interval))
+        return interval * random.uniform(1, 1 + self.jitter)
+
+    def sleep(self):
+        time.sleep(self.next_interval())
+
+    def fixed_interval_polls(self) -> int:
+        """GetProgress calls a fixed `fixed_interval` loop would have made over the same time."""
+        elapsed = (self._samples[-1][0] if self._samples else time.monotonic()) - self._start
+        return int(elapsed // self.fixed_interval) + 1
+
+    def saved_polls(self) -> int:
+        """Calls saved over the fixed interval; negative when more calls were made."""
+        return self.fixed_interval_polls() - self.polls
+
+    def summary(self) -> str:
+        saved = self.saved_polls()
+        return (f"GetProgress calls: {self.polls} "
+                f"(polling every {self.fixed_interval:g}s would take {self.fixed_interval_polls()}, "
+                + (f"saved {saved})" if saved >= 0 else f"{-saved} more)"))
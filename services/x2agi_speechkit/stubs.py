@@ -0,0 +1,43 @@
+"""
+Generated protobuf and gRPC modules of the three services, loaded on first use.
+
+The generated code lives once in `proto/`, which is put on sys.path so its
+absolute imports (`google.api`, `yandex.cloud`, ...) resolve as generated.
+A service's modules, and with them its descriptors and grpc, are imported
+the first time one of them is accessed:
+
+    from x2agi_speechkit import stubs
+    request = stubs.lang_detect_pb2.AudioLangDetectRequest(audio_data=wav)  # imports lang_detect only
+"""
+import importlib
+import os
+import sys
+
+PROTO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "proto")
+
+if PROTO_DIR not in sys.path:
+    sys.path.append(PROTO_DIR)
+
+_MODULES = {
+    "stt_async_pb2": "stt_async.stt_async_service_pb2",
+    "stt_async_pb2_grpc": "stt_async.stt_async_service_pb2_grpc",
+    "lang_detect_pb2": "lang_detect.lang_detect_service_pb2",
+    "lang_detect_pb2_grpc": "lang_detect.lang_detect_service_pb2_grpc",
+    "postprocess_asr_pb2": "postprocess_asr.postprocess_asr_service_pb2",
+    "postprocess_asr_pb2_grpc": "postprocess_asr.postprocess_asr_service_pb2_grpc",
+    "operation_pb2": "yandex.cloud.operation.operation_pb2",
+}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(_MODULES[name])
+    globals()[name] = module  # later accesses skip __getattr__
+    return module
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,136 @@
+"""
+Per-job timeline traces in the Chrome trace event format, for Perfetto
+(https://ui.perfetto.dev) or chrome://tracing.
+
+A JobTrace collects the spans of one job on named tracks (e.g. "upload",
+"poll") and saves them as one JSON file. The job is a process of the trace,
+named after its x-job-id and operation.id, and every track is one of its
+threads. Timestamps are wall-clock microseconds, so the files of a whole
+batch, written by any number of processes, line up when merged:
+
+    trace = JobTrace("upload of call.wav")
+    with trace.span("upload", "RecognizeFileStreaming"):
+        ...
+    trace.identify(job_id=job_id, operation_id=operation.id)
+    trace.save("call.trace.json")
+
+    python -m x2agi_speechkit.trace merge batch.json traces/*.json
+"""
+import argparse
+import contextlib
+import glob
+import json
+import threading
+import time
+import zlib
+
+
+class JobTrace:
+    """Spans of one job; safe to add to from several threads."""
+
+    def __init__(self, name: str = None, job_id: str = None, operation_id: str = None):
+        self.name = name
+        self.job_id = job_id
+        self.operation_id = operation_id
+        # Wall clock for the placement of the trace, monotonic clock for the spans in it
+        self._wall0 = time.time()
+        self._mono0 = time.monotonic()
+        self._tracks = {}  # track name -> tid, in order of first use
+        self._events = []
+        self._lock = threading.Lock()
+
+    def identify(self, job_id: str = None, operation_id: str = None):
+        """Set the ids the job is known by once the client or the server has assigned them."""
+        if job_id is not None:
+            self.job_id = job_id
+        if operation_id is not None:
+            self.operation_id = operation_id
+
+    def now(self) -> float:
+        """Current time on the trace's clock, in seconds since the epoch."""
+        return self._wall0 + (time.monotonic() - self._mono0)
+
+    def _tid(self, track: str) -> int:
+        tid = self._tracks.get(track)
+        if tid is None:
+            tid = self._tracks[track] = len(self._tracks) + 1
+        return tid
+
+    def add(self, track: str, name: str, start: float, end: float, **args):
+        """A span from `start` to `end` (seconds since the epoch, see now()) on `track`."""
+        with self._lock:
+            self._events.append({
+                "name": name, "ph": "X", "tid": self._tid(track),
+                "ts": round(start * 1e6), "dur": max(0, round((end - start) * 1e6)), "args": args,
+            })
+
+    def instant(self, track: str, name: str, **args):
+        with self._lock:
+            self._events.append({"name": name, "ph": "i", "s": "t", "tid": self._tid(track),
+                                 "ts": round(self.now() * 1e6), "args": args})
+
+    @contextlib.contextmanager
+    def span(self, track: str, name: str, **args):
+        """Time the block as a span; the yielded dict's items are added to its args, an exception as "error"."""
+        start = self.now()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = repr(e)
+            raise
+        finally:
+            self.add(track, name, start, self.now(), **args)
+
+    def pid(self) -> int:
+        """Process id of the job in the trace: stable for its x-job-id, so merged files do not collide."""
+        key = self.job_id or self.operation_id or self.name or str(id(self))
+        return zlib.crc32(key.encode("utf-8")) & 0x7FFFFFFF
+
+    def events(self):
+        """The trace events, with the metadata that names the job and its tracks."""
+        pid = self.pid()
+        label = self.name or "job"
+        if self.job_id:
+            label += f" x-job-id={self.job_id}"
+        if self.operation_id:
+            label += f" operation.id={self.operation_id}"
+        with self._lock:
+            events = [dict(event, pid=pid) for event in self._events]
+            tracks = list(self._tracks.items())
+        ids = {"job_id": self.job_id, "operation_id": self.operation_id}
+        metadata = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": label, **ids}}]
+        metadata += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": track}}
+                     for track, tid in tracks]
+        # Tracks keep the order they were first used in, e.g. convert, upload, poll, download
+        metadata += [{"name": "thread_sort_index", "ph": "M", "pid": pid, "tid": tid, "args": {"sort_index": tid}}
+                     for _, tid in tracks]
+        return metadata + events
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms"}, f)
+
+
+def merge(paths, output: str):
+    """Merge trace files into one, e.g. the per-job traces of a batch. Returns the number of events."""
+    events = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # Both forms of the format: {"traceEvents": [...]} and a bare list of events
+        events.extend(data["traceEvents"] if isinstance(data, dict) else data)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return len(events)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Merge Chrome trace files into one")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    merge_parser = subparsers.add_parser("merge", help="merge trace files (quoted globs are expanded)")
+    merge_parser.add_argument("output", type=str, help="merged trace file")
+    merge_parser.add_argument("inputs", type=str, nargs="+", help="trace files or quoted glob patterns")
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in args.inputs for path in (glob.glob(pattern) or [pattern])} - {args.output})
+    print(f"merged {merge(paths, args.output)} events of {len(paths)} files into {args.output}")
@@ -0,0 +1,21 @@
+import os
+import struct
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The package without `pip install -e .`, and the stt_async script modules, which import each other flat
+sys.path[:0] = [os.path.join(ROOT, "services"), os.path.join(ROOT, "services", "stt_async")]
+
+
+def make_wav(seconds: float, amplitude: int = 0) -> bytes:
+    """16kHz mono 16-bit WAV of a constant `amplitude`."""
+    data = struct.pack("<h", amplitude) * int(seconds * 16000)
+    return (b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVEfmt "
+            + struct.pack("<IHHIIHH", 16, 1, 1, 16000, 32000, 2, 16) + b"data" + struct.pack("<I", len(data)) + data)
+
+
+@pytest.fixture
+def wav():
+    return make_wav(2.0, amplitude=1000)
@@ -0,0 +1,92 @@
+import asyncio
+
+import grpc
+import pytest
+
+from x2agi_speechkit import AsrPostprocessorClient, AsyncRecognizerClient, LangDetectorClient
+from x2agi_speechkit.fake_server import FakeServer
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_recognize_round_trip(wav):
+    async def scenario():
+        async with FakeServer(progress_step=50) as server:
+            async with AsyncRecognizerClient("token", target=server.target, secure=False) as client:
+                segments = await client.recognize(wav, lang="en", poll_interval=0,
+                                                  oracle_speaker_labels=[("JOHNNY", wav), ("MICHAEL", wav)])
+            return segments, server.calls
+
+    segments, calls = run(scenario())
+    assert [s.speaker_label for s in segments] == ["JOHNNY", "MICHAEL"]
+    assert segments[0].transcript == "en segment 0"
+    assert segments[-1].end_time_ms == 2000
+    methods = [call[0] for call in calls]
+    assert methods == ["RecognizeFileStreaming", "stt_async.GetProgress", "stt_async.GetProgress",
+                       "stt_async.GetRecognition"]
+    # Every call of the job carries its x-job-id
+    job_ids = {call[1]["x-job-id"] for call in calls}
+    assert len(job_ids) == 1
+    assert calls[0][1]["x-language"] == "en"
+    assert calls[0][2] == len(wav)
+
+
+def test_submit_streams_chunks(wav):
+    async def chunks():
+        for i in range(0, len(wav), 1000):
+            yield wav[i:i + 1000]
+
+    async def scenario():
+        async with FakeServer(progress_step=100) as server:
+            async with AsyncRecognizerClient("token", target=server.target, secure=False) as client:
+                job = await client.submit(chunks(), lang="ru")
+                progress = await client.wait(job, poll_interval=0)
+                segments = await client.get_result(job)
+            return job, progress, segments, server.calls
+
+    job, progress, segments, calls = run(scenario())
+    assert progress.status == "completed" and progress.operation_id == job.operation_id
+    assert calls[0][2] == len(wav)
+    assert [s.speaker_label for s in segments] == ["Speaker 1"]
+
+
+def test_failed_operation_raises(wav):
+    async def scenario():
+        async with FakeServer() as server:
+            server.fail_operations = True
+            async with AsyncRecognizerClient("token", target=server.target, secure=False) as client:
+                await client.recognize(wav, lang="en", poll_interval=0)
+
+    with pytest.raises(RuntimeError, match="injected failure"):
+        run(scenario())
+
+
+def test_deleted_operation_is_not_found(wav):
+    async def scenario():
+        async with FakeServer() as server:
+            async with AsyncRecognizerClient("token", target=server.target, secure=False) as client:
+                job = await client.submit(wav, lang="en")
+                await client.delete(job)
+                await client.get_progress(job)
+
+    with pytest.raises(grpc.aio.AioRpcError) as error:
+        run(scenario())
+    assert error.value.code() == grpc.StatusCode.NOT_FOUND
+
+
+def test_detect_and_postprocess(wav):
+    async def scenario():
+        async with FakeServer(detected_language="ru") as server:
+            async with LangDetectorClient("token", target=server.target, secure=False) as lang_detect, \
+                    AsrPostprocessorClient("token", target=server.target, secure=False) as postprocessor:
+                detected = await lang_detect.detect(wav, allowed_languages=["en", "ru"])
+                response = await postprocessor.postprocess("0.0\t1.0\tSpeaker 1\n", "0.0\t1.0\thello there\n",
+                                                           "ru", poll_interval=0)
+            return detected, response
+
+    detected, response = run(scenario())
+    assert detected.allowed_language == "ru"
+    assert response.utterances.startswith("0.0\t1.0\tHello there.")
+    assert response.speakers == "0.0\t1.0\tSpeaker 1\n"
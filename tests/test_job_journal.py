@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from job_journal import IN_FLIGHT, JobJournal
+
+JOB = {"path": "calls/a.wav", "save": "results/a"}
+UPLOADED = {"operation_id": "op-1", "job_id": "job-1", "lang": "en", "audio_duration_s": 12.5}
+
+
+def test_new_job_has_no_state(tmp_path):
+    with JobJournal(str(tmp_path / "journal.jsonl")) as journal:
+        assert journal.state(JOB) is None
+        assert journal.summary([JOB]).startswith("journal: 1 new")
+
+
+def test_resume_after_reopen(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    with JobJournal(path) as journal:
+        journal.record(JOB, "converted")
+        journal.record(JOB, "uploaded", **UPLOADED)
+        journal.record(JOB, "polling")
+
+    with JobJournal(path) as journal:
+        entry = journal.state(JOB)
+    # The operation recorded at upload is kept through the later transitions
+    assert entry["state"] == "polling" and entry["state"] in IN_FLIGHT
+    assert {key: entry[key] for key in UPLOADED} == UPLOADED
+    assert "token" not in json.dumps(entry)
+
+
+def test_failed_forgets_the_operation(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    with JobJournal(path) as journal:
+        journal.record(JOB, "uploaded", **UPLOADED)
+        journal.record(JOB, "failed", error="UNAVAILABLE")
+        entry = journal.state(JOB)
+    assert entry["state"] == "failed" and entry["error"] == "UNAVAILABLE"
+    assert "operation_id" not in entry
+
+    with JobJournal(path) as journal:
+        assert "operation_id" not in journal.state(JOB)
+        # A new attempt starts from scratch
+        journal.record(JOB, "converted")
+        journal.record(JOB, "uploaded", **dict(UPLOADED, operation_id="op-2"))
+        assert journal.state(JOB)["operation_id"] == "op-2"
+
+
+def test_written_and_downloaded(tmp_path):
+    with JobJournal(str(tmp_path / "journal.jsonl")) as journal:
+        journal.record(JOB, "uploaded", **UPLOADED)
+        journal.record(JOB, "downloaded")
+        assert journal.state(JOB)["state"] in IN_FLIGHT
+        journal.record(JOB, "written")
+        assert journal.state(JOB)["state"] not in IN_FLIGHT
+        assert journal.summary([JOB, {"path": "b.wav", "save": "results/b"}]) == \
+            f"journal: 1 new, 1 written ({journal.path})"
+
+
+def test_torn_line_is_ignored(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    with JobJournal(str(path)) as journal:
+        journal.record(JOB, "uploaded", **UPLOADED)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"time": 1, "path": "calls/a.wav", "save": "results/a", "sta')  # crash mid-write
+
+    with JobJournal(str(path)) as journal:
+        assert journal.state(JOB)["state"] == "uploaded"
+        journal.record(JOB, "polling")
+    with JobJournal(str(path)) as journal:
+        assert journal.state(JOB)["state"] == "polling"
+
+
+def test_unknown_state(tmp_path):
+    with JobJournal(str(tmp_path / "journal.jsonl")) as journal:
+        with pytest.raises(ValueError):
+            journal.record(JOB, "done")
@@ -0,0 +1,78 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from x2agi_speechkit import metrics
+
+
+def test_counter_and_histogram_render():
+    registry = metrics.Registry()
+    calls = registry.counter("test_calls_total", "Calls", ("method", "code"))
+    seconds = registry.histogram("test_seconds", "Latency", ("method",), buckets=(0.1, 1))
+    calls.inc(method="Get", code="OK")
+    calls.inc(2, method="Get", code="OK")
+    calls.inc(method='Say "hi"', code="UNAVAILABLE")
+    for value in (0.05, 0.5, 5):
+        seconds.observe(value, method="Get")
+
+    assert calls.value(method="Get", code="OK") == 3
+    assert seconds.count(method="Get") == 3
+    lines = registry.render().splitlines()
+    assert "# TYPE test_calls_total counter" in lines
+    assert 'test_calls_total{method="Get",code="OK"} 3' in lines
+    assert 'test_calls_total{method="Say \\"hi\\"",code="UNAVAILABLE"} 1' in lines
+    # Buckets are cumulative, with +Inf counting every observation
+    assert 'test_seconds_bucket{method="Get",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{method="Get",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{method="Get",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{method="Get"} 5.55' in lines
+    assert 'test_seconds_count{method="Get"} 3' in lines
+
+
+def test_registering_twice():
+    registry = metrics.Registry()
+    counter = registry.counter("test_total", "Things", ("kind",))
+    assert registry.counter("test_total", "Things", ("kind",)) is counter
+    with pytest.raises(ValueError):
+        registry.histogram("test_total", "Things", ("kind",))
+
+
+def test_stage_records_failures():
+    with metrics.stage("test_service", "upload"):
+        pass
+    with pytest.raises(KeyError):
+        with metrics.stage("test_service", "upload"):
+            raise KeyError("boom")
+    assert metrics.STAGE_SECONDS.count(service="test_service", stage="upload") == 2
+    assert metrics.STAGE_FAILURES.value(service="test_service", stage="upload") == 1
+
+
+def test_timed_chunks_and_operation_timer():
+    assert list(metrics.timed_chunks(iter([b"a", b"b"]), "test_chunks", "convert")) == [b"a", b"b"]
+    assert metrics.STAGE_SECONDS.count(service="test_chunks", stage="convert") == 1
+
+    timer = metrics.OperationTimer("test_operation")
+    timer.record("pending")
+    timer.record("processing")
+    timer.record("processing")
+    timer.done()
+    assert metrics.STAGE_SECONDS.count(service="test_operation", stage="queue") == 1
+    assert metrics.STAGE_SECONDS.count(service="test_operation", stage="process") == 1
+
+
+def test_exporter(tmp_path):
+    registry = metrics.Registry()
+    registry.counter("test_exported_total", "Exported").inc()
+    textfile = tmp_path / "x2agi.prom"
+    with metrics.Exporter(registry, port=0, textfile=str(textfile), interval=60) as exporter:
+        with urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert b"test_exported_total 1" in response.read()
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/other", timeout=5)
+        assert error.value.code == 404
+        registry.counter("test_exported_total", "Exported").inc()
+    # Written once more on close, with the final values
+    assert "test_exported_total 2" in textfile.read_text()
+    assert not list(tmp_path.glob("*.tmp"))
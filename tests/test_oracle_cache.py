@@ -0,0 +1,42 @@
+import os
+
+from oracle_cache import DiskLRU, OracleClipCache
+
+
+def test_oracle_clip_cache(tmp_path):
+    clip = tmp_path / "vito.wav"
+    clip.write_bytes(b"source audio")
+    copy = tmp_path / "copy.wav"
+    copy.write_bytes(b"source audio")
+
+    with OracleClipCache(str(tmp_path / "cache"), log=lambda message: None) as cache:
+        key = cache.key(str(clip))
+        assert cache.key(str(copy)) == key  # keyed by content, not by path
+        assert cache.lookup(key) is None
+        cache.store(key, b"converted")
+        assert bytes(cache.lookup(key)) == b"converted"
+        assert (cache.hits, cache.misses) == (1, 1)
+        clip.write_bytes(b"edited audio")
+        assert cache.key(str(clip)) != key
+
+
+def test_oracle_clip_cache_evicts_least_recently_used(tmp_path):
+    cache_dir = tmp_path / "cache"
+    with OracleClipCache(str(cache_dir), max_bytes=20, log=lambda message: None) as cache:
+        cache.store("old", b"a" * 10)
+        os.utime(cache_dir / "old.wav", (1, 1))
+        cache.store("recent", b"b" * 10)
+        cache.store("new", b"c" * 10)
+        assert sorted(os.listdir(cache_dir)) == ["new.wav", "recent.wav"]
+
+
+def test_disk_lru_evicts_only_its_own_suffix(tmp_path):
+    wavs = DiskLRU(str(tmp_path), ".wav", max_bytes=10)
+    results = DiskLRU(str(tmp_path), ".pb", max_bytes=10)
+    wavs.write("clip", [b"a" * 6, b"b" * 4])
+    results.write("job", [b"c" * 10])
+    assert sorted(os.listdir(tmp_path)) == ["clip.wav", "job.pb"]
+    results.write("other", [b"d" * 10])
+    assert sorted(os.listdir(tmp_path)) == ["clip.wav", "other.pb"]
+    with open(wavs.touch("clip"), "rb") as f:
+        assert f.read() == b"a" * 6 + b"b" * 4
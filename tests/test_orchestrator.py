@@ -0,0 +1,66 @@
+import asyncio
+import struct
+
+import pytest
+
+from conftest import make_wav
+from x2agi_speechkit import AsrPostprocessorClient, AsyncRecognizerClient, LangDetectorClient
+from x2agi_speechkit.fake_server import FakeServer
+from x2agi_speechkit.orchestrator import Orchestrator, sample_windows, wav_header
+
+
+def test_orchestrator(wav):
+    async def scenario():
+        async with FakeServer() as server:
+            async with LangDetectorClient("token", target=server.target, secure=False) as lang_detect, \
+                    AsyncRecognizerClient("token", target=server.target, secure=False) as stt, \
+                    AsrPostprocessorClient("token", target=server.target, secure=False) as postprocessor:
+                orchestrator = Orchestrator(lang_detect, stt, postprocessor, poll_interval=0,
+                                            postprocess_poll_interval=0, max_files=2)
+                items = ["a.wav", ("b.wav", "ru"), "missing.wav"]
+
+                def load_audio(path):
+                    if path == "missing.wav":
+                        raise FileNotFoundError(path)
+                    return wav
+
+                results = [result async for result in orchestrator.run(items, load_audio)]
+            return results, orchestrator.stats()
+
+    results, stats = asyncio.run(scenario())
+    by_path = {result.path: result for result in results}
+    assert by_path["a.wav"].ok and by_path["a.wav"].lang == "en"
+    assert by_path["a.wav"].lang_confidence == pytest.approx(0.95)
+    assert by_path["b.wav"].lang == "ru" and by_path["b.wav"].lang_confidence is None
+    assert by_path["b.wav"].utterances.startswith("0.0\t2.0\tRu segment 0.")
+    assert not by_path["missing.wav"].ok and by_path["missing.wav"].failed_stage == "load"
+    assert stats["detect"]["files"] == 1
+    assert stats["postprocess"]["files"] == 2
+
+
+def test_sample_windows_skips_extra_chunks():
+    pcm = struct.pack("<32000h", *range(32000))  # 2 s whose samples give their position
+    fmt = struct.pack("<IHHIIHH", 16, 1, 1, 16000, 32000, 2, 16)
+    info = b"INFOISFT" + struct.pack("<I", 6) + b"sox 14"
+    # A LIST/INFO chunk between fmt and data, as audio editors write it
+    body = (b"WAVEfmt " + fmt + b"LIST" + struct.pack("<I", len(info)) + info
+            + b"data" + struct.pack("<I", len(pcm)) + pcm)
+    windows = sample_windows(b"RIFF" + struct.pack("<I", len(body)) + body, num_windows=2, window_s=0.5)
+    assert [duration_s for _, duration_s in windows] == [0.5, 0.5]
+    # Each window is centred in its half of the file
+    assert windows[0][0] == wav_header(16000) + pcm[8000:24000]
+    assert windows[1][0] == wav_header(16000) + pcm[40000:56000]
+
+
+def test_detection_exits_early():
+    async def scenario():
+        async with FakeServer() as server:
+            async with LangDetectorClient("token", target=server.target, secure=False) as lang_detect:
+                orchestrator = Orchestrator(lang_detect, None, None, detect_windows=3, window_s=20.0)
+                detected = await orchestrator._detect(make_wav(90.0))
+            return detected, [call for call in server.calls if call[0] == "DetectFromAudio"]
+
+    (language, confidence), calls = asyncio.run(scenario())
+    assert (language, confidence) == ("en", pytest.approx(0.95))
+    # The first two windows agree with 0.95 confidence: the third one is never sent
+    assert len(calls) == 2
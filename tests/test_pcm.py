@@ -0,0 +1,27 @@
+import numpy as np
+
+from pcm import SAMPLE_RATE, frame_energy_db, open_pcm, wav_header
+
+
+def test_frame_energy_db_in_blocks():
+    samples = np.zeros(SAMPLE_RATE * 3 + 100, dtype="<i2")
+    samples[SAMPLE_RATE:2 * SAMPLE_RATE] = 3277  # about -20 dBFS in the second second
+    energy = frame_energy_db(samples, frame_ms=20, block_frames=7)  # blocks end mid-way through each second
+    assert len(energy) == 150  # the partial frame at the end is dropped
+    assert np.allclose(energy[50:100], 20 * np.log10(3277 / 32768), atol=0.01)
+    assert np.allclose(energy[:50], -100) and np.allclose(energy[100:], -100)  # the -100 dB floor
+    assert np.array_equal(energy, frame_energy_db(samples, frame_ms=20))
+
+
+def test_open_pcm(tmp_path):
+    samples = np.arange(1000, dtype="<i2")
+    path = tmp_path / "a.wav"
+    path.write_bytes(wav_header(samples.nbytes) + samples.tobytes())
+    data, offset, length = open_pcm(str(path))
+    try:
+        assert (offset, length) == (44, samples.nbytes)
+        view = np.frombuffer(data, dtype="<i2", count=length // 2, offset=offset)
+        assert np.array_equal(view, samples)
+        del view
+    finally:
+        data.close()
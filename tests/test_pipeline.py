@@ -0,0 +1,99 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from pipeline import Cancelled, Finished, Pipeline
+
+
+class Results:
+    """on_result that collects (item, value, error) and can wait for `count` of them."""
+
+    def __init__(self, count):
+        self.items = []
+        self._done = threading.Semaphore(0)
+        self._count = count
+
+    def __call__(self, item, value, error):
+        self.items.append((item, value, error))
+        self._done.release()
+
+    def wait(self, timeout=10):
+        return all(self._done.acquire(timeout=timeout) for _ in range(self._count))
+
+
+def test_items_go_through_every_stage():
+    results = Results(5)
+    with Pipeline(results, queue_size=2) as pipeline:
+        pipeline.add_stage("double", lambda x: x * 2, workers=2)
+        pipeline.add_stage("negate", abs, workers=2, kind="process")
+        pipeline.add_stage("inc", lambda x: x + 1, workers=1)
+        for item in range(-5, 0):
+            pipeline.put(item)
+        assert results.wait()
+    assert sorted(value for _, value, _ in results.items) == [3, 5, 7, 9, 11]
+    assert all(error is None for _, _, error in results.items)
+    summary = pipeline.summary()
+    assert "negate" in summary and "5 items (0 failed)" in summary
+
+
+def test_finished_and_failed_items():
+    def check(x):
+        if x == 0:
+            raise ValueError("zero")
+        return Finished("cached") if x < 0 else x
+
+    results = Results(3)
+    with Pipeline(results) as pipeline:
+        stats = pipeline.add_stage("check", check)
+        pipeline.add_stage("next", lambda x: x * 10)
+        for item in (-1, 0, 2):
+            pipeline.put(item)
+        assert results.wait()
+    outcomes = {item: (value, error) for item, value, error in results.items}
+    assert outcomes[-1] == ("cached", None)
+    assert isinstance(outcomes[0][1], ValueError)
+    assert outcomes[2] == (20, None)
+    assert (stats.items, stats.failed, stats.finished) == (3, 1, 1)
+
+
+def test_async_stage():
+    def start(x):
+        future = Future()
+        threading.Timer(0.01, future.set_result, [None]).start()
+        return future
+
+    results = Results(3)
+    with Pipeline(results) as pipeline:
+        pipeline.add_stage("wait", start, workers=2, kind="async")
+        pipeline.add_stage("after", lambda x: x + 100)
+        for item in range(3):
+            pipeline.put(item)
+        assert results.wait()
+    # An async stage hands the item itself on once its Future resolves
+    assert sorted(value for _, value, _ in results.items) == [100, 101, 102]
+
+
+def test_cancel_drops_queued_items():
+    release = threading.Event()
+
+    def slow(x):
+        release.wait(10)
+        return x
+
+    results = Results(4)
+    pipeline = Pipeline(results, queue_size=4)
+    stats = pipeline.add_stage("slow", slow)
+    for item in range(4):
+        pipeline.put(item)
+    while stats.active < 1:
+        time.sleep(0.01)
+    closer = threading.Thread(target=pipeline.close, kwargs={"cancel": True})
+    closer.start()
+    while not pipeline.cancelled:
+        time.sleep(0.01)
+    release.set()  # item 0 is in progress and finishes, the queued ones are dropped
+    closer.join(10)
+    assert results.wait()
+    outcomes = {item: (value, error) for item, value, error in results.items}
+    assert outcomes[0] == (0, None)
+    assert all(isinstance(outcomes[item][1], Cancelled) for item in (1, 2, 3))
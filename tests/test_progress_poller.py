@@ -0,0 +1,62 @@
+import pytest
+
+from x2agi_speechkit import progress_poller
+from x2agi_speechkit.progress_poller import AdaptivePoller
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(progress_poller.time, "monotonic", clock)
+    return clock
+
+
+def poll_until(poller, clock, progress_at, end):
+    """Poll as the poller schedules until `end` seconds in; `progress_at(t)` is the server's progress."""
+    start = clock.now
+    while True:
+        poller.record(progress_at(clock.now - start))
+        if clock.now - start >= end:
+            return
+        clock.now += poller.next_interval()
+
+
+def test_queued_job_is_not_polled_faster_than_the_fixed_interval(clock):
+    # A 60 s file (6 s of expected processing) that sits in the queue for 120 s
+    poller = AdaptivePoller(fixed_interval=5, audio_duration_s=60)
+    poll_until(poller, clock, lambda t: 0, end=120)
+    assert poller.polls <= poller.fixed_interval_polls() // 2
+    assert poller.saved_polls() > 0
+
+
+def test_intervals_without_a_rate(clock):
+    poller = AdaptivePoller(fixed_interval=5, audio_duration_s=3600)
+    intervals = [poller.next_interval() for _ in range(8)]
+    assert min(intervals) >= 5
+    assert max(intervals) <= 60 * 1.2
+
+
+def test_polls_densify_near_completion(clock):
+    poller = AdaptivePoller(fixed_interval=5, audio_duration_s=600)
+    poll_until(poller, clock, lambda t: min(100, t / 2), end=200)  # 1% every 2 s
+    poller.record(100)
+    assert poller.estimated_remaining_s() == pytest.approx(0, abs=1)
+    assert poller.next_interval() == pytest.approx(poller.min_interval, rel=poller.jitter)
+
+
+def test_summary_reports_extra_calls(clock):
+    poller = AdaptivePoller(fixed_interval=5)
+    for progress in (0, 10, 20):
+        poller.record(progress)
+        clock.now += 1
+    assert poller.fixed_interval_polls() == 1
+    assert poller.saved_polls() == -2
+    assert poller.summary() == "GetProgress calls: 3 (polling every 5s would take 1, 2 more)"
@@ -0,0 +1,66 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from progress_scheduler import OperationFailed, ProgressScheduler
+
+
+def responses(*statuses):
+    """A poll() returning one ProgressResponse-like object per status, in order."""
+    remaining = [SimpleNamespace(operation_id="op-1", status=status, progress=min(100, 50 * (i + 1)), error="")
+                 for i, status in enumerate(statuses)]
+    lock = threading.Lock()
+
+    def poll():
+        with lock:
+            return remaining.pop(0)
+    return poll
+
+
+def test_completes():
+    seen = []
+    with ProgressScheduler(max_polls_per_second=100, on_progress=lambda response: seen.append(response.status)) \
+            as scheduler:
+        future = scheduler.track(responses("processing", "completed"))
+        response = future.result(timeout=10)
+    assert response.status == "completed"
+    assert seen == ["processing", "completed"]
+    assert scheduler.polls == 2 and scheduler.completed == 1
+
+
+def test_failed_operation():
+    with ProgressScheduler(max_polls_per_second=100) as scheduler:
+        future = scheduler.track(responses("failed"))
+        with pytest.raises(OperationFailed, match="op-1"):
+            future.result(timeout=10)
+
+
+def test_poll_error():
+    def poll():
+        raise ConnectionError("UNAVAILABLE")
+
+    with ProgressScheduler(max_polls_per_second=100) as scheduler:
+        future = scheduler.track(poll)
+        assert isinstance(future.exception(timeout=10), ConnectionError)
+
+
+def test_on_progress_error_resolves_the_future():
+    def on_progress(response):
+        raise ValueError("callback failed")
+
+    with ProgressScheduler(max_polls_per_second=100, on_progress=on_progress) as scheduler:
+        future = scheduler.track(responses("processing", "completed"))
+        assert isinstance(future.exception(timeout=10), ValueError)
+
+
+def test_close_fails_pending_operations():
+    scheduler = ProgressScheduler(max_polls_per_second=100)
+    future = scheduler.track(responses("processing", "completed"), audio_duration_s=3600)
+    deadline = time.monotonic() + 10
+    while scheduler.polls < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    scheduler.close()  # before the second poll, due seconds later
+    with pytest.raises(RuntimeError, match="stopped"):
+        future.result(timeout=10)
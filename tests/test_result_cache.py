@@ -0,0 +1,33 @@
+from result_cache import ResultCache, SpooledAudio
+from x2agi_speechkit import stubs
+
+
+def test_spooled_audio(wav):
+    chunks = [wav[i:i + 1000] for i in range(0, len(wav), 1000)]
+    with SpooledAudio(iter(chunks), chunk_size=4096) as audio:
+        assert b"".join(audio.chunks()) == wav
+        assert b"".join(audio.chunks()) == wav  # can be read again, e.g. for a retried upload
+        assert audio.duration_s == 2.0
+        digest = audio.digest
+    with SpooledAudio([wav]) as audio:
+        assert audio.digest == digest
+
+
+def test_result_cache(tmp_path):
+    cache = ResultCache(str(tmp_path / "results"))
+    labels = [stubs.stt_async_pb2.OracleSpeakerLabel(speaker_label="JOHNNY", audio_data=b"clip")]
+    key = cache.key("digest", "en", labels, False)
+    assert cache.key("digest", "ru", labels, False) != key
+    assert cache.key("digest", "en", labels, True) != key
+    assert cache.key("digest", "en", [], False) != key
+
+    responses = [
+        stubs.stt_async_pb2.StreamingResponse(operation_id="op-1", results=[
+            stubs.stt_async_pb2.DiarizationResult(start_time_ms=0, end_time_ms=1000, speaker_label="JOHNNY",
+                                                  transcript="hello")]),
+        stubs.stt_async_pb2.StreamingResponse(operation_id="op-1"),
+    ]
+    assert cache.lookup(key) is None
+    cache.store(key, [response.SerializeToString() for response in responses])
+    assert cache.lookup(key, duration_s=60.0) == responses
+    assert (cache.hits, cache.misses, cache.saved_s) == (1, 1, 60.0)
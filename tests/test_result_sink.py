@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from result_sink import ResultSink
+from x2agi_speechkit import stubs
+
+
+def response(*segments):
+    return stubs.stt_async_pb2.StreamingResponse(
+        operation_id="op-1", results=[stubs.stt_async_pb2.DiarizationResult(**segment) for segment in segments])
+
+
+def test_segments_are_written_as_they_arrive(tmp_path):
+    name = str(tmp_path / "call")
+    echoed = []
+    with ResultSink(name, ndjson=True, echo=echoed.append) as sink:
+        sink.write_response(response({"start_time_ms": 0, "end_time_ms": 1500, "speaker_label": "JOHNNY",
+                                      "transcript": " i need help "}))
+        # Flushed after each response, so the file can be tailed during the download
+        with open(name + ".text", encoding="utf-8") as f:
+            assert f.read() == "0.0\t1.5\ti need help\n"
+        sink.write_response({"results": [{"start_time_ms": 1500, "end_time_ms": 3000, "speaker_label": "Speaker 1",
+                                          "transcript": "привет"}]})
+    assert sink.segments == 2
+    with open(name + ".speakers", encoding="utf-8") as f:
+        assert f.read() == "0.0\t1.5\tJOHNNY\n1.5\t3.0\tSpeaker 1\n"
+    with open(name + ".ndjson", encoding="utf-8") as f:
+        assert [json.loads(line)["transcript"] for line in f] == [" i need help ", "привет"]
+    assert echoed == ["\tfinal JOHNNY :  i need help ", "\tfinal Speaker 1 : привет"]
+
+
+def test_failed_download_leaves_no_partial_files(tmp_path):
+    name = str(tmp_path / "call")
+    with pytest.raises(ConnectionError):
+        with ResultSink(name, ndjson=True) as sink:
+            sink.write_response(response({"start_time_ms": 0, "end_time_ms": 1000, "speaker_label": "JOHNNY",
+                                          "transcript": "hello"}))
+            raise ConnectionError("stream reset")
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from segment_store import SegmentStore
+from x2agi_speechkit import stubs
+
+SEGMENTS = [
+    {"start_time_ms": 0, "end_time_ms": 1500, "speaker_label": "JOHNNY", "transcript": "i need help"},
+    {"start_time_ms": 1500, "end_time_ms": 3200, "speaker_label": "Speaker 1", "transcript": "привет"},
+    {"start_time_ms": 3200, "end_time_ms": 4000, "speaker_label": "JOHNNY", "transcript": ""},
+]
+ROWS = [(s["start_time_ms"], s["end_time_ms"], s["speaker_label"], s["transcript"]) for s in SEGMENTS]
+
+
+def test_from_segments():
+    store = SegmentStore.from_segments(SEGMENTS)
+    assert len(store) == 3 and list(store) == ROWS
+    assert store.labels == ["JOHNNY", "Speaker 1"]
+    assert store.segments_of("JOHNNY").tolist() == [0, 2]
+    assert store.segments_of("nobody").size == 0
+    messages = [stubs.stt_async_pb2.DiarizationResult(**segment) for segment in SEGMENTS]
+    assert list(SegmentStore.from_segments(messages)) == ROWS
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "call.segments")
+    SegmentStore.from_segments(SEGMENTS).save(path)
+    with SegmentStore.load(path) as store:
+        assert list(store) == ROWS
+        assert store.start_ms.dtype == np.dtype("<i8")
+        assert not store.start_ms.flags.writeable  # a view of the memory map
+
+
+def test_empty_store(tmp_path):
+    path = str(tmp_path / "empty.segments")
+    SegmentStore.from_segments([]).save(path)
+    with SegmentStore.load(path) as store:
+        assert len(store) == 0 and list(store) == []
+
+
+def test_time_label_files(tmp_path):
+    name = str(tmp_path / "call")
+    SegmentStore.from_segments(SEGMENTS).to_time_label_files(name)
+    with open(name + ".speakers", encoding="utf-8") as f:
+        assert f.readline() == "0.0\t1.5\tJOHNNY\n"
+    assert list(SegmentStore.from_time_label_files(name)) == ROWS
+
+
+def test_not_a_store(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a segment store")
+    with pytest.raises(ValueError):
+        SegmentStore.load(str(path))
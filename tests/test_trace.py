@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from x2agi_speechkit.trace import JobTrace, merge
+
+SERVICES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services")
+
+
+def test_spans_and_metadata(tmp_path):
+    trace = JobTrace("call.wav")
+    with trace.span("upload", "chunk 0", bytes=100) as args:
+        args["sent"] = True
+    with pytest.raises(ValueError):
+        with trace.span("poll", "GetProgress"):
+            raise ValueError("UNAVAILABLE")
+    trace.instant("oracle cache", "vito.wav")
+    trace.identify(job_id="job-1", operation_id="op-1")
+
+    path = tmp_path / "call.trace.json"
+    trace.save(str(path))
+    events = json.loads(path.read_text())["traceEvents"]
+    process = [event for event in events if event["name"] == "process_name"]
+    assert process[0]["args"]["name"] == "call.wav x-job-id=job-1 operation.id=op-1"
+    threads = {event["tid"]: event["args"]["name"] for event in events if event["name"] == "thread_name"}
+    assert threads == {1: "upload", 2: "poll", 3: "oracle cache"}
+
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert spans["chunk 0"]["args"] == {"bytes": 100, "sent": True}
+    assert spans["GetProgress"]["args"]["error"] == "ValueError('UNAVAILABLE')"
+    assert spans["GetProgress"]["ts"] >= spans["chunk 0"]["ts"] + spans["chunk 0"]["dur"]
+    assert {event["pid"] for event in events} == {trace.pid()}
+
+
+def test_pid_follows_the_job_id():
+    assert JobTrace("a.wav", job_id="job-1").pid() == JobTrace("b.wav", job_id="job-1").pid()
+    assert JobTrace("a.wav", job_id="job-1").pid() != JobTrace("a.wav", job_id="job-2").pid()
+
+
+def test_merge(tmp_path):
+    paths = []
+    for job_id in ("job-1", "job-2"):
+        trace = JobTrace(job_id=job_id)
+        start = trace.now()
+        trace.add("upload", "RecognizeFileStreaming", start, start + 1.5)
+        paths.append(str(tmp_path / f"{job_id}.trace.json"))
+        trace.save(paths[-1])
+    # Bare lists of events are valid trace files too
+    (tmp_path / "list.trace.json").write_text(json.dumps([{"name": "x", "ph": "i", "pid": 1, "tid": 1, "ts": 0}]))
+    paths.append(str(tmp_path / "list.trace.json"))
+
+    output = str(tmp_path / "merged.json")
+    count = merge(paths, output)
+    events = json.load(open(output))["traceEvents"]
+    assert count == len(events) == 2 * 4 + 1
+    assert len({event["pid"] for event in events if event["name"] == "process_name"}) == 2
+
+
+def test_merge_command(tmp_path):
+    for job_id in ("job-1", "job-2"):
+        JobTrace(job_id=job_id).save(str(tmp_path / f"{job_id}.trace.json"))
+    output = tmp_path / "batch.json"
+    subprocess.run([sys.executable, "-m", "x2agi_speechkit.trace", "merge", str(output), str(tmp_path / "*.trace.json")],
+                   check=True, capture_output=True, cwd=SERVICES)
+    assert len(json.loads(output.read_text())["traceEvents"]) == 2